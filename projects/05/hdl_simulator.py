@@ -0,0 +1,1209 @@
+import os
+import re
+import sys
+import time
+from abc import ABC, abstractmethod
+from array import array
+
+try:
+    import numpy as np
+except ImportError: # only batch evaluation needs it
+    np = None
+
+class ChipDef:
+    """A parsed `CHIP` definition.
+
+    Connections are (inner pin, inner lo, inner hi, outer pin, outer lo, outer hi) tuples, with lo/hi None when
+    the whole pin is meant; the outer pin can also be `true` or `false`.
+    """
+
+    __slots__ = ("name", "inputs", "outputs", "parts", "path")
+
+    def __init__(self, name: str, inputs: dict, outputs: dict, parts: list, path: str | None = None) -> None:
+        self.name = name
+        self.inputs = inputs # pin -> width, in declaration order
+        self.outputs = outputs
+        self.parts = parts # (chip name, connections) per part
+        self.path = path
+
+    def width(self, pin: str) -> int | None:
+        return self.inputs.get(pin, self.outputs.get(pin))
+
+class HDLParser:
+    """Parser for the nand2tetris HDL: `CHIP name { IN ...; OUT ...; PARTS: Part(pin=pin, ...); ... }`"""
+
+    TOKEN = re.compile(r"\s*(?://[^\n]*|/\*.*?\*/|([A-Za-z_]\w*|\d+|\.\.|\S))", re.S)
+
+    def __init__(self, text: str, path: str = "<text>") -> None:
+        self.path = path
+        self.tokens = [tok for tok in HDLParser.TOKEN.findall(text) if tok]
+        self.pos = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self) -> str:
+        tok = self.peek()
+        if tok is None:
+            raise ValueError(f"{self.path}: unexpected end of file")
+        self.pos += 1
+        return tok
+
+    def expect(self, expected: str) -> None:
+        tok = self.next()
+        if tok != expected:
+            raise ValueError(f"{self.path}: expected '{expected}', found '{tok}'")
+
+    def pin_list(self) -> dict:
+        """`a, b[16], c;` -> {"a": 1, "b": 16, "c": 1}"""
+        pins = {}
+        while True:
+            name = self.next()
+            width = 1
+            if self.peek() == "[":
+                self.next()
+                width = int(self.next())
+                self.expect("]")
+            pins[name] = width
+            if self.next() == ";":
+                return pins
+
+    def pin_ref(self) -> tuple:
+        """`name`, `name[i]` or `name[i..j]` -> (name, lo, hi)"""
+        name = self.next()
+        if self.peek() != "[":
+            return name, None, None
+        self.next()
+        lo = hi = int(self.next())
+        if self.peek() == "..":
+            self.next()
+            hi = int(self.next())
+        self.expect("]")
+        return name, lo, hi
+
+    def parse(self) -> ChipDef:
+        self.expect("CHIP")
+        name = self.next()
+        self.expect("{")
+        inputs, outputs, parts = {}, {}, []
+        while (tok := self.next()) != "}":
+            match tok:
+                case "IN":
+                    inputs.update(self.pin_list())
+                case "OUT":
+                    outputs.update(self.pin_list())
+                case "PARTS":
+                    self.expect(":")
+                    while self.peek() != "}":
+                        parts.append(self.part())
+                case "BUILTIN" | "CLOCKED":
+                    raise ValueError(f"{self.path}: {name} is a builtin chip, which has no gate-level definition")
+                case other:
+                    raise ValueError(f"{self.path}: unexpected '{other}' in chip {name}")
+        return ChipDef(name, inputs, outputs, parts, self.path)
+
+    def part(self) -> tuple:
+        chip = self.next()
+        self.expect("(")
+        connections = []
+        while True:
+            inner = self.pin_ref()
+            self.expect("=")
+            outer = self.pin_ref()
+            connections.append((*inner, *outer))
+            if self.next() == ")":
+                break
+        self.expect(";")
+        return chip, connections
+
+    @staticmethod
+    def parse_file(path: str) -> ChipDef:
+        with open(path, "r") as f:
+            return HDLParser(f.read(), path).parse()
+
+class BuiltinChip(ABC):
+    """A chip simulated by a Python model rather than by gates, as the official simulator does for chips
+    without an HDL definition.
+
+    Its outputs are a combinational function of its `READ` inputs only, and its other inputs are sampled at
+    tick. Clocked state changes take effect at tock, like a DFF's.
+    """
+
+    INPUTS: dict = {} # pin -> width
+    OUTPUTS: dict = {"out": 16}
+    READ: tuple = () # inputs the outputs depend on combinationally
+
+    @abstractmethod
+    def read(self, address: int) -> int:
+        """Output value for the `READ` inputs"""
+
+    def peek(self, index: int) -> int:
+        """Value a `Part[index]` query shows"""
+        return self.read(index)
+
+    def latch(self, inputs: dict) -> None:
+        """Sample the clocked inputs at tick"""
+
+    def commit(self) -> bool:
+        """Apply the sampled inputs at tock
+
+        Returns:
+            bool: whether the state changed
+        """
+        return False
+
+class MemoryChip(BuiltinChip):
+    """`SIZE` words of array('H') memory: out = memory[address], memory[address] = in after a tick-tock with load"""
+
+    SIZE = 0
+    READ = ("address",)
+
+    def __init__(self) -> None:
+        self.memory = array('H', bytes(2 * self.SIZE))
+        self.pending: tuple | None = None # (address, value) sampled at tick
+
+    def read(self, address: int) -> int:
+        return self.memory[address]
+
+    def latch(self, inputs: dict) -> None:
+        self.pending = (inputs["address"], inputs["in"]) if inputs["load"] else None
+
+    def commit(self) -> bool:
+        if self.pending is None:
+            return False
+        address, value = self.pending
+        self.pending = None
+        if self.memory[address] == value:
+            return False
+        self.memory[address] = value
+        return True
+
+class RAM8(MemoryChip):
+    SIZE = 8
+    INPUTS = {"in": 16, "load": 1, "address": 3}
+
+class RAM64(MemoryChip):
+    SIZE = 64
+    INPUTS = {"in": 16, "load": 1, "address": 6}
+
+class RAM512(MemoryChip):
+    SIZE = 512
+    INPUTS = {"in": 16, "load": 1, "address": 9}
+
+class RAM4K(MemoryChip):
+    SIZE = 4096
+    INPUTS = {"in": 16, "load": 1, "address": 12}
+
+class RAM16K(MemoryChip):
+    SIZE = 16384
+    INPUTS = {"in": 16, "load": 1, "address": 14}
+
+class Screen(MemoryChip):
+    SIZE = 8192
+    INPUTS = {"in": 16, "load": 1, "address": 13}
+
+class ROM32K(MemoryChip):
+    SIZE = 32768
+    INPUTS = {"address": 15}
+
+    def load(self, hack_file: str) -> None:
+        """Load a program from a .hack file, one binary word per line"""
+        self.memory = array('H', bytes(2 * self.SIZE))
+        with open(hack_file, "r") as f:
+            for i, line in enumerate(word for word in (line.strip() for line in f) if word):
+                self.memory[i] = int(line, 2)
+
+    latch = BuiltinChip.latch # read-only
+    commit = BuiltinChip.commit
+
+class Register(BuiltinChip):
+    """out = the value loaded by the last tick-tock with load"""
+
+    INPUTS = {"in": 16, "load": 1}
+
+    def __init__(self) -> None:
+        self.value = 0
+        self.pending: int | None = None # value sampled at tick
+
+    def read(self, address: int) -> int:
+        return self.value
+
+    def peek(self, index: int) -> int: # the register's new value shows from the tick on
+        return self.value if self.pending is None else self.pending
+
+    def latch(self, inputs: dict) -> None:
+        self.pending = inputs["in"] if inputs["load"] else None
+
+    def commit(self) -> bool:
+        value, self.pending = self.pending, None
+        if value is None or value == self.value:
+            return False
+        self.value = value
+        return True
+
+class PC(Register):
+    """Counter: after a tick-tock, out = 0 on reset, else in on load, else out + 1 on inc"""
+
+    INPUTS = {"in": 16, "load": 1, "inc": 1, "reset": 1}
+
+    def latch(self, inputs: dict) -> None:
+        if inputs["reset"]:
+            self.pending = 0
+        elif inputs["load"]:
+            self.pending = inputs["in"]
+        elif inputs["inc"]:
+            self.pending = (self.value + 1) & 0xFFFF
+        else:
+            self.pending = None
+
+class Keyboard(BuiltinChip):
+    """Outputs the code of the key currently pressed, `key`, or 0"""
+
+    def __init__(self) -> None:
+        self.key = 0
+
+    def read(self, address: int) -> int:
+        return self.key
+
+BUILTINS = {cls.__name__: cls for cls in (RAM8, RAM64, RAM512, RAM4K, RAM16K, Register, PC, Screen, ROM32K, Keyboard)}
+
+# Built-in registers of the CPU, which the official simulator shows as `ARegister[]` and `DRegister[]`
+ALIASES = {"ARegister": "Register", "DRegister": "Register"}
+
+PROJECTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Where chips are looked for after the directory of the chip under test, latest project first
+SEARCH_PATH = [os.path.join(PROJECTS_DIR, project) for project in ("05", os.path.join("03", "b"), os.path.join("03", "a"), "02", "01")]
+
+class ChipLibrary:
+    """Resolves chip names to parsed HDL definitions or builtin models.
+
+    Chips are looked up in the search path in order. `builtins` names chips that use their builtin model even
+    if an HDL definition exists, as long as the definition has the model's pins. By default these are the
+    registers and memories of project 03, which are thousands of gates per register and millions for RAM16K
+    and only change where they're loaded. The chip a test loads is always built from its HDL.
+    """
+
+    DEFAULT_BUILTINS = ("RAM8", "RAM64", "RAM512", "RAM4K", "RAM16K", "Register", "PC")
+
+    def __init__(self, search_path: list | None = None, builtins: tuple = DEFAULT_BUILTINS) -> None:
+        self.search_path = search_path if search_path is not None else SEARCH_PATH
+        self.builtins = set(builtins)
+        self.chips: dict = {}
+
+    def get(self, name: str) -> ChipDef | type:
+        """Definition of a chip: a ChipDef, or a BuiltinChip subclass. Nand and DFF resolve to their own names."""
+        if name in ("Nand", "DFF"):
+            return name
+        if name not in self.chips:
+            self.chips[name] = self.find(name)
+        return self.chips[name]
+
+    def find(self, name: str) -> ChipDef | type:
+        hdl = self.hdl(name)
+        model_name = ALIASES.get(name, name)
+        model = BUILTINS.get(model_name)
+        # a model stands in for an HDL definition only if asked to, and if it has the same pins
+        if model is not None and (hdl is None or model_name in self.builtins and ChipLibrary.pins(hdl) == (model.INPUTS, model.OUTPUTS)):
+            return model
+        if hdl is None:
+            raise ValueError(f"Chip {name} not found in {os.pathsep.join(self.search_path)}")
+        return hdl
+
+    def hdl(self, name: str) -> ChipDef | None:
+        """HDL definition of a chip, None if there's none in the search path"""
+        for directory in self.search_path:
+            path = os.path.join(directory, name + ".hdl")
+            if os.path.exists(path):
+                return HDLParser.parse_file(path)
+        if name in ALIASES:
+            chip = self.hdl(ALIASES[name])
+            if chip is not None:
+                return ChipDef(name, chip.inputs, chip.outputs, chip.parts, chip.path)
+        return None
+
+    @staticmethod
+    def pins(chip: ChipDef | type | str) -> tuple:
+        """(inputs, outputs) of a chip, each a dict of pin -> width"""
+        match chip:
+            case "Nand":
+                return {"a": 1, "b": 1}, {"out": 1}
+            case "DFF":
+                return {"in": 1}, {"out": 1}
+            case ChipDef():
+                return chip.inputs, chip.outputs
+        return chip.INPUTS, chip.OUTPUTS
+
+class Netlist:
+    """A chip flattened down to Nand gates, DFFs and builtin chips.
+
+    Every bit of every wire is a net, numbered from 0; nets 0 and 1 are the constants false and true. Each
+    net records what drives it as (kind, a, b): a Nand of nets a and b, a DFF with input a, bit b of builtin
+    chip a's output, a top-level input, or another net it was connected to as well (an alias).
+    """
+
+    UNDRIVEN, CONST, INPUT, NAND, DFF, BUILTIN, ALIAS = range(7)
+
+    def __init__(self, chip_name: str, library: ChipLibrary) -> None:
+        self.library = library
+        self.kind = bytearray([Netlist.CONST, Netlist.CONST])
+        self.a = array('i', [0, 1])
+        self.b = array('i', [0, 0])
+        self.builtins: list = [] # (model, pin -> nets) per builtin chip instance
+        self.instances: dict = {} # part name -> (depth, pin -> nets) of every instance
+        self.plans: dict = {} # chip name -> its resolved parts, see plan()
+        chip = library.hdl(chip_name)
+        if chip is None:
+            raise ValueError(f"{chip_name} has no HDL definition to simulate")
+        self.chip = chip
+        self.inputs = {pin: [self.new_net(Netlist.INPUT) for _ in range(width)] for (pin, width) in chip.inputs.items()}
+        self.outputs = {pin: [self.new_net() for _ in range(width)] for (pin, width) in chip.outputs.items()}
+        self.instantiate(chip, chip_name, {**self.inputs, **self.outputs}, 0)
+
+    def new_net(self, kind: int = 0, a: int = 0, b: int = 0) -> int:
+        self.kind.append(kind)
+        self.a.append(a)
+        self.b.append(b)
+        return len(self.kind) - 1
+
+    def drive(self, net: int, kind: int, a: int = 0, b: int = 0) -> None:
+        if self.kind[net] != Netlist.UNDRIVEN:
+            raise ValueError(f"Net {net} has more than one driver")
+        self.kind[net] = kind
+        self.a[net] = a
+        self.b[net] = b
+
+    def instantiate(self, chip: ChipDef | type | str, name: str, pins: dict, depth: int) -> None:
+        """Add the gates of a chip, used as part `name`, whose pins are connected to `pins`, pin -> nets (least
+        significant bit first)
+        """
+        match chip:
+            case "Nand":
+                self.drive(pins["out"][0], Netlist.NAND, pins["a"][0], pins["b"][0])
+                return
+            case "DFF":
+                self.drive(pins["out"][0], Netlist.DFF, pins["in"][0])
+                return
+            case ChipDef():
+                self.instances.setdefault(name, []).append((depth, pins))
+            case _:
+                index = len(self.builtins)
+                self.builtins.append((chip(), pins))
+                self.instances.setdefault(name, []).append((depth, pins))
+                for pin in chip.OUTPUTS:
+                    for bit, net in enumerate(pins[pin]):
+                        self.drive(net, Netlist.BUILTIN, index, bit)
+                return
+        widths, parts = self.plan(chip)
+        wires = dict(pins)
+        for wire, width in widths.items():
+            wires[wire] = [self.new_net() for _ in range(width)]
+        for part, name, inputs, outputs, connections in parts:
+            part_pins = {pin: [0] * width for (pin, width) in inputs.items()}
+            part_pins.update({pin: [None] * width for (pin, width) in outputs.items()})
+            for (inner, lo, hi, outer, outer_lo, outer_hi) in connections:
+                inner_nets = part_pins[inner]
+                if outer in ("true", "false"):
+                    inner_nets[lo:hi + 1] = [int(outer == "true")] * (hi - lo + 1)
+                    continue
+                outer_nets = wires[outer] if outer_lo is None else wires[outer][outer_lo:outer_hi + 1]
+                if len(outer_nets) != hi - lo + 1:
+                    raise ValueError(f"{chip.path}: {name}.{inner} connected to a {len(outer_nets)}-bit wire {outer}")
+                if inner in inputs:
+                    inner_nets[lo:hi + 1] = outer_nets
+                    continue
+                for bit, net in enumerate(outer_nets, lo):
+                    if inner_nets[bit] is None:
+                        inner_nets[bit] = net
+                    else: # the same output bit drives another wire
+                        self.drive(net, Netlist.ALIAS, inner_nets[bit])
+            for pin in outputs:
+                part_pins[pin] = [self.new_net() if net is None else net for net in part_pins[pin]]
+            self.instantiate(part, name, part_pins, depth + 1)
+
+    def plan(self, chip: ChipDef) -> tuple:
+        """Resolve a chip's parts and the widths of its internal wires, once per chip
+
+        Returns:
+            tuple[dict, list]: internal wire -> width, and (part, name, inputs, outputs, connections) per part
+                with every connection's inner bit range filled in
+        """
+        if chip.name in self.plans:
+            return self.plans[chip.name]
+        pins = set(chip.inputs) | set(chip.outputs)
+        widths: dict = {} # internal wires are as wide as the part outputs that drive them
+        parts = []
+        for name, connections in chip.parts:
+            part = self.library.get(name)
+            inputs, outputs = ChipLibrary.pins(part)
+            resolved = []
+            for (inner, lo, hi, outer, outer_lo, outer_hi) in connections:
+                if inner not in inputs and inner not in outputs:
+                    raise ValueError(f"{chip.path}: {name} has no pin {inner}")
+                if lo is None:
+                    lo, hi = 0, (inputs.get(inner) or outputs[inner]) - 1
+                if inner in outputs:
+                    if outer in ("true", "false") or outer in chip.inputs:
+                        raise ValueError(f"{chip.path}: output {name}.{inner} connected to {outer}")
+                    if outer not in pins:
+                        widths[outer] = max(widths.get(outer, 0), hi - lo + 1 if outer_lo is None else outer_hi + 1)
+                resolved.append((inner, lo, hi, outer, outer_lo, outer_hi))
+            parts.append((part, name, inputs, outputs, resolved))
+        for _, _, inputs, _, connections in parts:
+            for (inner, _, _, outer, _, _) in connections:
+                if inner in inputs and outer not in pins and outer not in widths and outer not in ("true", "false"):
+                    raise ValueError(f"{chip.path}: wire {outer} is never driven")
+        self.plans[chip.name] = (widths, parts)
+        return self.plans[chip.name]
+
+    def instance_pins(self, name: str) -> dict:
+        """Pins of the outermost instance of a chip, as `Register[]` in a test script means the outermost Register"""
+        if name not in self.instances:
+            raise ValueError(f"{self.chip.name} has no part {name}")
+        return min(self.instances[name], key=lambda instance: instance[0])[1]
+
+class HDLSimulator:
+    """Simulates a flattened chip with generated straight-line Python.
+
+    The netlist is scheduled once: aliases are resolved, Nands are folded (constants, double negation, x and
+    not x) and hashed so equal gates are built once, and the gates that can reach an output, a DFF or a builtin
+    chip are sorted topologically. The schedule is emitted as straight-line `n5 = 1 ^ (n3 & n4)` statements
+    on local variables, in functions of `CHUNK` gates that load their inputs from the list of net values `v`
+    and store back only what is read later. Evaluating the chip runs a fixed sequence of statements with no
+    dispatch at all.
+
+    A tick evaluates the chip, unless nothing changed since the last evaluation, and latches DFF and builtin
+    inputs. A tock commits them, and evaluates again only if that changed any state.
+    """
+
+    CHUNK = 4000 # gates per generated function
+
+    def __init__(self, netlist: Netlist) -> None:
+        self.netlist = netlist
+        self.v = [0] * len(netlist.kind)
+        self.v[1] = 1
+        self.models = {f"m{k}": model for (k, (model, _)) in enumerate(netlist.builtins)}
+        self.probes: set = set() # nets read by queries, kept alive through dead code elimination
+        self.state: tuple | None = None # DFF inputs latched by the last tick
+        self.time = 0
+        self.ticked = False
+        self.dirty = True # inputs or memory changed since the last evaluation
+        self.evaluate = self.latch = self.commit = None # generated by compile()
+        self.canon: list = []
+        self.steps: list = [] # the schedule, ("nand", gate, a, b) and ("read", builtin, address nets, [(net, bit)])
+        self.stats: dict = {}
+
+    def compile(self) -> None:
+        nl = self.netlist
+        kind, a, b = nl.kind, nl.a, nl.b
+        n = len(kind)
+        root = list(range(n)) # nets with aliases resolved, undriven nets reading as false
+        for i in range(n):
+            j = i
+            while kind[j] == Netlist.ALIAS:
+                j = a[j]
+            root[i] = 0 if kind[j] == Netlist.UNDRIVEN else j
+        read_nets = [[root[net] for pin in model.READ for net in pins[pin]] for (model, pins) in nl.builtins]
+        canon = [-1] * n # net -> equivalent net after folding
+        for i in range(n):
+            if kind[i] in (Netlist.CONST, Netlist.INPUT, Netlist.DFF):
+                canon[i] = i
+        ops: dict = {} # gate -> (a, b) operands, after folding
+        inverse: dict = {} # Not gate -> its operand
+        table: dict = {} # (a, b) -> gate, so every distinct gate is built once
+        order: list = [] # gates in topological order, and ~k where builtin k reads its inputs
+        read_done = set()
+
+        def negate(x: int, i: int) -> int:
+            if x < 2:
+                return 1 - x
+            if x in inverse:
+                return inverse[x]
+            if (x, x) not in table:
+                table[(x, x)] = i
+                ops[i] = (x, x)
+                inverse[i] = x
+                order.append(i)
+            return table[(x, x)]
+
+        def fold(i: int) -> int:
+            x, y = canon[root[a[i]]], canon[root[b[i]]]
+            if x == 0 or y == 0:
+                return 1
+            if x == 1 or x == y:
+                return negate(y, i)
+            if y == 1:
+                return negate(x, i)
+            if inverse.get(x) == y or inverse.get(y) == x:
+                return 1
+            key = (x, y) if x < y else (y, x)
+            if key not in table:
+                table[key] = i
+                ops[i] = key
+                order.append(i)
+            return table[key]
+
+        def children(i: int) -> list:
+            if kind[i] == Netlist.NAND:
+                return [root[a[i]], root[b[i]]]
+            if kind[i] == Netlist.BUILTIN:
+                return read_nets[a[i]]
+            return []
+
+        def schedule(start: int) -> None:
+            if canon[start] >= 0:
+                return
+            stack = [(start, iter(children(start)))]
+            on_stack = {start}
+            while stack:
+                i, pending = stack[-1]
+                for child in pending:
+                    if canon[child] < 0:
+                        if child in on_stack:
+                            raise ValueError(f"{nl.chip.name} has a combinational loop")
+                        on_stack.add(child)
+                        stack.append((child, iter(children(child))))
+                        break
+                else:
+                    stack.pop()
+                    on_stack.discard(i)
+                    if kind[i] == Netlist.NAND:
+                        canon[i] = fold(i)
+                    else:
+                        canon[i] = i
+                        if a[i] not in read_done:
+                            read_done.add(a[i])
+                            order.append(~a[i])
+
+        dffs = [i for i in range(n) if kind[i] == Netlist.DFF]
+        roots = [root[net] for nets in nl.outputs.values() for net in nets] + [root[net] for net in self.probes]
+        roots += [root[a[i]] for i in dffs] + [root[net] for (_, pins) in nl.builtins for nets in pins.values() for net in nets]
+        for net in roots:
+            schedule(net)
+        self.canon = [canon[root[i]] for i in range(n)]
+
+        # only gates leading to outputs, probes, live DFFs and builtin inputs are emitted
+        live = bytearray(n)
+        work = [self.canon[net] for nets in nl.outputs.values() for net in nets] + [self.canon[net] for net in self.probes]
+        work += [self.canon[net] for (_, pins) in nl.builtins for nets in pins.values() for net in nets]
+        while work:
+            i = work.pop()
+            if live[i]:
+                continue
+            live[i] = 1
+            match kind[i]:
+                case Netlist.NAND:
+                    work.extend(ops[i])
+                case Netlist.DFF:
+                    work.append(self.canon[a[i]])
+                case Netlist.BUILTIN:
+                    work.extend(self.canon[net] for net in read_nets[a[i]])
+        bits: dict = {} # builtin -> its live output nets
+        for i in range(n):
+            if kind[i] == Netlist.BUILTIN and live[i]:
+                bits.setdefault(a[i], []).append(i)
+
+        steps = []
+        for i in order:
+            if i < 0:
+                k = ~i
+                if k in bits:
+                    model, pins = nl.builtins[k]
+                    address = [self.canon[net] for pin in model.READ for net in pins[pin]]
+                    steps.append(("read", k, address, [(net, b[net]) for net in bits[k]]))
+            elif live[i]:
+                steps.append(("nand", i, *ops[i]))
+        live_dffs = [i for i in dffs if live[i]]
+        clocked = [k for (k, (model, _)) in enumerate(nl.builtins) if type(model).commit is not BuiltinChip.commit]
+        latches = []
+        for k in clocked:
+            model, pins = nl.builtins[k]
+            inputs = ", ".join(f"{pin!r}: {HDLSimulator.word([self.canon[net] for net in pins[pin]])}" for pin in model.INPUTS)
+            latches.append(f"m{k}.latch({{{inputs}}})")
+        # a tock only writes state that changed, and tells whether anything did
+        commits = ["changed = False"]
+        if live_dffs:
+            latches.append(f"return ({''.join(f'v[{self.canon[a[i]]}], ' for i in live_dffs)})")
+            commits.append(f"if state != ({''.join(f'v[{i}], ' for i in live_dffs)}):")
+            commits.append("    " + "".join(f"v[{i}], " for i in live_dffs) + "= state")
+            commits.append("    changed = True")
+        for k in clocked:
+            commits.append(f"if m{k}.commit():")
+            commits.append("    changed = True")
+        commits.append("return changed")
+        # nets read after evaluate() returns; the rest only live in the locals of a generated function
+        external = {self.canon[net] for nets in nl.outputs.values() for net in nets} | {self.canon[net] for net in self.probes}
+        external |= {self.canon[a[i]] for i in live_dffs}
+        external |= {self.canon[net] for (_, pins) in nl.builtins for nets in pins.values() for net in nets}
+        self.steps = steps
+        source = HDLSimulator.generate(steps, external)
+        source.append("def latch(v):\n    " + "\n    ".join(latches or ["pass"]))
+        source.append("def commit(v, state):\n    " + "\n    ".join(commits))
+        namespace = dict(self.models)
+        for function in source: # one at a time, as compiling them all as one module takes superlinear time
+            exec(function, namespace)
+        self.evaluate, self.latch, self.commit = namespace["evaluate"], namespace["latch"], namespace["commit"]
+        self.stats = {"nets": n, "gates": sum(1 for i in order if i >= 0 and live[i]), "dffs": len(live_dffs),
+                      "builtins": len(nl.builtins)}
+
+    @staticmethod
+    def generate(steps: list, external: set, vector: bool = False) -> list:
+        """Sources of the functions running `steps` a chunk at a time, and of `evaluate(v)` running them in order
+
+        Args:
+            steps (list): scheduled gates and builtin reads
+            external (set): nets read after evaluate() returns
+            vector (bool): whether nets hold NumPy bit vectors rather than 0 or 1
+
+        Returns:
+            list[str]: function sources
+        """
+        chunks = [steps[k:k + HDLSimulator.CHUNK] for k in range(0, len(steps), HDLSimulator.CHUNK)]
+        source = []
+        exported = set(external)
+        for k in range(len(chunks) - 1, -1, -1): # later chunks first, to know which nets they read
+            source.append(HDLSimulator.emit(f"evaluate_{k}", chunks[k], exported, vector))
+            for step in chunks[k]:
+                exported.update(step[2:4] if step[0] == "nand" else step[2])
+        source.append("def evaluate(v):\n    " + "\n    ".join([f"evaluate_{k}(v)" for k in range(len(chunks))] or ["pass"]))
+        return source
+
+    @staticmethod
+    def emit(name: str, steps: list, exported: set, vector: bool = False) -> str:
+        """Source of a function running `steps` on local variables, which loads each net it reads from `v` once
+        and stores back only the nets it computes that are in `exported`
+        """
+        names: dict = {} # net -> its local variable
+        lines = []
+
+        def use(net: int) -> str:
+            if net < 2:
+                return ("ZERO", "ONE")[net] if vector else str(net)
+            if net not in names:
+                names[net] = f"n{net}"
+                lines.append(f"n{net} = v[{net}]")
+            return names[net]
+
+        defined = []
+        for step in steps:
+            match step:
+                case ("nand", i, x, y):
+                    if vector: # bit vectors are negated whole
+                        expr = f"~{use(x)}" if x == y else f"~({use(x)} & {use(y)})"
+                    else:
+                        expr = f"1 ^ {use(x)}" if x == y else f"1 ^ ({use(x)} & {use(y)})"
+                    names[i] = f"n{i}"
+                    lines.append(f"n{i} = {expr}")
+                    defined.append(i)
+                case ("read", k, address, outputs):
+                    terms = [use(net) + (f" << {bit}" if bit else "") for (bit, net) in enumerate(address) if net != 0]
+                    lines.append(f"w = m{k}.read({' | '.join(terms) or '0'})")
+                    for net, bit in outputs:
+                        names[net] = f"n{net}"
+                        lines.append(f"n{net} = w >> {bit} & 1")
+                        defined.append(net)
+        lines.extend(f"v[{net}] = n{net}" for net in defined if net in exported)
+        return f"def {name}(v):\n    " + "\n    ".join(lines or ["pass"])
+
+    @staticmethod
+    def word(nets: list) -> str:
+        """Python expression for the value of a bus, least significant net first"""
+        terms = [f"v[{net}]" + (f" << {bit}" if bit else "") for (bit, net) in enumerate(nets) if net != 0]
+        return " | ".join(terms) if terms else "0"
+
+    def ensure_compiled(self) -> None:
+        if self.evaluate is None:
+            self.compile()
+
+    def eval(self) -> None:
+        self.ensure_compiled()
+        self.evaluate(self.v)
+        self.dirty = False
+
+    def tick(self) -> None:
+        """Evaluate, then sample the inputs of every DFF and builtin chip"""
+        if self.dirty or self.evaluate is None: # otherwise nothing changed since the last tock evaluated
+            self.eval()
+        self.state = self.latch(self.v)
+        self.ticked = True
+
+    def tock(self) -> None:
+        """Commit what the last tick sampled, then evaluate unless no state changed"""
+        if not self.ticked:
+            self.tick()
+        if self.commit(self.v, self.state):
+            self.dirty = True
+        self.ticked = False
+        self.time += 1
+        if self.dirty:
+            self.eval()
+
+    def nets(self, name: str) -> list:
+        """Nets of a top-level pin, or of the `out` pin of a part queried as `Part[]`"""
+        nl = self.netlist
+        if name in nl.inputs:
+            return nl.inputs[name]
+        if name in nl.outputs:
+            return nl.outputs[name]
+        if name.endswith("]"):
+            return nl.instance_pins(name.partition("[")[0])["out"]
+        raise ValueError(f"{nl.chip.name} has no pin {name}")
+
+    def model(self, name: str) -> BuiltinChip | None:
+        """Model of the outermost builtin part with this name, None if it's a gate-level part"""
+        pins = self.netlist.instance_pins(name)
+        for model, model_pins in self.netlist.builtins:
+            if model_pins is pins:
+                return model
+        return None
+
+    def watch(self, names: list) -> None:
+        """Keep the nets of these pins or parts up to date; the chip is recompiled if any were not"""
+        for name in names:
+            if name.endswith("]") and self.model(name.partition("[")[0]) is not None:
+                continue
+            nets = self.nets(name)
+            if not self.probes.issuperset(nets):
+                self.probes.update(nets)
+                self.evaluate = None
+
+    def get(self, name: str) -> int:
+        """Value of a pin, `Part[]` for a gate-level part's output, or `Part[address]` for a builtin memory"""
+        if name.endswith("]"):
+            part, _, index = name[:-1].partition("[")
+            model = self.model(part)
+            if model is not None:
+                return model.peek(int(index or 0))
+        self.ensure_compiled()
+        nets = [self.canon[net] for net in self.nets(name)]
+        if self.ticked and name.endswith("]"): # parts show what the tick latched, like the official builtin registers
+            nl = self.netlist
+            nets = [self.canon[nl.a[net]] if nl.kind[net] == Netlist.DFF else net for net in nets]
+        return HDLSimulator.value(self.v, nets)
+
+    def set(self, name: str, value: int) -> None:
+        if name.endswith("]"):
+            part, _, index = name[:-1].partition("[")
+            model = self.model(part)
+            if not isinstance(model, MemoryChip):
+                raise ValueError(f"Cannot set part {part}, which is not a builtin memory")
+            model.memory[int(index or 0)] = value & 0xFFFF
+            self.dirty = True
+            return
+        nets = self.netlist.inputs.get(name)
+        if nets is None:
+            raise ValueError(f"{self.netlist.chip.name} has no input pin {name}")
+        for bit, net in enumerate(nets):
+            self.v[net] = value >> bit & 1
+        self.dirty = True
+
+    def width(self, name: str) -> int:
+        if name.endswith("]") and self.model(name.partition("[")[0]) is not None:
+            return 16
+        return len(self.nets(name))
+
+    @staticmethod
+    def to_signed(value: int) -> int:
+        return value - 0x10000 if value & 0x8000 else value
+
+    @staticmethod
+    def value(v: list, nets: list) -> int:
+        word = 0
+        for bit, net in enumerate(nets):
+            word |= v[net] << bit
+        return word
+
+class BatchEvaluator:
+    """Evaluates a combinational chip over a whole table of input rows at once.
+
+    Every net holds a NumPy array of little-endian uint64 words with one bit per row, and the simulator's
+    schedule is emitted again as `~(a & b)` on those arrays, so each gate is a single vectorized operation
+    over all the rows and the table is evaluated by one run of the generated code.
+    """
+
+    WORD = np.dtype('<u8') if np is not None else None
+
+    def __init__(self, simulator: HDLSimulator) -> None:
+        if np is None:
+            raise ValueError("Batch evaluation needs NumPy")
+        simulator.ensure_compiled()
+        netlist = simulator.netlist
+        if simulator.stats["dffs"] or netlist.builtins:
+            raise ValueError(f"{netlist.chip.name} is sequential, so it can't be evaluated in batches")
+        self.simulator = simulator
+        self.namespace: dict = {}
+        outputs = {simulator.canon[net] for nets in netlist.outputs.values() for net in nets}
+        for function in HDLSimulator.generate(simulator.steps, outputs, vector=True):
+            exec(function, self.namespace)
+
+    def run(self, inputs: dict, rows: int) -> dict:
+        """Evaluate the chip on every row of a table
+
+        Args:
+            inputs (dict): input pin -> array of its value in each row, or a single value for all of them;
+                missing pins are 0
+            rows (int): number of rows
+
+        Returns:
+            dict: output pin -> uint64 array of its value in each row
+        """
+        netlist, canon = self.simulator.netlist, self.simulator.canon
+        words = (rows + 63) // 64
+        zero = np.zeros(words, BatchEvaluator.WORD)
+        self.namespace["ZERO"], self.namespace["ONE"] = zero, ~zero
+        v = [None] * len(netlist.kind)
+        v[0], v[1] = zero, ~zero
+        for pin, nets in netlist.inputs.items():
+            values = np.broadcast_to(np.asarray(inputs.get(pin, 0), dtype=np.int64), rows)
+            for bit, net in enumerate(nets):
+                v[net] = BatchEvaluator.pack(values >> bit & 1, words)
+        self.namespace["evaluate"](v)
+        results = {}
+        for pin, nets in netlist.outputs.items():
+            value = np.zeros(rows, np.uint64)
+            for bit, net in enumerate(nets):
+                value |= BatchEvaluator.unpack(v[canon[net]], rows) << np.uint64(bit)
+            results[pin] = value
+        return results
+
+    @staticmethod
+    def pack(bits: "np.ndarray", words: int) -> "np.ndarray":
+        """One bit per row -> bit vector of `words` words"""
+        packed = np.zeros(8 * words, np.uint8)
+        row_bytes = np.packbits(bits.astype(np.uint8), bitorder="little")
+        packed[:len(row_bytes)] = row_bytes
+        return packed.view(BatchEvaluator.WORD)
+
+    @staticmethod
+    def unpack(vector: "np.ndarray", rows: int) -> "np.ndarray":
+        return np.unpackbits(vector.view(np.uint8), bitorder="little")[:rows].astype(np.uint64)
+
+class TestScript:
+    """Runs a .tst test script against the simulator and formats its output like the official simulator.
+
+    Supported commands are `load`, `output-file`, `compare-to`, `output-list`, `set`, `eval`, `output`,
+    `tick`, `tock`, `echo`, `clear-echo`, `repeat n {...}`, `while pin op value {...}` and `<Builtin> load
+    <file>` (as in `ROM32K load Max.hack`). Scripts that wait in a `while` for a key to be pressed get the
+    next of `keys`, held down from then on.
+
+    In `batch` mode, a script that only sets, evaluates and outputs top-level pins of a combinational chip
+    is not run row by row: the inputs of every `eval` are collected, evaluated together by a BatchEvaluator
+    when the script ends, and only then are the output lines formatted. Other scripts run as usual.
+
+    With `cross_check`, the script also runs on a reference simulator built with no builtin models except
+    ROM32K, Screen, Keyboard and `cross_check_builtins`, and every evaluation's outputs and every output line
+    must be the same on both, so the builtin models are checked against the chips' gate-level definitions.
+    """
+
+    TOKEN = re.compile(r'\s*(?://[^\n]*|/\*.*?\*/|("[^"]*"|[{},;!]|[^\s{},;!]+))', re.S)
+    FORMAT = re.compile(r"(.+)%([BDSX])(\d+)\.(\d+)\.(\d+)$")
+    WHILE_LIMIT = 100_000 # iterations before a `while` is taken to wait for input that never comes
+
+    def __init__(self, tst_file: str, builtins: tuple = ChipLibrary.DEFAULT_BUILTINS, keys: str = "",
+                 batch: bool = False, cross_check: bool = False, cross_check_builtins: tuple = ()) -> None:
+        self.tst_file = tst_file
+        self.keys = list(keys)
+        self.batch = batch
+        self.batcher: BatchEvaluator | None = None # set while a script is batched
+        self.inputs: dict = {} # input pin -> value, as set by the batched script so far
+        self.rows: list = [] # inputs of every batched eval
+        self.pending: list = [] # (line number, columns, inputs, row of the last eval) of every batched output
+        self.directory = os.path.dirname(os.path.abspath(tst_file))
+        self.library = ChipLibrary([self.directory] + [d for d in SEARCH_PATH if d != self.directory], builtins)
+        self.simulator: HDLSimulator | None = None
+        self.reference: HDLSimulator | None = None # gate-level simulator the builtin models are checked against
+        self.reference_library = ChipLibrary(self.library.search_path, cross_check_builtins) if cross_check else None
+        self.output_file: str | None = None
+        self.compare_file: str | None = None
+        self.columns: list = [] # (name, format, left, width, right, bits of the value)
+        self.lines: list = [] # output lines, header first
+        with open(tst_file, "r") as f:
+            self.tokens = [tok for tok in TestScript.TOKEN.findall(f.read()) if tok]
+        self.pos = 0
+
+    def parse(self, end: str | None = None) -> list:
+        """Commands up to `end` (a closing brace) or the end of the script, each a list of words, and for
+        `repeat` and `while` also their body
+        """
+        commands, words = [], []
+        while self.pos < len(self.tokens):
+            tok = self.tokens[self.pos]
+            self.pos += 1
+            if tok == end:
+                break
+            if tok == "{":
+                commands.append((words, self.parse("}")))
+                words = []
+            elif tok in (",", ";", "!"):
+                if words:
+                    commands.append((words, None))
+                words = []
+            else:
+                words.append(tok)
+        if words:
+            commands.append((words, None))
+        return commands
+
+    def run(self) -> list:
+        """Run the script
+
+        Returns:
+            list[str]: output lines, starting with the header
+        """
+        try:
+            commands = self.parse()
+            self.batch = self.batch and TestScript.batchable(commands)
+            self.execute(commands)
+            self.flush()
+        finally: # what was output before a failure is still written, as the official simulator does
+            if self.output_file:
+                with open(self.output_file, "w") as f:
+                    f.write("".join(line + "\n" for line in self.lines))
+        return self.lines
+
+    def execute(self, commands: list) -> None:
+        for words, body in commands:
+            match words:
+                case ["repeat", count]:
+                    for _ in range(int(count)):
+                        self.execute(body)
+                case ["while", name, op, value]:
+                    self.press_key()
+                    for _ in range(TestScript.WHILE_LIMIT):
+                        if not self.condition(name, op, value):
+                            break
+                        self.execute(body)
+                    else:
+                        raise ValueError(f"while {name} {op} {value} never ended (waiting for keyboard input?)")
+                case ["load", hdl_file]:
+                    self.flush()
+                    self.simulator = HDLSimulator(Netlist(hdl_file.rpartition('.')[0], self.library))
+                    self.batcher = self.reference = None
+                    if self.batch:
+                        try:
+                            self.batcher = BatchEvaluator(self.simulator)
+                        except ValueError: # sequential, or no NumPy
+                            pass
+                    if self.reference_library and not self.batcher:
+                        self.reference = HDLSimulator(Netlist(hdl_file.rpartition('.')[0], self.reference_library))
+                case ["output-file", name]:
+                    self.output_file = os.path.join(self.directory, name)
+                case ["compare-to", name]:
+                    self.compare_file = os.path.join(self.directory, name)
+                case ["output-list", *specs]:
+                    self.output_list(specs)
+                case ["set", name, value] if self.batcher:
+                    if name not in self.simulator.netlist.inputs:
+                        raise ValueError(f"{self.simulator.netlist.chip.name} has no input pin {name}")
+                    self.inputs[name] = TestScript.parse_value(value) & ((1 << self.simulator.width(name)) - 1)
+                case ["set", name, value]:
+                    for simulator in self.simulators():
+                        simulator.set(name, TestScript.parse_value(value))
+                case ["eval"] if self.batcher:
+                    self.rows.append(dict(self.inputs))
+                case ["eval"]:
+                    for simulator in self.simulators():
+                        simulator.eval()
+                    self.cross_check()
+                case ["tick"]:
+                    for simulator in self.simulators():
+                        simulator.tick()
+                    self.cross_check()
+                case ["tock"]:
+                    for simulator in self.simulators():
+                        simulator.tock()
+                    self.cross_check()
+                case ["output"] if self.batcher:
+                    self.pending.append((len(self.lines), self.columns, dict(self.inputs), len(self.rows) - 1))
+                    self.lines.append("")
+                case ["output"]:
+                    line = self.format_row(self.columns, self.simulator.get)
+                    if self.reference:
+                        reference = self.format_row(self.columns, self.reference.get)
+                        if line != reference:
+                            raise ValueError(f"Cross-check failed at output line {len(self.lines) + 1}:\n"
+                                             f"{line} with builtin models\n{reference} at gate level")
+                    self.lines.append(line)
+                case ["echo", text]:
+                    print(text.strip('"'))
+                case ["clear-echo"]:
+                    pass
+                case [part, "load", file_name]:
+                    for simulator in self.simulators():
+                        model = simulator.model(part)
+                        if model is None or not hasattr(model, "load"):
+                            raise ValueError(f"{part} is not a builtin chip that can load a file")
+                        model.load(os.path.join(self.directory, file_name))
+                        simulator.dirty = True
+                case _:
+                    raise ValueError(f"{self.tst_file}: unsupported command `{' '.join(words)}`")
+
+    def press_key(self) -> None:
+        """Hold down the next scripted key on every keyboard"""
+        if not self.keys:
+            return
+        key = ord(self.keys.pop(0))
+        for simulator in self.simulators():
+            for model, _ in simulator.netlist.builtins:
+                if isinstance(model, Keyboard):
+                    model.key = key
+            simulator.dirty = True
+
+    def simulators(self) -> list:
+        return [self.simulator, self.reference] if self.reference else [self.simulator]
+
+    def cross_check(self) -> None:
+        """Compare the outputs of the simulator and the reference simulator"""
+        if not self.reference:
+            return
+        for pin in self.simulator.netlist.outputs:
+            value, expected = self.simulator.get(pin), self.reference.get(pin)
+            if value != expected:
+                time = f"{self.simulator.time}{'+' if self.simulator.ticked else ''}"
+                raise ValueError(f"Cross-check failed at time {time}: {pin} is {value} with builtin models, "
+                                 f"{expected} at gate level")
+
+    def output_list(self, specs: list) -> None:
+        self.columns = []
+        for spec in specs:
+            match = TestScript.FORMAT.match(spec)
+            if match is None:
+                raise ValueError(f"{self.tst_file}: bad output format {spec}")
+            name, fmt, left, width, right = match.groups()
+            bits = self.simulator.width(name) if name != "time" else 0
+            self.columns.append((name, fmt, int(left), int(width), int(right), bits))
+        for simulator in self.simulators():
+            simulator.watch([name for (name, *_) in self.columns if name != "time"])
+        cells = []
+        for name, _, left, width, right, _ in self.columns:
+            total = left + width + right
+            title = name[:total]
+            cells.append(title.rjust((total + len(title)) // 2).ljust(total))
+        self.lines.append("|" + "|".join(cells) + "|")
+
+    @staticmethod
+    def batchable(commands: list) -> bool:
+        """Whether a script only evaluates and outputs top-level pins, without clocking or waiting for anything"""
+        for words, body in commands:
+            if words[0] in ("tick", "tock", "while") or (words[0] == "output-list" and any("[" in spec for spec in words[1:])):
+                return False
+            if body is not None and not TestScript.batchable(body):
+                return False
+        return True
+
+    def flush(self) -> None:
+        """Evaluate the batched rows, and format the output lines waiting for them"""
+        if not self.batcher or not self.pending:
+            return
+        netlist = self.simulator.netlist
+        inputs = {pin: np.array([row.get(pin, 0) for row in self.rows], dtype=np.int64) for pin in netlist.inputs}
+        results = {pin: values.tolist() for (pin, values) in self.batcher.run(inputs, len(self.rows)).items()}
+        for number, columns, values, row in self.pending:
+            # outputs show the last eval before the output, and 0 before any
+            get = lambda name: values.get(name, 0) if name in netlist.inputs else results[name][row] if row >= 0 else 0
+            self.lines[number] = self.format_row(columns, get)
+        self.inputs, self.rows, self.pending = {}, [], []
+
+    def format_row(self, columns: list, get) -> str:
+        """Output line of the current time, with `get(name)` giving the value of each column"""
+        cells = []
+        for name, fmt, left, width, right, bits in columns:
+            if name == "time":
+                text = f"{self.simulator.time}{'+' if self.simulator.ticked else ''}"
+            else:
+                text = TestScript.format_value(get(name), fmt, width, bits)
+            cells.append(" " * left + (text.ljust(width) if fmt == "S" else text.rjust(width)) + " " * right)
+        return "|" + "|".join(cells) + "|"
+
+    def condition(self, name: str, op: str, value: str) -> bool:
+        actual = self.simulator.get(name)
+        if self.simulator.width(name) == 16:
+            actual = HDLSimulator.to_signed(actual)
+        expected = TestScript.parse_value(value)
+        match op:
+            case "=":
+                return actual == expected
+            case "<>":
+                return actual != expected
+            case "<":
+                return actual < expected
+            case ">":
+                return actual > expected
+            case "<=":
+                return actual <= expected
+            case ">=":
+                return actual >= expected
+        raise ValueError(f"{self.tst_file}: unknown comparison {op}")
+
+    @staticmethod
+    def parse_value(text: str) -> int:
+        """`%B0101`, `%X1F`, `%D-3` or a plain decimal"""
+        match text[:2]:
+            case "%B":
+                return int(text[2:], 2)
+            case "%X":
+                return int(text[2:], 16)
+            case "%D":
+                return int(text[2:])
+        return int(text)
+
+    @staticmethod
+    def format_value(value: int, fmt: str, width: int, bits: int) -> str:
+        match fmt:
+            case "B":
+                return format(value, f"0{bits}b")[-width:].rjust(width, "0")
+            case "X":
+                return format(value, f"0{width}X")
+        return str(HDLSimulator.to_signed(value) if bits == 16 else value)
+
+    def compare(self) -> int | None:
+        """Compare the output with the compare-to file, where cells of `*` match anything
+
+        Returns:
+            int | None: line number of the first mismatch, None if everything matches
+        """
+        with open(self.compare_file, "r") as f:
+            expected = [line.rstrip("\n") for line in f]
+        for number, (line, cmp_line) in enumerate(zip(self.lines, expected), 1):
+            cells, cmp_cells = line.split("|"), cmp_line.split("|")
+            if len(cells) != len(cmp_cells) or any(cell != cmp_cell and cmp_cell.strip("*") != ""
+                                                   for (cell, cmp_cell) in zip(cells, cmp_cells)):
+                return number
+        if len(self.lines) != len([line for line in expected if line]):
+            return min(len(self.lines), len(expected)) + 1
+        return None
+
+def main(tst_file: str, builtins: tuple = ChipLibrary.DEFAULT_BUILTINS, keys: str = "", batch: bool = False,
+         cross_check: tuple | None = None):
+    start = time.perf_counter()
+    script = TestScript(tst_file, builtins, keys, batch, cross_check is not None, cross_check or ())
+    try:
+        script.run()
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    stats = script.simulator.stats
+    run = f"{script.simulator.time} clock cycles" if not script.batch else "batched"
+    print(f"{stats.get('gates', 0)} gates, {stats.get('dffs', 0)} DFFs, {stats.get('builtins', 0)} builtin chips; "
+          f"{run} in {elapsed * 1000:.2f}ms")
+    if script.compare_file:
+        failure = script.compare()
+        if failure is not None:
+            print(f"Comparison failure at line {failure}")
+            sys.exit(1)
+        print("End of script - Comparison ended successfully")
+    if script.reference:
+        print("Cross-check against gate level: OK")
+
+if __name__ == "__main__":
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(flag[2:].partition("=")[::2] for flag in flags)
+    if len(args) != 1 or any(name not in ("builtin", "keys", "batch", "cross-check") for name in options):
+        print("Usage: python3 hdl_simulator.py [--builtin=<Chip>,...] [--keys=<keys pressed>] [--batch] "
+              "[--cross-check[=<Chip>,...]] <test.tst>")
+        sys.exit(1)
+    chip_lists = {name: tuple(chip for chip in value.split(",") if chip) for (name, value) in options.items()}
+    main(args[0], chip_lists.get("builtin", ChipLibrary.DEFAULT_BUILTINS), options.get("keys", ""), "batch" in options,
+         chip_lists.get("cross-check"))
@@ -1,15 +1,133 @@
+import glob
+import os
 import sys
-from assembler import Assembler 
+import time
+from concurrent.futures import ProcessPoolExecutor
+import assembler as assembler_module
+import optimizer as optimizer_module
+from assembler import Assembler, RomImage
+from build_cache import BuildCache
+from optimizer import PeepholeOptimizer
 
-def main(input_file: str, output_file: str | None = None):
+FLAGS = ("--map", "--bin", "--raw", "--optimize")
+
+def main(input_file: str, output_file: str | None = None, source_map: bool = False, fmt: str = "text",
+         cache: BuildCache | None = None, optimize: bool = False) -> bool:
+    """Assemble one file, or convert a .hack/.hackbin file to the other format
+
+    Returns:
+        bool: whether the output was served from the build cache
+    """
+    # .hack and .hackbin inputs are converted to the other format instead of assembled
+    if input_file.endswith(".hack"):
+        RomImage.text_to_binary(input_file, (output_file or input_file.rpartition('.')[0]) + ".hackbin", header=fmt != "raw")
+    elif input_file.endswith(".hackbin"):
+        RomImage.binary_to_text(input_file, (output_file or input_file.rpartition('.')[0]) + ".hack")
+    elif cache is None:
+        assemble(input_file, output_file, source_map, fmt, optimize)
+    else:
+        output_base = output_file if output_file else input_file.rpartition('.')[0]
+        # the "bin" format embeds its source map, the others write a .map sidecar
+        suffixes = [".hack" if fmt == "text" else ".hackbin"] + [".map"] * (source_map and fmt != "bin")
+        options = {"fmt": fmt, "source_map": source_map, "input": input_file if source_map else None, # maps record the input path
+                   "optimize": optimize}
+        with open(input_file, "rb") as f:
+            version = BuildCache.source_version(assembler_module.__file__, optimizer_module.__file__)
+            key = BuildCache.key("assembler", version, options, f.read())
+        if cache.fetch(key, output_base):
+            return True
+        assemble(input_file, output_file, source_map, fmt, optimize)
+        cache.store(key, output_base, suffixes)
+    return False
+
+def assemble(input_file: str, output_file: str | None, source_map: bool, fmt: str, optimize: bool) -> None:
     assembler = Assembler(input_file)
-    assembler.assemble(output_file=output_file)
+    if optimize:
+        print(f"{input_file} {PeepholeOptimizer.apply(assembler).report()}")
+    assembler.assemble(output_file=output_file, source_map=source_map, fmt=fmt)
+
+def is_pattern(arg: str) -> bool:
+    """Whether a command line argument names a directory or a glob rather than a single file"""
+    return os.path.isdir(arg) or glob.has_magic(arg)
+
+def collect_inputs(args: list) -> list:
+    """Expand directories (recursively) and globs into a sorted list of .asm files
+
+    Args:
+        args (list[str]): files, directories and glob patterns
+
+    Returns:
+        list[str]: .asm files to assemble, without duplicates
+    """
+    found = set()
+    for arg in args:
+        if os.path.isdir(arg):
+            found.update(glob.glob(os.path.join(arg, "**", "*.asm"), recursive=True))
+        elif glob.has_magic(arg):
+            found.update(path for path in glob.glob(arg, recursive=True) if path.endswith(".asm"))
+        else:
+            found.add(arg)
+    return sorted(found)
+
+def assemble_one(input_file: str, source_map: bool, fmt: str, cache_dir: str | None, optimize: bool = False) -> tuple:
+    """Worker: assemble a single file next to its source
+
+    Returns:
+        tuple[str, bool, float, str, bool]: input file, success, seconds taken, error message, cache hit
+    """
+    start = time.perf_counter()
+    cache = BuildCache(cache_dir) if cache_dir is not None else None
+    try:
+        hit = main(input_file, source_map=source_map, fmt=fmt, cache=cache, optimize=optimize)
+        return input_file, True, time.perf_counter() - start, "", hit
+    except Exception as e:
+        return input_file, False, time.perf_counter() - start, f"{type(e).__name__}: {e}", False
+
+def batch(inputs: list, source_map: bool = False, fmt: str = "text", jobs: int | None = None, cache_dir: str | None = None,
+          optimize: bool = False) -> list:
+    """Assemble many files in parallel, one task per file on a process pool
+
+    Args:
+        inputs (list[str]): .asm files
+        jobs (int | None, optional): worker processes. Defaults to None, one per core.
+        cache_dir (str | None, optional): build cache directory. Defaults to None, no caching.
+
+    Returns:
+        list[tuple[str, bool, float, str, bool]]: one `assemble_one` result per input, in input order
+    """
+    n = len(inputs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(assemble_one, inputs, [source_map] * n, [fmt] * n, [cache_dir] * n, [optimize] * n))
+
+def print_summary(results: list, elapsed: float) -> None:
+    for input_file, ok, seconds, error, hit in results:
+        status = "FAIL" if not ok else "hit" if hit else "ok"
+        print(f"{status:<4} {seconds:8.3f}s  {input_file}" + (f"  {error}" if error else ""))
+    failed = sum(not ok for (_, ok, _, _, _) in results)
+    hits = sum(hit for (_, _, _, _, hit) in results)
+    print(f"{len(results) - failed} assembled ({hits} from cache), {failed} failed in {elapsed:.3f}s")
 
 if __name__ == "__main__":
-    if len(sys.argv) not in (2, 3):
-        print("Usage: python assemble-script.py <input_file> <output_file>")
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    jobs = [int(flag.partition("=")[2]) for flag in flags if flag.startswith("--jobs=")]
+    cache_dirs = [flag.partition("=")[2] or BuildCache.DEFAULT_DIR for flag in flags if flag.partition("=")[0] == "--cache"]
+    flags = [flag for flag in flags if not flag.startswith(("--jobs=", "--cache"))]
+    if not args or any(flag not in FLAGS for flag in flags) or {"--bin", "--raw"} <= set(flags):
+        print("Usage: python assemble-script.py [--map] [--bin | --raw] [--optimize] [--cache[=DIR]] <input_file> <output_file>")
+        print("       python assemble-script.py [--map] [--bin | --raw] [--optimize] [--cache[=DIR]] [--jobs=N] <file | directory | glob>...")
         sys.exit(1)
-    if len(sys.argv) == 2:
-        main(sys.argv[1])
-    elif len(sys.argv) == 3:
-        main(sys.argv[1], sys.argv[2])
+    fmt = "bin" if "--bin" in flags else "raw" if "--raw" in flags else "text"
+    cache_dir = cache_dirs[0] if cache_dirs else None
+    if len(args) <= 2 and not any(is_pattern(arg) for arg in args) and not jobs:
+        cache = BuildCache(cache_dir) if cache_dir is not None else None
+        main(*args, source_map="--map" in flags, fmt=fmt, cache=cache, optimize="--optimize" in flags)
+        if cache is not None:
+            print(cache.report())
+    else:
+        start = time.perf_counter()
+        results = batch(collect_inputs(args), source_map="--map" in flags, fmt=fmt, jobs=jobs[0] if jobs else None, cache_dir=cache_dir,
+                        optimize="--optimize" in flags)
+        print_summary(results, time.perf_counter() - start)
+        if not results or not all(ok for (_, ok, _, _, _) in results):
+            sys.exit(1)
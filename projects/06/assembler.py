@@ -1,16 +1,43 @@
+from array import array
+from collections import ChainMap
+from collections.abc import Iterable, Iterator
 from enum import Enum, auto
+import io
+from itertools import product
+import json
+import mmap
+import os
 import re
+import struct
+import sys
+from types import MappingProxyType
 
 class Assembler:
     
-    def __init__(self, file: str) -> None:
+    def __init__(self, file: str, parser: "Parser | None" = None) -> None:
+        self.file = file
         self.filename, _, self.ext = file.rpartition('.')
-        self.parser = Parser(file)
+        self.parser = parser if parser is not None else Parser(file)
         self.symbol_table = SymbolTable()
         self.curr_ROM_addr = 0
-        self.num_commands = self.parser.num_commands
-        self.binaries = [0 for _ in range(self.num_commands)] # ROM
-        self.symbol_line_table: dict = {}
+        self.binaries = array('H') # ROM, one encoded word per instruction
+        self.fixups: list = [] # (ROM address, symbol) for A commands whose symbol wasn't known yet
+        self.label_refs: list = [] # ROM addresses of A commands already resolved to a label, for relocation
+        self.symbol_line_table: dict = {} # label -> ROM address, kept for source maps
+        self.rom_lines = array('I') # ROM address -> asm source line
+
+    @classmethod
+    def from_text(cls, source: str | Iterable[str], name: str = "<text>") -> "Assembler":
+        """Assembler over in-memory assembly code instead of a file
+
+        Args:
+            source (str | Iterable[str]): the program text, or its lines
+            name (str, optional): name standing in for the file path in messages and source maps. Defaults to "<text>".
+
+        Returns:
+            Assembler: assembler ready for `first_pass`
+        """
+        return cls(name, Parser(text=source))
 
     def convert_to_bin(arg: int) -> str:
         """Convert integer to 16-bit binary string
@@ -21,75 +48,241 @@ class Assembler:
         Returns:
             str: 16-bit binary representation of input integer
         """
-        return bin(arg)[2:].zfill(16)
+        return format(arg, '016b')
 
     def first_pass(self) -> None:
-        """Performs the first pass of the assembler on the target asm code.
-        In the first pass:
-            - All C commands are converted to binary according to the 'Code' module.
-            - A commands have constant memory addresses converted to binary, and variable addresses added to binaries file as their labels
+        """Performs the encoding pass of the assembler on the target asm code, as the parser streams it in.
+        In this pass:
+            - C commands are encoded to ints through the precomputed `Code.C_INSTR` table.
+            - A commands with constants or already known symbols are encoded directly; the rest are left as 0
+            and recorded as fixups.
             - Pseudocommands have their symbols added to the symbol table
+        No source text is kept: only the encoded words, the labels and the fixups.
         """
+        binaries = self.binaries
+        overlay, predefined = self.symbol_table.table.maps # looked up directly, ChainMap lookups are slow in this loop
         while self.parser.has_more_commands():
+            cmd = self.parser.current_cmd
             match self.parser.command_type():
                 case Command.A_COMMAND:
-                    cmd = self.parser.current_cmd.partition('@')[2]
-                    try:
-                        const_addr = int(cmd)
-                        self.binaries[self.curr_ROM_addr] = Assembler.convert_to_bin(const_addr)
-                    except:
-                        # This leaves all A commands with variables and labels as strings within the binaries list, which on the second pass will
-                        # be looked up on the symbol table
-                        self.binaries[self.curr_ROM_addr] = str(cmd) 
+                    symbol = cmd[1:]
+                    if symbol.isdigit():
+                        const_addr = int(symbol)
+                        if const_addr > 0x7FFF:
+                            raise ValueError(f"Constant {symbol} on line {self.parser.source_line} does not fit in 15 bits")
+                        binaries.append(const_addr)
+                    elif symbol in overlay:
+                        binaries.append(overlay[symbol])
+                        if symbol in self.symbol_line_table:
+                            self.label_refs.append(self.curr_ROM_addr)
+                    elif symbol in predefined:
+                        binaries.append(predefined[symbol])
+                    else: # Forward label reference or variable, resolved once all labels are known
+                        binaries.append(0)
+                        self.fixups.append((self.curr_ROM_addr, symbol))
+                    self.rom_lines.append(self.parser.source_line)
                     self.curr_ROM_addr += 1
 
                 case Command.C_COMMAND:
-                    c_mnem = self.parser.comp()
-                    dest_mnem = self.parser.dest()
-                    jump_mnem = self.parser.jump()
-                    c_bin = "111" + ( Code.comp(c_mnem) + Code.dest(dest_mnem) + Code.jump(jump_mnem) )
-                    self.binaries[self.curr_ROM_addr] = ( c_bin )
+                    try:
+                        binaries.append(Code.C_INSTR[self.parser.fields()])
+                    except KeyError:
+                        raise ValueError(f"Invalid C command {cmd} on line {self.parser.source_line}")
+                    self.rom_lines.append(self.parser.source_line)
                     self.curr_ROM_addr += 1
 
                 case Command.L_COMMAND:
-                    cmd = re.match(r'\((.*?)\)', self.parser.current_cmd).group(1)
-                    self.symbol_table.add_entry( cmd, addr=self.curr_ROM_addr )
+                    label = cmd[1:-1]
+                    self.symbol_table.add_entry( label, addr=self.curr_ROM_addr )
+                    self.symbol_line_table[label] = self.curr_ROM_addr
                     
             self.parser.advance()
 
     def second_pass(self) -> None:
-        """Performs the second pass of the assembler on the target asm code
-        In the second pass:
-            - All non-binary values, i.e. references to variable labels and pseudocommand labels, are looked up on the symbol table
-            and added if not present
-            - All addresses on the symbol table are converted to binary values and placed in the original labels' lines
-            - The list of binary commands is shortened to exclude lines assigned to pseudocommands
+        """Backpatches the fixups left by the first pass
+        In this pass:
+            - Each fixup symbol is looked up on the symbol table; symbols still missing are variables and get
+            the lowest available RAM address, in order of first use
         """
-        is_bin = lambda cmd: all(char in '01' for char in str( cmd )) and (len(str( cmd ))==16)
-        for i in range( len( self.binaries ) ):
-            if not is_bin(self.binaries[i]): # If line isn't binary, it must be an A-command pointing to a label
-                if self.symbol_table.contains(self.binaries[i]): # If the table contains the label, it should point to a ROM address with a label
-                    self.binaries[i] = Assembler.convert_to_bin(self.symbol_table.get_addr(self.binaries[i]))
-                else: # if the table doesn't contain the label, it should assign the lowest available addr in memory to the variable
-                    self.symbol_table.add_entry(self.binaries[i])
-                    self.binaries[i] = Assembler.convert_to_bin(self.symbol_table.get_addr(self.binaries[i]))
-
-        self.binaries = self.binaries[:self.curr_ROM_addr] # Drop unnecessary lines for pseudocommands
-
-    def assemble(self, output_file: str | None = None) -> None:
+        binaries = self.binaries
+        for rom_addr, symbol in self.fixups:
+            if not self.symbol_table.contains(symbol):
+                self.symbol_table.add_entry(symbol)
+            binaries[rom_addr] = self.symbol_table.get_addr(symbol)
+        self.fixups = []
+
+    def assemble(self, output_file: str | None = None, source_map: bool = False, fmt: str = "text") -> None:
         """Assemble asm code to binary file
 
         Args:
             output_file (str | None, optional): output file name. Defaults to None, such that output file has the same name as 
                 input file minus extension.
+            source_map (bool, optional): also write the source map; embedded in the image for the "bin" format,
+                as a `<output_file>.map` sidecar otherwise. Defaults to False.
+            fmt (str, optional): "text" for .hack, "bin" for a .hackbin image with header, "raw" for a headerless
+                .hackbin word image. Defaults to "text".
         """
         self.first_pass()
         self.second_pass()
         op = output_file if output_file else self.filename
         
-        with open(op + ".hack", "w") as f:
-            for cmd in self.binaries:
-                f.write(str(cmd) + '\n')
+        match fmt:
+            case "text":
+                with open(op + ".hack", "w") as f:
+                    f.writelines(RomImage.text_lines(self.binaries)) # no full-size string in memory
+            case "bin":
+                RomImage.write(op + ".hackbin", self.binaries, self.source_map() if source_map else None)
+                return
+            case "raw":
+                RomImage.write(op + ".hackbin", self.binaries, header=False)
+            case other:
+                raise ValueError(f"Unknown output format {other}, expected 'text', 'bin' or 'raw'")
+        if source_map:
+            self.write_source_map(op + ".map")
+
+    def source_map(self) -> dict:
+        """Source map of the assembled program
+
+        Returns:
+            dict: {"asm": asm file, "lines": asm line of each ROM address, "labels": label -> ROM address}
+        """
+        return {"asm": self.file, "lines": self.rom_lines.tolist(), "labels": self.symbol_line_table}
+
+    def write_source_map(self, map_file: str) -> None:
+        """Write the source map as compact JSON
+
+        Args:
+            map_file (str): output path
+        """
+        with open(map_file, "w") as f:
+            json.dump(self.source_map(), f, separators=(',', ':'))
+
+def assemble_text(source: str | Iterable[str]) -> array:
+    """Assemble in-memory assembly code without touching the filesystem
+
+    Every call gets its own symbol table layered over the shared predefined symbols, so it's safe to
+    call repeatedly from a long-running process.
+
+    Args:
+        source (str | Iterable[str]): the program text, or its lines
+
+    Returns:
+        array: ROM words, one uint16 per instruction
+    """
+    assembler = Assembler.from_text(source)
+    assembler.first_pass()
+    assembler.second_pass()
+    return assembler.binaries
+
+class RomImage:
+    """Packed binary ROM images: little-endian uint16 words, optionally after a 16-byte header of
+    magic, version, header size, word count and source map offset (0 if there is none).
+    An embedded source map is stored as JSON from its offset to the end of the file.
+    """
+
+    MAGIC = b'HACK'
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHII")
+
+    @staticmethod
+    def write(output_file: str, words, source_map: dict | None = None, header: bool = True) -> None:
+        """Write a ROM image
+
+        Args:
+            output_file (str): output path
+            words (Iterable[int]): ROM words
+            source_map (dict | None, optional): source map to embed, requires the header. Defaults to None.
+            header (bool, optional): write the header. Defaults to True.
+        """
+        data = RomImage.to_bytes(words, source_map, header)
+        with open(output_file, "wb") as f:
+            f.write(data)
+
+    @staticmethod
+    def to_bytes(words, source_map: dict | None = None, header: bool = True) -> bytes:
+        """The bytes of a ROM image, for writing in one go; arguments as for `write`"""
+        words = array('H', words)
+        if sys.byteorder == 'big':
+            words.byteswap()
+        parts = []
+        if header:
+            map_offset = RomImage.HEADER.size + 2 * len(words) if source_map is not None else 0
+            parts.append(RomImage.HEADER.pack(RomImage.MAGIC, RomImage.VERSION, RomImage.HEADER.size, len(words), map_offset))
+        elif source_map is not None:
+            raise ValueError("Embedding a source map requires the image header")
+        parts.append(words.tobytes())
+        if source_map is not None:
+            parts.append(json.dumps(source_map, separators=(',', ':')).encode('utf-8'))
+        return b"".join(parts)
+
+    @staticmethod
+    def load(image_file: str) -> tuple:
+        """Memory-map a ROM image, with or without header
+
+        Args:
+            image_file (str): image path
+
+        Returns:
+            tuple[memoryview, dict | None]: ROM words as a read-only uint16 view of the mapped file
+                (no copy on little-endian hosts) and the embedded source map if there is one
+        """
+        with open(image_file, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if f.seek(0, 2) else b''
+        start, count, source_map = 0, len(mm) // 2, None
+        header = RomImage.read_header(mm)
+        if header is not None:
+            version, start, count, map_offset = header
+            if version != RomImage.VERSION:
+                raise ValueError(f"{image_file} has ROM image version {version}, expected {RomImage.VERSION}")
+            if map_offset:
+                source_map = json.loads(bytes(mm[map_offset:]).decode('utf-8'))
+        words = memoryview(mm)[start:start + 2 * count].cast('H')
+        if sys.byteorder == 'big':
+            swapped = array('H', words)
+            swapped.byteswap()
+            words = memoryview(swapped)
+        return words, source_map
+
+    @staticmethod
+    def read_header(data) -> tuple | None:
+        """Header fields of an image, or None if it's headerless. A headerless image can start with the
+        magic bytes too (`@16712` then `@19267`), so the header's size and word count must also match the file.
+
+        Returns:
+            tuple[int, int, int, int] | None: version, header size, word count and source map offset
+        """
+        if len(data) < RomImage.HEADER.size or data[:len(RomImage.MAGIC)] != RomImage.MAGIC:
+            return None
+        _, version, start, count, map_offset = RomImage.HEADER.unpack_from(data, 0)
+        end = start + 2 * count
+        if start != RomImage.HEADER.size or (map_offset != end if map_offset else len(data) != end):
+            return None
+        return version, start, count, map_offset
+
+    @staticmethod
+    def numpy_view(image_file: str):
+        """Zero-copy NumPy uint16 view of a ROM image's words"""
+        import numpy as np
+        words, _ = RomImage.load(image_file)
+        return np.frombuffer(words, dtype='<u2')
+
+    @staticmethod
+    def text_lines(words) -> Iterator[str]:
+        """Lines of the text .hack format: one 16-char binary word per line"""
+        return (format(word, '016b') + '\n' for word in words)
+
+    @staticmethod
+    def text_to_binary(hack_file: str, image_file: str, header: bool = True) -> None:
+        """Convert a text .hack file to a ROM image"""
+        with open(hack_file, "r") as f:
+            RomImage.write(image_file, (int(line, 2) for line in f if line.strip()), header=header)
+
+    @staticmethod
+    def binary_to_text(image_file: str, hack_file: str) -> None:
+        """Convert a ROM image back to a text .hack file"""
+        words, _ = RomImage.load(image_file)
+        with open(hack_file, "w") as f:
+            f.writelines(RomImage.text_lines(words))
 
 class Command(Enum):
     """Command enum for identifying A, C, and L commands
@@ -100,48 +293,78 @@ class Command(Enum):
 
 class Parser:
 
-    def __init__(self, input_file: str) -> None:
-        """Opens the input file and gets ready to parse it
+    def __init__(self, input_file: str | None = None, text: str | Iterable[str] | None = None) -> None:
+        """Opens the input file, or takes in-memory code, and gets ready to parse it.
+        Commands are read lazily, one at a time, as the parser advances.
 
         Args:
-            input_file (str): assembly file path
+            input_file (str | None, optional): assembly file path. Defaults to None.
+            text (str | Iterable[str] | None, optional): assembly code, as one string or as lines, used
+                instead of a file. Defaults to None.
         """
-        self.line = 0
-        self.commands = []
-
-        with open(input_file, "r") as asm:
-            for cmd in asm:
-                assert(cmd is not None)
-                cmd_no_ws = cmd.strip()
-                cmd_no_comment, _, _ = cmd_no_ws.partition("//")
-                if len( cmd_no_comment ) > 0:
-                    self.commands.append(cmd_no_comment)
-
-        self.num_commands = len(self.commands)
-
-        try:
-            self.current_cmd = self.commands[self.line]
-        except IndexError:
+        if text is not None:
+            lines = io.StringIO(text) if isinstance(text, str) else text
+        else:
+            lines = Parser.read_lines(input_file)
+        self.stream = Parser.read(lines) # (source line, command) pairs
+        self.line = -1 # index of the current command
+        self.advance()
+        if not self.has_more_commands():
             raise IndexError("Command list has length 0")
 
+    @staticmethod
+    def read_lines(input_file: str) -> Iterator[str]:
+        """Yield the lines of a file one at a time from a read-only memory map"""
+        with open(input_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0: # empty files can't be mapped
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    yield line.decode()
+
+    @staticmethod
+    def read(lines: Iterable[str]) -> Iterator[tuple]:
+        """Yield (1-based source line, command) for every line holding a command"""
+        for line_no, cmd in enumerate(lines, start=1):
+            assert(cmd is not None)
+            cmd_no_comment, _, _ = cmd.partition("//")
+            cmd_no_ws = cmd_no_comment.strip() # Strip after removing comments so inline comments don't leave trailing spaces
+            if len( cmd_no_ws ) > 0:
+                yield line_no, cmd_no_ws
+
+    def remaining(self) -> list:
+        """Read the rest of the input into memory
+
+            Returns:
+                list[tuple[int, str]]: (source line, command) pairs, starting with the current command
+        """
+        pending = [(self.source_line, self.current_cmd)] if self.has_more_commands() else []
+        pending.extend(self.stream)
+        self.current_cmd = None
+        return pending
+
+    def replace(self, commands: Iterable[tuple]) -> None:
+        """Parse the given (source line, command) pairs instead of the rest of the input"""
+        self.stream = iter(commands)
+        self.line = -1
+        self.advance()
 
     def __str__(self) -> str:
-        return str( self.commands )
+        return f"Parser at line {self.source_line}: {self.current_cmd}"
 
     def has_more_commands(self) -> bool:
         """Boolean for whether there are more commands in the input
 
             Returns:
-                bool: comparison between current line and length of commands
+                bool: whether a current command was read
         """
-        return self.line < self.num_commands
+        return self.current_cmd is not None
 
     def advance(self) -> None:
         """Reads the next comand from the input and makes it the current command 
         """
         self.line += 1 # I am extremely dumb
-        if self.has_more_commands():
-            self.current_cmd = self.commands[self.line]
+        self.source_line, self.current_cmd = next(self.stream, (None, None))
 
     def command_type(self) -> Command:
         """Returns teh type of the current command
@@ -193,6 +416,18 @@ class Parser:
             else:
                 return self.current_cmd
             
+    def fields(self) -> tuple:
+        """Splits the current C-command into its mnemonics in one go
+
+            Returns:
+                tuple[str | None, str, str | None]: (dest, comp, jump) mnemonics, absent parts as None
+        """
+        dest, sep, rest = self.current_cmd.partition('=')
+        if not sep:
+            dest, rest = None, dest
+        comp, _, jump = rest.partition(';')
+        return (dest.strip() if dest else None, comp.strip(), jump.strip() or None)
+
     def jump(self) -> str | None:
         """Returns the jump mnemonic in the current C-command
 
@@ -269,9 +504,16 @@ class Code:
     def jump(cmd: str | None) -> str:
         return Code.JUMP[cmd]
 
+# (dest, comp, jump) -> encoded C-instruction word, for every valid combination
+Code.C_INSTR = {
+    (d, c, j): int("111" + Code.COMP[c] + Code.DEST[d] + Code.JUMP[j], 2)
+    for (d, c, j) in product(Code.DEST, Code.COMP, Code.JUMP)
+}
+
 class SymbolTable:
 
-    PREDEF_SYMBOLS = {
+    # Read-only, shared by every table; each table writes its labels and variables to its own overlay
+    PREDEF_SYMBOLS = MappingProxyType({
         "SP": 0,
         "LCL": 1,
         "ARG": 2,
@@ -280,16 +522,16 @@ class SymbolTable:
         "SCREEN": 16384,
         "KBD": 24576,
         **{k:v for (k,v) in zip(list("R" + str(i) for i in range(0, 16)), range(0,16))}
-    }
+    })
 
     def __init__(self):
-        self.table: dict = SymbolTable.PREDEF_SYMBOLS
+        self.table = ChainMap({}, SymbolTable.PREDEF_SYMBOLS) # labels and variables never leak between assemblies
         self.curr_ram_addr = 16
         
     def add_entry(self, symbol: str, addr: int | None = None) -> None:
         """Adds a pair (symbol, addr) to symbol table
         """
-        if addr:
+        if addr is not None: # Labels can point to ROM address 0
             self.table[symbol] = addr
         else:
             self.table[symbol] = self.curr_ram_addr
@@ -0,0 +1,360 @@
+import re
+import sys
+import numpy as np
+from hack_machine import HackMachine
+
+class BatchHackMachine:
+    """Runs N copies of the same Hack program in lockstep with NumPy.
+
+    State is an N x 32768 RAM matrix plus A, D and PC vectors. RAM is stored address-major
+    (32768 x N) and exposed transposed, since instances in lockstep touch the same address at once.
+    `step` executes the instruction at each distinct PC once, over the mask of instances currently
+    sitting on that PC, so diverging control flow costs one vectorized update per distinct PC rather
+    than one per instance. `run` goes a basic block at a time: instances are grouped by PC once per
+    round and each group runs the block at its PC as one generated function over its columns.
+    """
+
+    # Vectorized comp functions over uint16 columns; uint16 arithmetic wraps like the Hack ALU
+    COMP_FUNC = {
+        '0': lambda a, d, m: np.zeros_like(d),
+        '1': lambda a, d, m: np.ones_like(d),
+        '-1': lambda a, d, m: np.full_like(d, 0xFFFF),
+        'D': lambda a, d, m: d.copy(),
+        'A': lambda a, d, m: a.copy(),
+        '!D': lambda a, d, m: ~d,
+        '!A': lambda a, d, m: ~a,
+        '-D': lambda a, d, m: np.negative(d),
+        '-A': lambda a, d, m: np.negative(a),
+        'D+1': lambda a, d, m: d + np.uint16(1),
+        'A+1': lambda a, d, m: a + np.uint16(1),
+        'D-1': lambda a, d, m: d - np.uint16(1),
+        'A-1': lambda a, d, m: a - np.uint16(1),
+        'D+A': lambda a, d, m: d + a,
+        'D-A': lambda a, d, m: d - a,
+        'A-D': lambda a, d, m: a - d,
+        'D&A': lambda a, d, m: d & a,
+        'D|A': lambda a, d, m: d | a,
+        'M': lambda a, d, m: m,
+        '!M': lambda a, d, m: ~m,
+        '-M': lambda a, d, m: np.negative(m),
+        'M+1': lambda a, d, m: m + np.uint16(1),
+        'M-1': lambda a, d, m: m - np.uint16(1),
+        'D+M': lambda a, d, m: d + m,
+        'D-M': lambda a, d, m: d - m,
+        'M-D': lambda a, d, m: m - d,
+        'D&M': lambda a, d, m: d & m,
+        'D|M': lambda a, d, m: d | m,
+    }
+
+    # The same comps as expressions over the a, d and m columns, for generated block code
+    COMP_EXPR = {
+        '0': '0', '1': '1', '-1': '0xFFFF',
+        'D': 'd', 'A': 'a', '!D': '~d', '!A': '~a', '-D': '-d', '-A': '-a',
+        'D+1': 'd + 1', 'A+1': 'a + 1', 'D-1': 'd - 1', 'A-1': 'a - 1',
+        'D+A': 'd + a', 'D-A': 'd - a', 'A-D': 'a - d', 'D&A': 'd & a', 'D|A': 'd | a',
+        'M': 'm', '!M': '~m', '-M': '-m', 'M+1': 'm + 1', 'M-1': 'm - 1',
+        'D+M': 'd + m', 'D-M': 'd - m', 'M-D': 'm - d', 'D&M': 'd & m', 'D|M': 'd | m',
+    }
+    REGISTER = re.compile(r'\b[ad]\b')
+
+    # Conditional jump masks over the unsigned `out` column of generated code (values >= 0x8000 are negative)
+    JUMP_MASK = {
+        'JGT': '(out != 0) & (out < 0x8000)',
+        'JEQ': 'out == 0',
+        'JGE': 'out < 0x8000',
+        'JLT': 'out >= 0x8000',
+        'JNE': 'out != 0',
+        'JLE': '(out == 0) | (out >= 0x8000)',
+    }
+
+    # Jump conditions over the ALU output reinterpreted as int16
+    JUMP_FUNC = {
+        'JGT': lambda out: out > 0,
+        'JEQ': lambda out: out == 0,
+        'JGE': lambda out: out >= 0,
+        'JLT': lambda out: out < 0,
+        'JNE': lambda out: out != 0,
+        'JLE': lambda out: out <= 0,
+        'JMP': lambda out: np.ones(out.shape, dtype=bool),
+    }
+
+    def __init__(self, program, n: int, stop_at_halt_loop: bool = True) -> None:
+        """Create `n` machines with zeroed RAM sharing one ROM
+
+        Args:
+            program (Iterable[int | str]): ROM words as ints or 16-char binary strings
+            n (int): number of instances
+            stop_at_halt_loop (bool, optional): retire an instance once it reaches the `(END) @END 0;JMP`
+                idiom that Hack programs end with. Defaults to True.
+        """
+        self.rom = np.array([HackMachine.to_word(w) for w in program], dtype=np.uint16)
+        self.fields = [HackMachine.decode_fields(int(w)) for w in self.rom]
+        self.n = n
+        self.memory = np.zeros((HackMachine.RAM_SIZE, n), dtype=np.uint16)
+        self.A = np.zeros(n, dtype=np.uint16)
+        self.D = np.zeros(n, dtype=np.uint16)
+        self.pc = np.zeros(n, dtype=np.int64)
+        self.cycles = np.zeros(n, dtype=np.int64)
+        self.halt_addrs = np.array(sorted(self.find_halt_loops()) if stop_at_halt_loop else [], dtype=np.int64)
+        self.stops = np.zeros(0x10000, dtype=bool) # PCs an instance stops at: halt loops and everything past the ROM
+        self.stops[self.halt_addrs] = True
+        self.stops[len(self.rom):] = True
+        self.leaders = HackMachine.find_leaders(self.rom.tolist())
+        self.blocks: dict = {} # entry pc -> (block function, instruction count)
+
+    @classmethod
+    def from_hack(cls, hack_file: str, n: int, **kwargs) -> "BatchHackMachine":
+        with open(hack_file, "r") as f:
+            return cls([line for line in (l.strip() for l in f) if line], n, **kwargs)
+
+    @classmethod
+    def from_asm(cls, asm_file: str, n: int, **kwargs) -> "BatchHackMachine":
+        return cls(HackMachine.from_asm(asm_file).rom, n, **kwargs)
+
+    def find_halt_loops(self) -> set:
+        """ROM addresses `p` holding `@p` followed by an unconditional jump, i.e. a program's final infinite loop"""
+        halts = set()
+        for p in range(len(self.fields) - 1):
+            nxt = self.fields[p + 1]
+            if self.fields[p] == ("A", p) and nxt[0] == "C" and nxt[2] is None and nxt[3] == "JMP":
+                halts.add(p)
+        return halts
+
+    @property
+    def ram(self) -> np.ndarray:
+        """RAM of every instance as an (n, 32768) view"""
+        return self.memory.T
+
+    def set_ram(self, addr: int, values) -> None:
+        """Set RAM[addr] of every instance; values are broadcast and stored in two's complement
+
+        Args:
+            addr (int): RAM address
+            values (int | array-like): one value, or one value per instance
+        """
+        self.memory[addr] = np.asarray(values, dtype=np.int64) & HackMachine.WORD_MASK
+
+    def active(self) -> np.ndarray:
+        """Mask of instances that haven't left the ROM or reached a halt loop"""
+        return ~self.stops[self.pc]
+
+    def execute(self, addr: int, rows) -> None:
+        """Execute ROM[addr] on the given instances
+
+        Args:
+            addr (int): ROM address all selected instances are sitting on
+            rows (slice | np.ndarray): instance selector
+        """
+        fields = self.fields[addr]
+        if fields[0] == "A":
+            self.A[rows] = fields[1]
+            self.pc[rows] += 1
+            return
+        _, comp, dest, jump = fields
+        dest = dest or ""
+        a = self.A[rows].copy() # a slice selector would give a view that the A write below clobbers
+        d = self.D[rows]
+        row_idx = np.arange(self.n)[rows]
+        m = self.memory[a, row_idx] if "M" in comp else None
+        out = BatchHackMachine.COMP_FUNC[comp](a, d, m)
+        if "M" in dest:
+            self.memory[a, row_idx] = out
+        if "A" in dest:
+            self.A[rows] = out
+        if "D" in dest:
+            self.D[rows] = out
+        if jump:
+            taken = BatchHackMachine.JUMP_FUNC[jump](out.view(np.int16))
+            self.pc[rows] = np.where(taken, a.astype(np.int64), self.pc[rows] + 1)
+        else:
+            self.pc[rows] += 1
+
+    def compile_block(self, entry: int) -> tuple:
+        """Translate the basic block at `entry` into one function over a group of instances' columns.
+
+        A and D are held in locals for the whole block and written back once at its end. Register values
+        that are known statically (A after an A-instruction, or any constant result) are folded into the
+        code, so `@R1 D=D+M` reads the row of R1 directly rather than gathering through A.
+
+        Args:
+            entry (int): ROM address of the first instruction in the block
+
+        Returns:
+            tuple: (function (memory, A, D, pc, cycles, rows, cols) -> None, number of instructions)
+        """
+        body = []
+        known = {"a": None, "d": None} # statically known register values
+        loaded = set() # registers read from the state arrays before the block assigns them
+        assigned = set()
+        addr = entry
+        size = len(self.fields)
+        exit_pc = None # where an unconditional jump goes
+        branches = False # whether the block ends in a conditional jump, which sets the PC itself
+
+        def operand(name: str) -> str:
+            if known[name] is not None:
+                return str(known[name])
+            if name not in assigned:
+                loaded.add(name)
+            return name
+
+        while addr < size:
+            fields = self.fields[addr]
+            addr += 1
+            if fields[0] == "A":
+                known["a"] = fields[1]
+            else:
+                _, comp, dest, jump = fields
+                dest = dest or ""
+                expr = BatchHackMachine.COMP_EXPR[comp]
+                a_ref = operand("a") if "M" in comp or "M" in dest or jump else None
+                if jump and "A" in dest and a_ref == "a":
+                    body.append("    target = a") # jumps go to the A from before this instruction
+                    a_ref = "target"
+                if "m" in expr:
+                    body.append(f"    m = memory[{a_ref}, cols]")
+                value = None
+                if "m" not in expr and all(known[name] is not None for name in BatchHackMachine.REGISTER.findall(expr)):
+                    value = eval(HackMachine.COMP_EXPR[comp], {"A": known["a"], "D": known["d"]}) # constant result
+                    out = str(value)
+                else:
+                    body.append(f"    out = {BatchHackMachine.REGISTER.sub(lambda match: operand(match.group()), expr)}")
+                    out = "out"
+                if "M" in dest:
+                    body.append(f"    memory[{a_ref}, {'rows' if known['a'] is not None else 'cols'}] = {out}")
+                for reg in ("a", "d"):
+                    if reg.upper() in dest:
+                        known[reg] = value
+                        if value is None:
+                            body.append(f"    {reg} = out")
+                            assigned.add(reg)
+                if jump:
+                    if value is not None and jump != "JMP":
+                        jump = "JMP" if eval(HackMachine.JUMP_EXPR[jump], {"out": value}) else None
+                    if jump == "JMP":
+                        exit_pc = a_ref
+                    elif jump:
+                        body.append(f"    pc[rows] = np.where({BatchHackMachine.JUMP_MASK[jump]}, {a_ref}, {addr})")
+                        branches = True
+                    break
+            if addr in self.leaders:
+                break
+        lines = ["def block(memory, A, D, pc, cycles, rows, cols):"]
+        lines.extend(f"    {reg} = {reg.upper()}[cols]" for reg in sorted(loaded)) # copies, so write-backs can't alias them
+        lines.extend(body)
+        if not branches:
+            lines.append(f"    pc[rows] = {exit_pc if exit_pc is not None else addr}")
+        for reg in ("a", "d"):
+            if known[reg] is not None:
+                lines.append(f"    {reg.upper()}[rows] = {known[reg]}")
+            elif reg in assigned:
+                lines.append(f"    {reg.upper()}[rows] = {reg}")
+        lines.append(f"    cycles[rows] += {addr - entry}")
+        namespace: dict = {"np": np}
+        exec("\n".join(lines), namespace)
+        return namespace["block"], addr - entry
+
+    def step(self) -> int:
+        """Execute one instruction on every active instance
+
+        Returns:
+            int: number of instances that executed an instruction
+        """
+        active = self.active()
+        if active.all():
+            first = self.pc[0]
+            if (self.pc == first).all(): # Fast path: all instances in lockstep
+                self.execute(int(first), slice(None))
+                self.cycles += 1
+                return self.n
+        rows = np.nonzero(active)[0]
+        if len(rows) == 0:
+            return 0
+        pcs = self.pc[rows]
+        for addr in np.unique(pcs):
+            self.execute(int(addr), rows[pcs == addr])
+        self.cycles[rows] += 1
+        return len(rows)
+
+    def run(self, max_cycles: int) -> np.ndarray:
+        """Run all instances until they all halt or each has executed `max_cycles` more instructions.
+        Every round groups the active instances by PC and runs the basic block at each PC over its group;
+        an instance whose next block doesn't fit in its remaining budget single-steps instead.
+
+        Args:
+            max_cycles (int): instruction budget per instance
+
+        Returns:
+            np.ndarray: instructions executed per instance in this call
+        """
+        start = self.cycles.copy()
+        limit = start + max_cycles
+        while True:
+            rows = np.flatnonzero(self.active() & (self.cycles < limit))
+            if len(rows) == 0:
+                break
+            pcs = self.pc[rows]
+            if pcs.min() == pcs.max():
+                groups = [(int(pcs[0]), rows)]
+            else:
+                order = np.argsort(pcs, kind="stable")
+                rows, pcs = rows[order], pcs[order]
+                bounds = np.flatnonzero(pcs[1:] != pcs[:-1]) + 1
+                groups = zip(pcs[np.r_[0, bounds]].tolist(), np.split(rows, bounds))
+            for addr, group in groups:
+                block = self.blocks.get(addr)
+                if block is None:
+                    block = self.blocks[addr] = self.compile_block(addr)
+                fn, n = block
+                fits = self.cycles[group] + n <= limit[group]
+                if not fits.all():
+                    tail = group[~fits]
+                    self.execute(addr, tail)
+                    self.cycles[tail] += 1
+                    group = group[fits]
+                    if len(group) == 0:
+                        continue
+                fn(self.memory, self.A, self.D, self.pc, self.cycles, slice(None) if len(group) == self.n else group, group)
+        return self.cycles - start
+
+    def results(self, addrs) -> np.ndarray:
+        """Signed RAM values at `addrs` for every instance, shaped (n, len(addrs))"""
+        return self.memory[addrs].T.view(np.int16)
+
+    @classmethod
+    def sweep(cls, program, inputs: dict, outputs: list, max_cycles: int) -> np.ndarray:
+        """Run one instance per input row and collect the output cells
+
+        Args:
+            program (Iterable[int | str]): ROM words
+            inputs (dict): RAM address -> array of per-instance initial values, all of the same length
+            outputs (list): RAM addresses to read back after the run
+            max_cycles (int): step budget
+
+        Returns:
+            np.ndarray: signed output values shaped (n, len(outputs))
+        """
+        n = len(next(iter(inputs.values())))
+        batch = cls(program, n)
+        for addr, values in inputs.items():
+            batch.set_ram(addr, values)
+        batch.run(max_cycles)
+        return batch.results(outputs)
+
+def main(input_file: str, n: int = 1000, max_cycles: int = 100_000):
+    if input_file.endswith(".asm"):
+        program = HackMachine.from_asm(input_file).rom
+    else:
+        program = HackMachine.from_hack(input_file).rom
+    rng = np.random.default_rng(0)
+    inputs = {0: rng.integers(0, 128, n), 1: rng.integers(0, 128, n)}
+    results = BatchHackMachine.sweep(program, inputs, [0, 1, 2], max_cycles)
+    print("R0 R1 R2")
+    for row in results[:10]:
+        print(" ".join(str(v) for v in row))
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3, 4):
+        print("Usage: python batch_machine.py <input_file.hack|input_file.asm> <instances> <max_cycles>")
+        sys.exit(1)
+    main(sys.argv[1], *(int(arg) for arg in sys.argv[2:]))
@@ -0,0 +1,115 @@
+import json
+import os
+import resource
+import sys
+import time
+import zlib
+from assembler import Assembler
+from hack_machine import HackMachine
+
+class Benchmark:
+    """Deterministic throughput benchmark on the Pong programs.
+
+    Assembles each program, checks the result against its golden .hack file, then runs it
+    headless for a fixed cycle budget while replaying a keyboard script through KBD.
+    """
+
+    ROOT = os.path.dirname(os.path.abspath(__file__))
+    PROGRAMS = ["pong/Pong.asm", "pong/PongL.asm"] # relative to ROOT
+    KEY_SCRIPT = os.path.join(ROOT, "pong/Pong.keys")
+    KBD = "KBD"
+
+    def __init__(self, max_cycles: int = 10_000_000, key_script: str | None = None, modes: tuple = ("blocks", "interp")) -> None:
+        self.max_cycles = max_cycles
+        self.keys = Benchmark.load_keys(key_script if key_script else Benchmark.KEY_SCRIPT)
+        self.modes = modes
+
+    @staticmethod
+    def load_keys(key_script: str) -> list:
+        """Read a keyboard script of `<cycle> <key code>` lines, `//` comments allowed
+
+        Returns:
+            list[tuple[int, int]]: (cycle, key code) events sorted by cycle
+        """
+        events = []
+        with open(key_script, "r") as f:
+            for line in f:
+                fields = line.partition("//")[0].split()
+                if fields:
+                    events.append((int(fields[0]), int(fields[1])))
+        return sorted(events)
+
+    def assemble(self, asm_file: str) -> tuple:
+        """Assemble in memory and compare with the golden .hack next to the source
+
+        Returns:
+            tuple[array, float]: ROM words and assembly time in seconds
+        """
+        start = time.perf_counter()
+        assembler = Assembler(asm_file)
+        assembler.first_pass()
+        assembler.second_pass()
+        elapsed = time.perf_counter() - start
+        with open(asm_file.rpartition('.')[0] + ".hack", "r") as f:
+            golden = [int(line, 2) for line in f if line.strip()]
+        if assembler.binaries.tolist() != golden:
+            raise AssertionError(f"{asm_file} does not assemble to its golden .hack file")
+        return assembler.binaries, elapsed
+
+    def replay(self, machine: HackMachine, mode: str) -> float:
+        """Run `machine` for the cycle budget, feeding the keyboard script
+
+        Returns:
+            float: run time in seconds
+        """
+        run = machine.run_blocks if mode == "blocks" else machine.run
+        start = time.perf_counter()
+        for cycle, key in self.keys:
+            if cycle >= self.max_cycles:
+                break
+            run(cycle - machine.cycles)
+            machine.poke(Benchmark.KBD, key)
+        run(self.max_cycles - machine.cycles)
+        return time.perf_counter() - start
+
+    def run(self) -> dict:
+        """Run every program in every mode
+
+        Returns:
+            dict: machine-readable results
+        """
+        results = {"max_cycles": self.max_cycles, "programs": {}}
+        for asm_file in Benchmark.PROGRAMS:
+            rom, asm_time = self.assemble(os.path.join(Benchmark.ROOT, asm_file))
+            entry = {"rom_words": len(rom), "assemble_seconds": round(asm_time, 4), "modes": {}}
+            for mode in self.modes:
+                machine = HackMachine(rom)
+                elapsed = self.replay(machine, mode)
+                entry["modes"][mode] = {
+                    "cycles": machine.cycles,
+                    "seconds": round(elapsed, 4),
+                    "instructions_per_second": round(machine.cycles / elapsed),
+                    "ram_crc32": zlib.crc32(machine.ram.tobytes()), # same value in every mode and run
+                }
+            results["programs"][asm_file] = entry
+        results["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return results
+
+def main(max_cycles: int = 10_000_000, output_file: str | None = None):
+    results = Benchmark(max_cycles).run()
+    if output_file:
+        with open(output_file, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (1, 2, 3):
+        print("Usage: python benchmark.py <max_cycles> <output_file.json>")
+        sys.exit(1)
+    if len(sys.argv) == 1:
+        main()
+    elif len(sys.argv) == 2:
+        main(int(sys.argv[1]))
+    elif len(sys.argv) == 3:
+        main(int(sys.argv[1]), sys.argv[2])
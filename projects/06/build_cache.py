@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+class BuildCache:
+    """Content-addressed on-disk cache for toolchain outputs.
+
+    An entry is keyed by a hash of the tool name, the tool version, its options and the input
+    bytes, and holds every output file of one run, stored by suffix (".hack", ".map", ".asm", ...).
+    Hits bump the entry's mtime, and once the cache outgrows `max_bytes` the least recently
+    used entries are evicted.
+    """
+
+    DEFAULT_DIR = ".hackcache"
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, root: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.root = root if root else BuildCache.DEFAULT_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def source_version(*source_files: str) -> str:
+        """Version string for a tool: the hash of its source files, so editing the tool invalidates its entries"""
+        digest = hashlib.sha256()
+        for source_file in source_files:
+            with open(source_file, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def key(tool: str, version: str, options: dict, data: bytes) -> str:
+        """Cache key of one tool run
+
+        Args:
+            tool (str): tool name
+            version (str): tool version
+            options (dict): options that affect the output, JSON-serializable
+            data (bytes): input file contents
+
+        Returns:
+            str: hex digest
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps([tool, version, options], sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(data)
+        return digest.hexdigest()
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> dict | None:
+        """Look up an entry, marking it as recently used
+
+        Returns:
+            dict | None: suffix -> file contents, or None on a miss
+        """
+        entry = self.entry_dir(key)
+        try:
+            outputs = {}
+            for suffix in os.listdir(entry):
+                with open(os.path.join(entry, suffix), "rb") as f:
+                    outputs[suffix] = f.read()
+            os.utime(entry)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return outputs
+
+    def put(self, key: str, outputs: dict) -> None:
+        """Store an entry atomically, then evict down to the size bound
+
+        Args:
+            key (str): cache key
+            outputs (dict): suffix -> file contents
+        """
+        entry = self.entry_dir(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(entry)) # concurrent writers each stage their own copy
+        for suffix, data in outputs.items():
+            with open(os.path.join(staging, suffix), "wb") as f:
+                f.write(data)
+        try:
+            os.rename(staging, entry)
+        except OSError: # another process stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def entries(self) -> list:
+        """All entries as (last use, size, path), oldest first"""
+        result = []
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                entry = os.path.join(shard_dir, name)
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                    result.append((os.path.getmtime(entry), size, entry))
+                except OSError: # removed or still being staged by another process
+                    continue
+        return sorted(result)
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in `max_bytes`"""
+        entries = self.entries()
+        total = sum(size for (_, size, _) in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def fetch(self, key: str, output_base: str) -> bool:
+        """On a hit, write the cached outputs to `output_base + suffix`
+
+        Returns:
+            bool: whether the entry was found
+        """
+        outputs = self.get(key)
+        if outputs is None:
+            return False
+        for suffix, data in outputs.items():
+            with open(output_base + suffix, "wb") as f:
+                f.write(data)
+        return True
+
+    def store(self, key: str, output_base: str, suffixes: list) -> None:
+        """Store the freshly produced files `output_base + suffix` under `key`"""
+        outputs = {}
+        for suffix in suffixes:
+            with open(output_base + suffix, "rb") as f:
+                outputs[suffix] = f.read()
+        self.put(key, outputs)
+
+    def report(self) -> str:
+        return f"cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
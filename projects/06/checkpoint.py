@@ -0,0 +1,109 @@
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+from hack_machine import HackMachine
+
+class Checkpoint:
+    """Fixed-layout binary snapshots of a HackMachine.
+
+    Layout (all little-endian):
+        offset 0       header: magic, version, A, D, PC, ROM word count, cycle count (32 bytes)
+        offset 32      RAM: 32768 uint16 words
+        offset 65568   ROM: uint16 words, the same raw word image as the binary .hack output
+
+    Every section sits at a fixed or header-given offset, so restoring is a matter of
+    mapping the file and copying the sections out, with no parsing.
+    """
+
+    MAGIC = b'HACKCKPT'
+    VERSION = 1
+    HEADER = struct.Struct("<8sHHHHIQ4x")
+    RAM_OFFSET = HEADER.size
+    ROM_OFFSET = RAM_OFFSET + 2 * HackMachine.RAM_SIZE
+
+    ROM_CACHE_SIZE = 8 # ROM images whose machines are kept, least recently restored evicted first
+    _rom_cache: dict = {} # ROM image digest -> machine holding its decoded handlers and compiled blocks
+
+    @staticmethod
+    def to_le_bytes(words: array) -> bytes:
+        if sys.byteorder == 'big':
+            words = array('H', words)
+            words.byteswap()
+        return words.tobytes()
+
+    @staticmethod
+    def from_le_bytes(data) -> array:
+        words = array('H')
+        words.frombytes(data)
+        if sys.byteorder == 'big':
+            words.byteswap()
+        return words
+
+    @staticmethod
+    def save(machine: HackMachine, checkpoint_file: str) -> None:
+        """Write the full machine state to `checkpoint_file`
+
+        Args:
+            machine (HackMachine): machine to snapshot
+            checkpoint_file (str): output path
+        """
+        header = Checkpoint.HEADER.pack(Checkpoint.MAGIC, Checkpoint.VERSION, machine.A, machine.D,
+                                        machine.pc, len(machine.rom), machine.cycles)
+        with open(checkpoint_file, "wb") as f:
+            f.write(header)
+            f.write(Checkpoint.to_le_bytes(machine.ram))
+            f.write(Checkpoint.to_le_bytes(machine.rom))
+
+    @staticmethod
+    def load(checkpoint_file: str) -> HackMachine:
+        """Restore a machine from `checkpoint_file`. Checkpoints with the same ROM image share
+        one decoded ROM, so restoring a warm state again skips decoding and block compilation.
+        The last `ROM_CACHE_SIZE` ROM images are kept; `clear_cache` drops them all.
+
+        Args:
+            checkpoint_file (str): checkpoint path
+
+        Raises:
+            ValueError: if the file isn't a checkpoint of this version
+
+        Returns:
+            HackMachine: machine in the saved state
+        """
+        with open(checkpoint_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, A, D, pc, rom_words, cycles = Checkpoint.HEADER.unpack_from(mm, 0)
+            if magic != Checkpoint.MAGIC or version != Checkpoint.VERSION:
+                raise ValueError(f"{checkpoint_file} is not a version {Checkpoint.VERSION} Hack checkpoint")
+            rom_image = mm[Checkpoint.ROM_OFFSET:Checkpoint.ROM_OFFSET + 2 * rom_words]
+            digest = hashlib.sha256(rom_image).digest()
+            cache = Checkpoint._rom_cache
+            template = cache.pop(digest, None) # reinserted below as the most recently used
+            if template is None:
+                template = HackMachine(Checkpoint.from_le_bytes(rom_image))
+                if len(cache) >= Checkpoint.ROM_CACHE_SIZE:
+                    del cache[next(iter(cache))]
+            cache[digest] = template
+            machine = template.fork()
+            machine.ram = Checkpoint.from_le_bytes(mm[Checkpoint.RAM_OFFSET:Checkpoint.ROM_OFFSET])
+        machine.A, machine.D, machine.pc, machine.cycles = A, D, pc, cycles
+        return machine
+
+    @staticmethod
+    def clear_cache() -> None:
+        """Drop the machines kept for restored ROM images"""
+        Checkpoint._rom_cache.clear()
+
+def main(input_file: str, max_cycles: int, checkpoint_file: str):
+    if input_file.endswith(".asm"):
+        machine = HackMachine.from_asm(input_file)
+    else:
+        machine = HackMachine.from_hack(input_file)
+    machine.run_blocks(max_cycles)
+    Checkpoint.save(machine, checkpoint_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python checkpoint.py <input_file.hack|input_file.asm> <max_cycles> <checkpoint_file>")
+        sys.exit(1)
+    main(sys.argv[1], int(sys.argv[2]), sys.argv[3])
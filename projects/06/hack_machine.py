@@ -0,0 +1,614 @@
+import re
+import sys
+from array import array
+from assembler import Assembler, Code, RomImage, SymbolTable
+
+try:
+    import numpy as np
+except ImportError: # NumPy is only needed for zero-copy RAM views
+    np = None
+
+class HackMachine:
+    """Native emulator for the Hack CPU.
+
+    Every ROM word is decoded once at load time into a handler with the signature
+    `handler(A, D, pc, ram) -> (A, D, pc)`, so the run loop only has to index the ROM and call.
+    """
+
+    RAM_SIZE = 32768
+    ROM_SIZE = 32768
+    WORD_MASK = 0xFFFF
+    SCREEN = SymbolTable.PREDEF_SYMBOLS["SCREEN"]
+    WORDS_PER_ROW = 32 # 512 pixels / 16 bits
+
+    # Reverse lookups of the assembler tables: bit string -> mnemonic
+    COMP_BITS = {v: k for (k, v) in Code.COMP.items()}
+    DEST_BITS = {v: k for (k, v) in Code.DEST.items()}
+    JUMP_BITS = {v: k for (k, v) in Code.JUMP.items()}
+
+    # Python expression computing each comp mnemonic on unsigned 16-bit values
+    COMP_EXPR = {
+        '0': '0',
+        '1': '1',
+        '-1': '0xFFFF',
+        'D': 'D',
+        'A': 'A',
+        '!D': 'D ^ 0xFFFF',
+        '!A': 'A ^ 0xFFFF',
+        '-D': '-D & 0xFFFF',
+        '-A': '-A & 0xFFFF',
+        'D+1': '(D + 1) & 0xFFFF',
+        'A+1': '(A + 1) & 0xFFFF',
+        'D-1': '(D - 1) & 0xFFFF',
+        'A-1': '(A - 1) & 0xFFFF',
+        'D+A': '(D + A) & 0xFFFF',
+        'D-A': '(D - A) & 0xFFFF',
+        'A-D': '(A - D) & 0xFFFF',
+        'D&A': 'D & A',
+        'D|A': 'D | A',
+        'M': 'ram[A]',
+        '!M': 'ram[A] ^ 0xFFFF',
+        '-M': '-ram[A] & 0xFFFF',
+        'M+1': '(ram[A] + 1) & 0xFFFF',
+        'M-1': '(ram[A] - 1) & 0xFFFF',
+        'D+M': '(D + ram[A]) & 0xFFFF',
+        'D-M': '(D - ram[A]) & 0xFFFF',
+        'M-D': '(ram[A] - D) & 0xFFFF',
+        'D&M': 'D & ram[A]',
+        'D|M': 'D | ram[A]',
+    }
+
+    # Jump conditions on the unsigned ALU output (values >= 0x8000 are negative)
+    JUMP_EXPR = {
+        None: None,
+        'JGT': '0 < out < 0x8000',
+        'JEQ': 'out == 0',
+        'JGE': 'out < 0x8000',
+        'JLT': 'out >= 0x8000',
+        'JNE': 'out != 0',
+        'JLE': 'out == 0 or out >= 0x8000',
+        'JMP': 'True',
+    }
+
+    _handler_cache: dict = {} # word -> handler, shared between machines
+
+    TRACE_LIMIT = 256 # instructions per compiled trace
+
+    A_OPERAND = re.compile(r'\bA\b')
+    JUMP_OPERAND = re.compile(r'\bout\b')
+
+    def __init__(self, program=None) -> None:
+        self.ram = array('H', bytes(2 * HackMachine.RAM_SIZE))
+        self.rom = array('H')
+        self.handlers: list = []
+        self.blocks: list = [] # entry pc -> (block function, instruction count) or None if not compiled yet
+        self.traces: list = [] # entry pc -> (trace function, instruction count, ROM ranges) or None if not compiled yet
+        self.leaders: set = set()
+        self.dirty_rows: bytearray | None = None # screen rows written since the last clear, when tracking
+        self._tracked_handlers: dict = {}
+        self.A = 0
+        self.D = 0
+        self.pc = 0
+        self.cycles = 0
+        if program is not None:
+            self.load(program)
+
+    @classmethod
+    def from_hack(cls, hack_file: str) -> "HackMachine":
+        """Build a machine from a text .hack file
+
+        Args:
+            hack_file (str): path to a file with one 16-bit binary word per line
+
+        Returns:
+            HackMachine: machine with the program loaded into ROM
+        """
+        with open(hack_file, "r") as f:
+            return cls(line for line in (l.strip() for l in f) if line)
+
+    @classmethod
+    def from_image(cls, image_file: str) -> "HackMachine":
+        """Build a machine from a packed .hackbin ROM image
+
+        Args:
+            image_file (str): image path, with or without header
+
+        Returns:
+            HackMachine: machine with the program loaded into ROM
+        """
+        words, _ = RomImage.load(image_file)
+        return cls(words)
+
+    @classmethod
+    def from_asm(cls, asm_file: str) -> "HackMachine":
+        """Assemble an .asm file in memory and load the result
+
+        Args:
+            asm_file (str): assembly file path
+
+        Returns:
+            HackMachine: machine with the assembled program loaded into ROM
+        """
+        assembler = Assembler(asm_file)
+        assembler.first_pass()
+        assembler.second_pass()
+        return cls(assembler.binaries)
+
+    @staticmethod
+    def to_word(word: int | str) -> int:
+        """Normalize a ROM word given either as an int or as a 16-char binary string like the lines of a .hack file
+        """
+        if isinstance(word, str):
+            return int(word, 2)
+        return word & HackMachine.WORD_MASK
+
+    def load(self, program) -> None:
+        """Load a program into ROM and predecode it. Resets the CPU but leaves RAM untouched.
+
+        Args:
+            program (Iterable[int | str]): ROM words as ints or 16-char binary strings
+        """
+        self.rom = array('H', (HackMachine.to_word(w) for w in program))
+        if len(self.rom) > HackMachine.ROM_SIZE:
+            raise ValueError(f"Program has {len(self.rom)} words, ROM holds {HackMachine.ROM_SIZE}")
+        self.handlers = [self.decode_tracked(w) for w in self.rom]
+        self.invalidate()
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset the CPU registers, as the `reset` pin of the Computer chip does"""
+        self.A = 0
+        self.D = 0
+        self.pc = 0
+        self.cycles = 0
+
+    def fork(self) -> "HackMachine":
+        """Copy the machine state. The copy shares the decoded ROM and compiled blocks with this machine,
+        so it starts warm; `write_rom` copies them before patching, so patches never leak between forks.
+        Screen tracking isn't carried over.
+        """
+        clone = HackMachine()
+        clone.rom = self.rom
+        if self.dirty_rows is None:
+            clone.handlers, clone.blocks, clone.traces, clone.leaders = self.handlers, self.blocks, self.traces, self.leaders
+        else:
+            clone.handlers = [HackMachine.decode(w) for w in self.rom]
+            clone.invalidate()
+        clone.ram = array('H', self.ram)
+        clone.A, clone.D, clone.pc, clone.cycles = self.A, self.D, self.pc, self.cycles
+        return clone
+
+    @staticmethod
+    def decode(word: int):
+        """Return the handler executing a single instruction word
+
+        Args:
+            word (int): 16-bit instruction
+
+        Raises:
+            ValueError: if the comp, dest or jump bits have no entry in the `Code` tables
+
+        Returns:
+            Callable[[int, int, int, array], tuple[int, int, int]]: instruction handler
+        """
+        handler = HackMachine._handler_cache.get(word)
+        if handler is None:
+            handler = HackMachine._compile(HackMachine.decode_fields(word))
+            HackMachine._handler_cache[word] = handler
+        return handler
+
+    def decode_tracked(self, word: int):
+        """Like `decode`, but when screen tracking is on the handler also marks the screen rows it writes.
+        Those handlers close over this machine's dirty rows, so they are cached per machine.
+        """
+        if self.dirty_rows is None:
+            return HackMachine.decode(word)
+        handler = self._tracked_handlers.get(word)
+        if handler is None:
+            handler = HackMachine._compile(HackMachine.decode_fields(word), self.dirty_rows)
+            self._tracked_handlers[word] = handler
+        return handler
+
+    def track_screen(self) -> bytearray:
+        """Start recording which screen rows get written. Writes at or above SCREEN set
+        `dirty_rows[(addr - SCREEN) // 32]`; rows 256 and up stand for KBD and the unused space after it.
+
+        Returns:
+            bytearray: the dirty row flags; clear them in place so compiled code keeps seeing the same object
+        """
+        if self.dirty_rows is None:
+            self.dirty_rows = bytearray((HackMachine.RAM_SIZE - HackMachine.SCREEN) // HackMachine.WORDS_PER_ROW)
+            self.handlers = [self.decode_tracked(w) for w in self.rom]
+            self.invalidate()
+        return self.dirty_rows
+
+    @staticmethod
+    def decode_fields(word: int) -> tuple:
+        """Split a word into its fields
+
+        Returns:
+            tuple: ("A", value) for A-instructions, ("C", comp, dest, jump) mnemonics for C-instructions
+        """
+        if not word & 0x8000:
+            return ("A", word)
+        bits = bin(word)[2:]
+        try:
+            comp = HackMachine.COMP_BITS[bits[3:10]]
+            dest = HackMachine.DEST_BITS[bits[10:13]]
+            jump = HackMachine.JUMP_BITS[bits[13:16]]
+        except KeyError:
+            raise ValueError(f"Invalid C-instruction {bits}")
+        return ("C", comp, dest, jump)
+
+    @staticmethod
+    def _compile(fields: tuple, dirty: bytearray | None = None):
+        if fields[0] == "A":
+            value = fields[1]
+            def a_instruction(A, D, pc, ram):
+                return value, D, pc + 1
+            return a_instruction
+
+        _, comp, dest, jump = fields
+        dest = dest or ""
+        lines = ["def c_instruction(A, D, pc, ram):", f"    out = {HackMachine.COMP_EXPR[comp]}"]
+        target = "A" # the PC loads the A register value from before this instruction
+        if "M" in dest:
+            lines.append("    ram[A] = out")
+            if dirty is not None:
+                lines.append(f"    if A >= {HackMachine.SCREEN}: dirty[(A - {HackMachine.SCREEN}) >> 5] = 1")
+        if "A" in dest:
+            if jump:
+                lines.append("    target = A")
+                target = "target"
+            lines.append("    A = out")
+        if "D" in dest:
+            lines.append("    D = out")
+        if jump:
+            lines.append(f"    if {HackMachine.JUMP_EXPR[jump]}:")
+            lines.append(f"        return A, D, {target}")
+        lines.append("    return A, D, pc + 1")
+        namespace: dict = {"dirty": dirty}
+        exec("\n".join(lines), namespace)
+        return namespace["c_instruction"]
+
+    def write_rom(self, addr: int, word: int | str) -> None:
+        """Patch a single ROM word, re-decoding it and dropping every compiled block and trace that contains it
+        """
+        self.rom, self.handlers = array('H', self.rom), list(self.handlers) # unshare from forks
+        self.blocks, self.traces = list(self.blocks), list(self.traces)
+        self.rom[addr] = HackMachine.to_word(word)
+        self.handlers[addr] = self.decode_tracked(self.rom[addr])
+        self.invalidate(addr)
+
+    def invalidate(self, addr: int | None = None) -> None:
+        """Drop compiled basic blocks and traces, either all of them or only those covering ROM[addr].
+        Leaders are recomputed since a patched word can add or remove a jump target.
+        """
+        self.leaders = HackMachine.find_leaders(self.rom)
+        if addr is None or len(self.blocks) != len(self.rom):
+            self.blocks = [None] * len(self.rom)
+            self.traces = [None] * len(self.rom)
+            return
+        for entry, block in enumerate(self.blocks):
+            if block is not None and entry <= addr < entry + block[1]:
+                self.blocks[entry] = None
+        for entry, trace in enumerate(self.traces):
+            if trace is not None and any(start <= addr < end for (start, end) in trace[2]):
+                self.traces[entry] = None
+
+    @staticmethod
+    def find_leaders(rom) -> set:
+        """Find the ROM addresses that start a basic block: the program entry, every static jump target
+        (an `@addr` right before a `;J**` instruction) and every instruction following a jump.
+        Computed jumps can still land elsewhere; those entries get their own block when first visited.
+
+        Args:
+            rom (Sequence[int]): ROM words
+        """
+        leaders = {0}
+        for addr in range(len(rom)):
+            if rom[addr] & 0x8007 > 0x8000: # C-instruction with jump bits set
+                leaders.add(addr + 1)
+                if addr > 0 and not rom[addr - 1] & 0x8000:
+                    leaders.add(rom[addr - 1])
+        return leaders
+
+    def compile_block(self, entry: int) -> tuple:
+        """Translate the straight-line code starting at `entry` into a single Python function.
+        The block runs up to and including the first jump, or up to the next leader.
+
+        While the value of A is known statically (right after an A-instruction) it is folded into
+        RAM indices and jump targets, and only written back to the register when it is needed.
+
+        Args:
+            entry (int): ROM address of the first instruction in the block
+
+        Returns:
+            tuple: (function (A, D, ram) -> (A, D, pc), number of instructions in the block)
+        """
+        lines = ["def block(A, D, ram):"]
+        known_a = None # statically known value of A, None once it depends on runtime data
+        addr = entry
+        size = len(self.rom)
+        exit_pc = None
+        while addr < size:
+            fields = HackMachine.decode_fields(self.rom[addr])
+            addr += 1
+            if fields[0] == "A":
+                known_a = fields[1]
+            else:
+                _, comp, dest, jump = fields
+                a_ref, condition = self.emit_c_instruction(lines, comp, dest or "", jump, known_a, "    ")
+                if dest and "A" in dest:
+                    known_a = None
+                if jump:
+                    a_out = "A" if known_a is None else str(known_a)
+                    if jump == "JMP":
+                        exit_pc = a_ref
+                    else:
+                        lines.append(f"    if {condition}:")
+                        lines.append(f"        return {a_out}, D, {a_ref}")
+                    break
+            if addr in self.leaders:
+                break
+        a_out = "A" if known_a is None else str(known_a)
+        lines.append(f"    return {a_out}, D, {exit_pc if exit_pc is not None else addr}")
+        namespace: dict = {"dirty": self.dirty_rows}
+        exec("\n".join(lines), namespace)
+        return namespace["block"], addr - entry
+
+    def emit_c_instruction(self, lines: list, comp: str, dest: str, jump: str | None, known_a: int | None, indent: str) -> tuple:
+        """Append the statements of a C-instruction to generated code, folding in A when it's known.
+        Every destination is assigned in one chained assignment, RAM first so it's indexed by the old A.
+
+        Returns:
+            tuple[str, str | None]: expression for the address a jump goes to, and the jump condition
+        """
+        expr = HackMachine.COMP_EXPR[comp]
+        if known_a is not None:
+            expr = HackMachine.A_OPERAND.sub(str(known_a), expr)
+        a_ref = "A" if known_a is None else str(known_a)
+        if jump and known_a is None and "A" in dest:
+            lines.append(f"{indent}target = A")
+            a_ref = "target"
+        if "M" in dest and self.dirty_rows is not None:
+            if known_a is None:
+                lines.append(f"{indent}if A >= {HackMachine.SCREEN}: dirty[(A - {HackMachine.SCREEN}) >> 5] = 1")
+            elif known_a >= HackMachine.SCREEN:
+                lines.append(f"{indent}dirty[{(known_a - HackMachine.SCREEN) >> 5}] = 1")
+        targets = [f"ram[{a_ref}]"] * ("M" in dest) + ["A"] * ("A" in dest) + ["D"] * ("D" in dest)
+        condition = None
+        if jump and jump != "JMP":
+            if "D" in dest or "A" in dest:
+                tested = targets[-1] # a register holding the ALU output
+            elif expr.isidentifier() or expr.isdigit():
+                tested = expr
+            else:
+                tested = "out"
+                targets.append("out")
+            condition = HackMachine.JUMP_OPERAND.sub(tested, HackMachine.JUMP_EXPR[jump])
+        if targets:
+            lines.append(f"{indent}{' = '.join(targets)} = {expr}")
+        elif "M" in comp:
+            lines.append(f"{indent}ram[{a_ref}]") # the result is unused, but the read can still be out of bounds
+        return a_ref, condition
+
+    def compile_trace(self, entry: int) -> tuple:
+        """Translate the code starting at `entry` into a single Python function, fusing basic blocks.
+
+        The trace follows the fall-through path past conditional jumps and leaders, and goes on at the
+        target of every static `0;JMP`, so calls and the blocks of a function body run in one function
+        with A and D in locals; a known A is only written back when the trace is left. A jump back to
+        `entry` loops inside the function, checking the cycle budget on every iteration. The trace ends
+        at computed jumps, at code it already covers and after `TRACE_LIMIT` instructions.
+
+        Args:
+            entry (int): ROM address of the first instruction in the trace
+
+        Returns:
+            tuple: (function (A, D, ram, budget) -> (A, D, pc, cycles), most cycles per call or loop
+                iteration, (start, end) ROM ranges covered)
+        """
+        lines = [] # indented for the `while` they go in if the trace loops
+        known_a = None
+        loops = False
+        visited = set()
+        ranges = []
+        addr = entry
+        size = len(self.rom)
+        count = 0 # instructions so far, which is also the cycles taken to reach this point
+        exit_pc = None
+        while True:
+            if addr == entry and count: # back at the start
+                loops = True
+                if known_a is not None:
+                    lines.append(f"        A = {known_a}")
+                lines.append(f"        done += {count}")
+                lines.append(f"        if done > limit: return A, D, {entry}, done")
+                lines.append("        continue")
+                break
+            if addr >= size or addr in visited or count >= HackMachine.TRACE_LIMIT:
+                exit_pc = addr
+                break
+            if ranges and ranges[-1][1] == addr:
+                ranges[-1][1] += 1
+            else:
+                ranges.append([addr, addr + 1])
+            visited.add(addr)
+            fields = HackMachine.decode_fields(self.rom[addr])
+            addr += 1
+            count += 1
+            if fields[0] == "A":
+                known_a = fields[1]
+                continue
+            _, comp, dest, jump = fields
+            dest = dest or ""
+            a_ref, condition = self.emit_c_instruction(lines, comp, dest, jump, known_a, "        ")
+            static_target = known_a
+            if "A" in dest:
+                known_a = None
+            if not jump:
+                continue
+            if jump == "JMP":
+                if static_target is None or static_target >= size:
+                    exit_pc = a_ref
+                    break
+                addr = static_target # carry on at the target, or close the loop above
+                continue
+            lines.append(f"        if {condition}:")
+            if static_target == entry:
+                loops = True
+                if known_a is not None:
+                    lines.append(f"            A = {known_a}")
+                lines.append(f"            done += {count}")
+                lines.append(f"            if done > limit: return A, D, {entry}, done")
+                lines.append("            continue")
+            else:
+                lines.append(f"            return {'A' if known_a is None else known_a}, D, {a_ref}, {{done}}{count}")
+        if exit_pc is not None:
+            lines.append(f"        return {'A' if known_a is None else known_a}, D, {exit_pc}, {{done}}{count}")
+
+        body = [line.replace("{done}", "done + " if loops else "") for line in lines]
+        if loops:
+            source = ["def trace(A, D, ram, budget):", f"    limit = budget - {count}", "    done = 0", "    while True:"] + body
+        else:
+            source = ["def trace(A, D, ram, budget):"] + [line[4:] for line in body]
+        namespace: dict = {"dirty": self.dirty_rows}
+        exec("\n".join(source), namespace)
+        return namespace["trace"], count, tuple(map(tuple, ranges))
+
+    def run_blocks(self, max_cycles: int) -> int:
+        """Same contract as `run`, but dispatches traces of fused basic blocks (see `compile_trace`)
+        compiled on first visit and cached by entry address. The tail of the budget that doesn't fit
+        a full trace is single-stepped.
+
+        On an illegal memory access, A, D and the PC are left at the entry of the failing trace, but the
+        RAM writes the trace made before the access are kept, so the machine state is undefined after the
+        error; reset it or restore a checkpoint before running it again.
+
+        Args:
+            max_cycles (int): instruction budget
+
+        Returns:
+            int: number of instructions executed by this call
+        """
+        traces = self.traces
+        size = len(traces)
+        ram = self.ram
+        A, D, pc = self.A, self.D, self.pc
+        executed = 0
+        while pc < size:
+            trace = traces[pc]
+            if trace is None:
+                trace = traces[pc] = self.compile_trace(pc)
+            if executed + trace[1] > max_cycles:
+                break
+            try:
+                A, D, pc, n = trace[0](A, D, ram, max_cycles - executed)
+            except IndexError:
+                self.A, self.D, self.pc = A, D, pc
+                self.cycles += executed
+                raise IndexError(f"Illegal memory access in trace at ROM[{pc}]")
+            executed += n
+        self.A, self.D, self.pc = A, D, pc
+        self.cycles += executed
+        return executed + self.run(max_cycles - executed)
+
+    def step(self) -> None:
+        """Execute a single instruction"""
+        self.run(1)
+
+    def run(self, max_cycles: int) -> int:
+        """Run the program until `max_cycles` instructions are executed or the PC leaves the program
+
+        Args:
+            max_cycles (int): instruction budget
+
+        Returns:
+            int: number of instructions executed by this call
+        """
+        handlers = self.handlers
+        size = len(handlers)
+        ram = self.ram
+        A, D, pc = self.A, self.D, self.pc
+        executed = 0
+        while executed < max_cycles and pc < size:
+            # Run in chunks so the hot loop doesn't have to check the budget on every instruction
+            chunk = max_cycles - executed
+            done = 0
+            try:
+                for done in range(chunk):
+                    A, D, pc = handlers[pc](A, D, pc, ram)
+                done = chunk
+            except IndexError:
+                if pc < size: # An illegal RAM access, not the PC leaving the ROM
+                    self.A, self.D, self.pc = A, D, pc
+                    self.cycles += executed + done
+                    raise IndexError(f"Illegal memory access at ROM[{pc}] with A={A}")
+            executed += done
+        self.A, self.D, self.pc = A, D, pc
+        self.cycles += executed
+        return executed
+
+    @property
+    def halted(self) -> bool:
+        """Whether the PC has left the program"""
+        return self.pc >= len(self.handlers)
+
+    def peek(self, addr: int | str) -> int:
+        """Read a RAM word, addressed either by number or by a predefined symbol such as "R2" or "SCREEN"
+        """
+        if isinstance(addr, str):
+            addr = SymbolTable.PREDEF_SYMBOLS[addr]
+        return self.ram[addr]
+
+    def poke(self, addr: int | str, value: int) -> None:
+        """Write a RAM word; negative values are stored in two's complement"""
+        if isinstance(addr, str):
+            addr = SymbolTable.PREDEF_SYMBOLS[addr]
+        self.ram[addr] = value & HackMachine.WORD_MASK
+        if self.dirty_rows is not None and addr >= HackMachine.SCREEN:
+            self.dirty_rows[(addr - HackMachine.SCREEN) >> 5] = 1
+
+    def ram_view(self):
+        """Zero-copy NumPy uint16 view of RAM
+
+        Raises:
+            ImportError: if NumPy isn't installed
+        """
+        if np is None:
+            raise ImportError("ram_view requires NumPy")
+        return np.frombuffer(self.ram, dtype=np.uint16)
+
+    @staticmethod
+    def to_signed(value: int) -> int:
+        """Interpret a 16-bit word as a two's complement integer"""
+        return value - 0x10000 if value & 0x8000 else value
+
+def main(input_file: str, max_cycles: int = 1_000_000, mode: str = "blocks"):
+    if input_file.endswith(".asm"):
+        machine = HackMachine.from_asm(input_file)
+    elif input_file.endswith(".hackbin"):
+        machine = HackMachine.from_image(input_file)
+    else:
+        machine = HackMachine.from_hack(input_file)
+    match mode:
+        case "blocks":
+            executed = machine.run_blocks(max_cycles)
+        case "interp":
+            executed = machine.run(max_cycles)
+        case other:
+            raise ValueError(f"Unknown execution mode {other}, expected 'blocks' or 'interp'")
+    print(f"cycles={executed} PC={machine.pc} A={machine.A} D={HackMachine.to_signed(machine.D)}")
+    print("R0-R15: " + " ".join(str(HackMachine.to_signed(machine.ram[i])) for i in range(16)))
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3, 4):
+        print("Usage: python hack_machine.py <input_file.hack|input_file.hackbin|input_file.asm> <max_cycles> <blocks|interp>")
+        sys.exit(1)
+    if len(sys.argv) == 2:
+        main(sys.argv[1])
+    elif len(sys.argv) == 3:
+        main(sys.argv[1], int(sys.argv[2]))
+    elif len(sys.argv) == 4:
+        main(sys.argv[1], int(sys.argv[2]), sys.argv[3])
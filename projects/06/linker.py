@@ -0,0 +1,150 @@
+import json
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from assembler import Assembler, RomImage, SymbolTable
+
+class ObjectFile:
+    """Relocatable output of assembling one module on its own.
+
+    Words are encoded as if the module started at ROM address 0. `relocations` lists the offsets
+    of A commands pointing at the module's own labels, which get the module's ROM base added at
+    link time; `references` lists (offset, symbol) for symbols the module doesn't define, which
+    are either labels exported by another module or variables allocated by the linker.
+    """
+
+    FORMAT = "hack-object"
+    VERSION = 1
+
+    def __init__(self, name: str, words, labels: dict, relocations: list, references: list) -> None:
+        self.name = name
+        self.words = array('H', words)
+        self.labels = labels
+        self.relocations = relocations
+        self.references = references
+
+    @classmethod
+    def from_asm(cls, asm_file: str) -> "ObjectFile":
+        """Assemble a module without resolving anything outside it
+
+        Args:
+            asm_file (str): assembly file path
+
+        Returns:
+            ObjectFile: relocatable object
+        """
+        assembler = Assembler(asm_file)
+        assembler.first_pass()
+        words = assembler.binaries[:assembler.curr_ROM_addr]
+        labels = assembler.symbol_line_table
+        relocations = list(assembler.label_refs)
+        references = []
+        for offset, symbol in assembler.fixups:
+            if symbol in labels: # forward reference to a label of this module
+                words[offset] = labels[symbol]
+                relocations.append(offset)
+            else:
+                references.append((offset, symbol))
+        return cls(asm_file, words, dict(labels), sorted(relocations), references)
+
+    def save(self, object_file: str) -> None:
+        with open(object_file, "w") as f:
+            json.dump({
+                "format": ObjectFile.FORMAT,
+                "version": ObjectFile.VERSION,
+                "name": self.name,
+                "words": self.words.tolist(),
+                "labels": self.labels,
+                "relocations": self.relocations,
+                "references": self.references,
+            }, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, object_file: str) -> "ObjectFile":
+        with open(object_file, "r") as f:
+            obj = json.load(f)
+        if obj.get("format") != ObjectFile.FORMAT or obj.get("version") != ObjectFile.VERSION:
+            raise ValueError(f"{object_file} is not a version {ObjectFile.VERSION} Hack object file")
+        return cls(obj["name"], obj["words"], obj["labels"], obj["relocations"], [tuple(ref) for ref in obj["references"]])
+
+class Linker:
+    """Merges object files into one program.
+
+    Modules are placed in ROM in the order given. Linking is equivalent to assembling the
+    concatenation of the modules' sources: labels are global, and symbols no module defines
+    become variables, allocated from RAM address 16 in order of first use.
+    """
+
+    def __init__(self, objects: list) -> None:
+        self.objects = objects
+        self.bases: list = [] # ROM base address of each object
+        self.symbol_table = SymbolTable()
+        self.binaries = array('H')
+
+    def link(self) -> array:
+        """Assign ROM and RAM addresses and patch every module
+
+        Raises:
+            ValueError: if two modules export the same label or the program doesn't fit in ROM
+
+        Returns:
+            array: the linked ROM
+        """
+        base = 0
+        exported: dict = {}
+        for obj in self.objects:
+            self.bases.append(base)
+            for label, offset in obj.labels.items():
+                if label in exported:
+                    raise ValueError(f"Label {label} defined in both {exported[label]} and {obj.name}")
+                exported[label] = obj.name
+                self.symbol_table.add_entry(label, addr=base + offset)
+            base += len(obj.words)
+        if base > 32768:
+            raise ValueError(f"Linked program has {base} words, ROM holds 32768")
+
+        for obj, base in zip(self.objects, self.bases):
+            words = array('H', obj.words)
+            for offset in obj.relocations:
+                words[offset] += base
+            for offset, symbol in obj.references:
+                if not self.symbol_table.contains(symbol):
+                    self.symbol_table.add_entry(symbol) # a variable, first used here
+                words[offset] = self.symbol_table.get_addr(symbol)
+            self.binaries.extend(words)
+        return self.binaries
+
+    def write(self, output_file: str) -> None:
+        """Write the linked ROM as text .hack, or as a ROM image if `output_file` ends in .hackbin"""
+        if output_file.endswith(".hackbin"):
+            RomImage.write(output_file, self.binaries)
+        else:
+            with open(output_file, "w") as f:
+                f.writelines(RomImage.text_lines(self.binaries))
+
+def compile_module(asm_file: str) -> str:
+    """Worker: assemble a module to `<name>.hobj` next to it, unless that object is newer than the source
+
+    Returns:
+        str: object file path
+    """
+    object_file = asm_file.rpartition('.')[0] + ".hobj"
+    if not os.path.exists(object_file) or os.path.getmtime(object_file) < os.path.getmtime(asm_file):
+        ObjectFile.from_asm(asm_file).save(object_file)
+    return object_file
+
+def main(output_file: str, inputs: list, jobs: int | None = None):
+    asm_files = [path for path in inputs if path.endswith(".asm")]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        compiled = dict(zip(asm_files, pool.map(compile_module, asm_files)))
+    objects = [ObjectFile.load(compiled.get(path, path)) for path in inputs]
+    linker = Linker(objects)
+    linker.link()
+    linker.write(output_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python linker.py <output_file.hack|output_file.hackbin> <module.asm|module.hobj>...")
+        sys.exit(1)
+    main(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,221 @@
+import sys
+from assembler import Assembler, SymbolTable
+
+class PeepholeOptimizer:
+    """Peephole optimizer over the parsed command list of an assembler, run before its first pass.
+
+    Rules, applied until nothing changes:
+        - Dead code: commands after an unconditional jump are dropped up to the next referenced label.
+        - Jump threading: an unconditional jump to a label that only jumps again goes straight to the
+          final label, and an unconditional jump to the very next command is dropped. Conditional jumps
+          are left alone, since the code after them would see the new target in A.
+        - Redundant A-loads: `@X` is dropped when A is already known to hold X.
+
+    Variables keep the RAM addresses the unoptimized program gives them: `apply` registers them in their
+    original order of first use, so dropping the first reference to one doesn't move the others.
+
+    The rules assume jumps go through labels, since removing code moves everything after it.
+    Programs that jump to hard-coded ROM addresses (`@133` followed by a jump, as in the
+    pre-assembled Pong.asm) are detected and left untouched.
+    """
+
+    def __init__(self, commands: list, source_lines: list) -> None:
+        self.commands = list(commands)
+        self.source_lines = list(source_lines)
+        self.original_size = PeepholeOptimizer.rom_size(self.commands)
+        self.removed = {"dead code": 0, "jump threading": 0, "redundant A-load": 0}
+        self.skipped: str | None = None
+        self.threaded = 0 # jumps redirected past a trampoline; the trampolines left dead count as dead code
+        self.variables = self.variable_order()
+
+    @staticmethod
+    def rom_size(commands: list) -> int:
+        return sum(not cmd.startswith("(") for cmd in commands)
+
+    @staticmethod
+    def split_c(cmd: str) -> tuple:
+        """(dest, comp, jump) of a C command, absent parts as empty strings"""
+        dest, sep, rest = cmd.partition('=')
+        if not sep:
+            dest, rest = "", dest
+        comp, _, jump = rest.partition(';')
+        return dest.strip(), comp.strip(), jump.strip()
+
+    @staticmethod
+    def canonical(symbol: str) -> int | str:
+        """Value of an A command operand when it is known before assembly, else the symbol itself"""
+        if symbol.isdigit():
+            return int(symbol)
+        return SymbolTable.PREDEF_SYMBOLS.get(symbol, symbol)
+
+    def labels(self) -> dict:
+        """label -> index of its pseudocommand"""
+        return {cmd[1:-1]: i for (i, cmd) in enumerate(self.commands) if cmd.startswith("(")}
+
+    def variable_order(self) -> list:
+        """Symbols that the assembler will allocate as variables, in order of first use"""
+        labels = self.labels()
+        variables = {}
+        for cmd in self.commands:
+            if cmd.startswith("@") and not cmd[1:].isdigit():
+                symbol = cmd[1:]
+                if symbol not in labels and symbol not in SymbolTable.PREDEF_SYMBOLS:
+                    variables[symbol] = None
+        return list(variables)
+
+    def referenced(self) -> set:
+        return {cmd[1:] for cmd in self.commands if cmd.startswith("@")}
+
+    def keep(self, keep: list) -> None:
+        self.commands = [cmd for (cmd, k) in zip(self.commands, keep) if k]
+        self.source_lines = [line for (line, k) in zip(self.source_lines, keep) if k]
+
+    def next_instruction(self, i: int) -> int:
+        """Index of the first non-label command at or after i (len(commands) if there is none)"""
+        while i < len(self.commands) and self.commands[i].startswith("("):
+            i += 1
+        return i
+
+    def is_plain_jump(self, i: int) -> bool:
+        """Whether command i only jumps on A: no dest and a comp that doesn't read A or M"""
+        if i >= len(self.commands) or self.commands[i][0] in "@(":
+            return False
+        dest, comp, jump = PeepholeOptimizer.split_c(self.commands[i])
+        return bool(jump) and not dest and "A" not in comp and "M" not in comp
+
+    def is_goto(self, i: int) -> bool:
+        """Whether command i is an unconditional jump"""
+        return self.commands[i][0] not in "@(" and PeepholeOptimizer.split_c(self.commands[i])[2] == "JMP"
+
+    def dead_code(self) -> int:
+        referenced = self.referenced()
+        keep = [True] * len(self.commands)
+        dead = False
+        for i, cmd in enumerate(self.commands):
+            if cmd.startswith("("):
+                if cmd[1:-1] in referenced:
+                    dead = False
+                else:
+                    keep[i] = not dead
+            elif dead:
+                keep[i] = False
+            elif self.is_goto(i):
+                dead = True
+        removed = sum(not k and not self.commands[i].startswith("(") for (i, k) in enumerate(keep))
+        self.keep(keep)
+        return removed
+
+    def thread_jumps(self) -> tuple:
+        """Send gotos through trampolines straight to their final label and drop gotos to the next command
+
+        Returns:
+            tuple[int, int]: words removed, jumps redirected
+        """
+        labels = self.labels()
+        # label -> label it forwards to, when its first instruction is `@T` followed by a plain goto
+        forward = {}
+        for label, i in labels.items():
+            j = self.next_instruction(i)
+            if j + 1 < len(self.commands) and self.commands[j].startswith("@") and self.is_goto(j + 1) and self.is_plain_jump(j + 1):
+                target = self.commands[j][1:]
+                if target in labels and target != label:
+                    forward[label] = target
+
+        def resolve(label: str) -> str:
+            seen = {label}
+            while label in forward and forward[label] not in seen:
+                label = forward[label]
+                seen.add(label)
+            return label
+
+        removed = rewritten = 0
+        keep = [True] * len(self.commands)
+        for i, cmd in enumerate(self.commands):
+            if not cmd.startswith("@") or not self.is_plain_jump(i + 1) or not self.is_goto(i + 1):
+                continue
+            target = resolve(cmd[1:])
+            if target != cmd[1:]:
+                self.commands[i] = "@" + target
+                rewritten += 1
+            # `0;JMP` right before (L) is a no-op; `@L` stays, as the code at L may read A or M
+            if target in labels and self.next_instruction(i + 2) > labels[target] >= i + 2:
+                keep[i + 1] = False
+                removed += 1
+        self.keep(keep)
+        return removed, rewritten
+
+    def redundant_a_loads(self) -> int:
+        keep = [True] * len(self.commands)
+        known = None # value A holds at this point, None if unknown
+        for i, cmd in enumerate(self.commands):
+            if cmd.startswith("("): # other paths join here
+                known = None
+            elif cmd.startswith("@"):
+                value = PeepholeOptimizer.canonical(cmd[1:])
+                if value == known:
+                    keep[i] = False
+                known = value
+            elif "A" in PeepholeOptimizer.split_c(cmd)[0]:
+                known = None
+        self.keep(keep)
+        return keep.count(False)
+
+    def uses_absolute_jumps(self) -> bool:
+        """Whether some jump goes to a numeric ROM address"""
+        return any(cmd.startswith("@") and cmd[1:].isdigit() and self.is_plain_jump(i + 1)
+                   for (i, cmd) in enumerate(self.commands))
+
+    def run(self) -> tuple:
+        """Apply every rule until a fixed point
+
+        Returns:
+            tuple[list, list]: optimized commands and their source lines
+        """
+        if self.uses_absolute_jumps():
+            self.skipped = "program jumps to absolute ROM addresses"
+            return self.commands, self.source_lines
+        while True:
+            dead = self.dead_code()
+            threaded, rewritten = self.thread_jumps()
+            loads = self.redundant_a_loads()
+            self.removed["dead code"] += dead
+            self.removed["jump threading"] += threaded
+            self.removed["redundant A-load"] += loads
+            self.threaded += rewritten
+            if not (dead or threaded or rewritten or loads):
+                return self.commands, self.source_lines
+
+    def report(self) -> str:
+        if self.skipped:
+            return f"ROM: {self.original_size} words, not optimized: {self.skipped}"
+        size = PeepholeOptimizer.rom_size(self.commands)
+        saved = self.original_size - size
+        rules = ", ".join(f"{rule} {n}" for (rule, n) in self.removed.items())
+        return (f"ROM: {self.original_size} -> {size} words (-{saved}, {100 * saved / max(self.original_size, 1):.1f}%): {rules}, "
+                f"jumps threaded {self.threaded}")
+
+    @staticmethod
+    def apply(assembler: Assembler) -> "PeepholeOptimizer":
+        """Optimize an assembler's parsed commands in place; call before `first_pass`
+
+        Returns:
+            PeepholeOptimizer: the optimizer, for its report
+        """
+        pending = assembler.parser.remaining() # the optimizer needs the whole program at once
+        optimizer = PeepholeOptimizer([cmd for (_, cmd) in pending], [line for (line, _) in pending])
+        commands, source_lines = optimizer.run()
+        assembler.parser.replace(zip(source_lines, commands))
+        for symbol in optimizer.variables: # pinned to their unoptimized addresses
+            assembler.symbol_table.add_entry(symbol)
+        return optimizer
+
+def main(input_file: str, output_file: str | None = None):
+    assembler = Assembler(input_file)
+    print(PeepholeOptimizer.apply(assembler).report())
+    assembler.assemble(output_file=output_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python optimizer.py <input_file> <output_file>")
+        sys.exit(1)
+    main(*sys.argv[1:])
@@ -0,0 +1,136 @@
+import bisect
+import json
+import sys
+from array import array
+from collections import Counter
+from hack_machine import HackMachine
+
+class Profiler:
+    """Counting profiler for Hack programs.
+
+    Runs a HackMachine in basic-block mode and counts block entries; since a block always
+    runs to its end, the entry counts give exact cycles per ROM address. Those counts are
+    then attributed to asm lines and labels through the assembler's `.map` sidecar, and to
+    VM commands through the translator's `.vmmap` sidecar when one is given.
+    """
+
+    def __init__(self, machine: HackMachine, asm_map: dict | None = None, vm_map: dict | None = None) -> None:
+        self.machine = machine
+        self.asm_map = asm_map
+        self.vm_map = vm_map
+        self.counts = array('Q', bytes(8 * len(machine.rom))) # cycles per ROM address
+
+    @classmethod
+    def from_files(cls, hack_file: str, map_file: str | None = None, vmmap_file: str | None = None) -> "Profiler":
+        """Build a profiler from a .hack file and its optional sidecars"""
+        return cls(HackMachine.from_hack(hack_file), Profiler.load_map(map_file), Profiler.load_map(vmmap_file))
+
+    @staticmethod
+    def load_map(map_file: str | None) -> dict | None:
+        if map_file is None:
+            return None
+        with open(map_file, "r") as f:
+            return json.load(f)
+
+    def run(self, max_cycles: int) -> int:
+        """Run the machine for up to `max_cycles` instructions while counting
+
+        Returns:
+            int: number of instructions executed
+        """
+        machine = self.machine
+        blocks = machine.blocks
+        size = len(blocks)
+        ram = machine.ram
+        entries = Counter()
+        A, D, pc = machine.A, machine.D, machine.pc
+        executed = 0
+        while pc < size:
+            block = blocks[pc]
+            if block is None:
+                block = blocks[pc] = machine.compile_block(pc)
+            if executed + block[1] > max_cycles:
+                break
+            entries[pc] += 1
+            A, D, pc = block[0](A, D, ram)
+            executed += block[1]
+        machine.A, machine.D, machine.pc = A, D, pc
+        machine.cycles += executed
+
+        counts = self.counts
+        for entry, hits in entries.items():
+            for addr in range(entry, entry + blocks[entry][1]):
+                counts[addr] += hits
+        while executed < max_cycles and not machine.halted: # single-step the tail of the budget
+            counts[machine.pc] += 1
+            executed += machine.run(1)
+        return executed
+
+    def by_address(self) -> Counter:
+        """Cycles per ROM address"""
+        return Counter({addr: n for (addr, n) in enumerate(self.counts) if n})
+
+    def by_label(self) -> Counter:
+        """Cycles per asm label, attributing each address to the closest label at or before it"""
+        if self.asm_map is None:
+            raise ValueError("Label profile requires the assembler source map")
+        labels = sorted((addr, name) for (name, addr) in self.asm_map["labels"].items())
+        starts = [addr for (addr, _) in labels]
+        result = Counter()
+        for addr, n in self.by_address().items():
+            i = bisect.bisect_right(starts, addr) - 1
+            result[labels[i][1] if i >= 0 else "<start>"] += n
+        return result
+
+    def by_asm_line(self) -> Counter:
+        """Cycles per asm source line"""
+        if self.asm_map is None:
+            raise ValueError("Line profile requires the assembler source map")
+        lines = self.asm_map["lines"]
+        result = Counter()
+        for addr, n in self.by_address().items():
+            result[lines[addr]] += n
+        return result
+
+    def by_vm_command(self) -> Counter:
+        """Cycles per originating VM command, keyed by "file:line command" """
+        if self.vm_map is None:
+            raise ValueError("VM command profile requires the translator source map")
+        entries = self.vm_map["entries"]
+        starts = [entry[0] for entry in entries]
+        result = Counter()
+        for asm_line, n in self.by_asm_line().items():
+            i = bisect.bisect_right(starts, asm_line) - 1
+            if i < 0:
+                result["<prelude>"] += n
+                continue
+            _, vm_file, vm_line, command = entries[i]
+            result[f"{vm_file}:{vm_line} {command}" if vm_file else command] += n
+        return result
+
+    def report(self, top: int = 10) -> str:
+        """Format the hot spots of every available profile as a text table"""
+        sections = [("ROM address", self.by_address())]
+        if self.asm_map is not None:
+            sections += [("asm label", self.by_label()), ("asm line", self.by_asm_line())]
+        if self.vm_map is not None:
+            sections.append(("VM command", self.by_vm_command()))
+        total = sum(self.counts) or 1
+        out = []
+        for title, counter in sections:
+            out.append(f"{'cycles':>12} {'%':>6}  {title}")
+            for key, n in counter.most_common(top):
+                out.append(f"{n:>12} {100 * n / total:>6.2f}  {key}")
+            out.append("")
+        return "\n".join(out)
+
+def main(hack_file: str, max_cycles: int = 1_000_000, map_file: str | None = None, vmmap_file: str | None = None):
+    profiler = Profiler.from_files(hack_file, map_file, vmmap_file)
+    profiler.run(max_cycles)
+    print(profiler.report())
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3, 4, 5):
+        print("Usage: python profiler.py <input_file.hack> <max_cycles> <map_file> <vmmap_file>")
+        sys.exit(1)
+    main(sys.argv[1], *(int(arg) if i == 0 else arg for (i, arg) in enumerate(sys.argv[2:])))
@@ -0,0 +1,84 @@
+import struct
+import sys
+import zlib
+import numpy as np
+from hack_machine import HackMachine
+
+class Screen:
+    """Headless view of the Hack memory-mapped screen.
+
+    The machine marks every screen row it writes (see `HackMachine.track_screen`), and `update`
+    unpacks only those rows into a 256 x 512 bit-plane, so refreshing a frame costs time
+    proportional to what changed. Pixel (r, c) is bit c % 16 of RAM[SCREEN + 32 * r + c // 16],
+    with 1 meaning black.
+    """
+
+    WIDTH = 512
+    HEIGHT = 256
+
+    def __init__(self, machine: HackMachine) -> None:
+        self.machine = machine
+        self.dirty = machine.track_screen()
+        self.dirty[:Screen.HEIGHT] = b'\x01' * Screen.HEIGHT # first update unpacks everything
+        self.plane = np.zeros((Screen.HEIGHT, Screen.WIDTH), dtype=np.uint8)
+        start = HackMachine.SCREEN
+        self.words = machine.ram_view()[start:start + Screen.HEIGHT * HackMachine.WORDS_PER_ROW].reshape(Screen.HEIGHT, -1)
+
+    def update(self) -> int:
+        """Unpack the rows written since the last update into the bit-plane
+
+        Returns:
+            int: number of rows refreshed
+        """
+        rows = np.flatnonzero(np.frombuffer(self.dirty, dtype=np.uint8, count=Screen.HEIGHT))
+        if len(rows):
+            # Little-endian words unpacked LSB-first give pixels in left-to-right order
+            self.plane[rows] = np.unpackbits(self.words[rows].view(np.uint8), axis=1, bitorder='little')
+            self.dirty[:Screen.HEIGHT] = bytes(Screen.HEIGHT)
+        return len(rows)
+
+    def frame(self) -> np.ndarray:
+        """Up-to-date copy of the bit-plane, shaped (256, 512)"""
+        self.update()
+        return self.plane.copy()
+
+    def to_pbm(self, output_file: str) -> None:
+        """Write the current frame as a binary PBM (P4) image"""
+        self.update()
+        with open(output_file, "wb") as f:
+            f.write(f"P4\n{Screen.WIDTH} {Screen.HEIGHT}\n".encode('ascii'))
+            f.write(np.packbits(self.plane, axis=1).tobytes())
+
+    def to_png(self, output_file: str) -> None:
+        """Write the current frame as a 1-bit grayscale PNG"""
+        self.update()
+        # PNG grayscale has 0 as black, the opposite of the Hack screen; every scanline starts with filter byte 0
+        scanlines = np.packbits(1 - self.plane, axis=1)
+        raw = np.hstack([np.zeros((Screen.HEIGHT, 1), dtype=np.uint8), scanlines]).tobytes()
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        with open(output_file, "wb") as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+            f.write(chunk(b'IHDR', struct.pack(">IIBBBBB", Screen.WIDTH, Screen.HEIGHT, 1, 0, 0, 0, 0)))
+            f.write(chunk(b'IDAT', zlib.compress(raw)))
+            f.write(chunk(b'IEND', b''))
+
+def main(input_file: str, max_cycles: int, output_file: str):
+    if input_file.endswith(".asm"):
+        machine = HackMachine.from_asm(input_file)
+    else:
+        machine = HackMachine.from_hack(input_file)
+    screen = Screen(machine)
+    machine.run_blocks(max_cycles)
+    if output_file.endswith(".png"):
+        screen.to_png(output_file)
+    else:
+        screen.to_pbm(output_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python screen.py <input_file.hack|input_file.asm> <max_cycles> <output_file.pbm|output_file.png>")
+        sys.exit(1)
+    main(sys.argv[1], int(sys.argv[2]), sys.argv[3])
@@ -1,5 +1,20 @@
+import glob
+import io
+import json
+import mmap
+import os
 import sys
+import tempfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum, auto
+from cost_model import annotate_file, summary_report
+from vm_ir import PassManager, VMInstruction
+
+# The assembler, the CPU emulator and the build cache live in projects/06
+PROJECT_06 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "06")
+if PROJECT_06 not in sys.path:
+    sys.path.insert(0, PROJECT_06)
 
 class VMTranslator:
 
@@ -29,9 +44,16 @@ class VMTranslator:
 
     # STACK_LEN = 255-16+1
     
-    def __init__(self, input_file: str, output_file: str | None = None):
+    def __init__(self, input_file: str, output_file: str | None = None, source_map: bool = False, optimize: int = 0,
+                 top_in_d: bool = False, shared_compare: bool = False, stream: io.TextIOBase | None = None, costs: bool = False):
+        self.input_file = input_file
+        self.source_map = source_map
+        self.costs = costs # annotate commands with their cost; commands are told apart by their source map entries
+        self.pass_manager = PassManager(optimize)
         self.parser = Parser(input_file=input_file)
-        self.code_writer = CodeWriter(output_file=output_file)
+        writer = TopInDCodeWriter if top_in_d else CodeWriter
+        self.code_writer = writer(output_file=output_file, source_map=source_map or costs, shared_compare=shared_compare, stream=stream)
+        self.code_writer.set_file_name(input_file)
 
     def gen_terminating_loop(self) -> None:
         """Add terminating loop to asm code in CodeWriter output file
@@ -41,25 +63,48 @@ class VMTranslator:
             @END_LOOP
             0;JMP
         """
-        cmd = "(END_LOOP)\n@END_LOOP\n0;JMP"
-        self.code_writer.f.write("// Concluding infinite loop\n")
-        self.code_writer.f.write(cmd)
+        self.code_writer.write_terminating_loop()
 
-    def translate(self):
-        """Loops through commands on Parser object, pass each through CodeWriter methods, and obtain final file
+    def instructions(self):
+        """Lower the parsed commands to IR instructions, lazily
+
+        Yields:
+            VMInstruction: one per VM command
         """
-        # print(self.parser)
         while self.parser.has_more_commands():
-            current_cmd_type = self.parser.command_type()
-            arg1 = self.parser.arg1()
-            if current_cmd_type == Command.C_ARITHMETICAL_LOGICAL:
-                self.code_writer.write_arithmetic(arg1)
-            elif current_cmd_type == Command.C_POP or current_cmd_type == Command.C_PUSH:
-                arg2 = self.parser.arg2()
-                self.code_writer.write_push_pop(current_cmd_type, segment=arg1, idx=arg2)
+            self.parser.command_type() # rejects unknown commands
+            yield VMInstruction.from_words(self.parser.current_cmd, self.parser.source_line)
             self.parser.advance()
+
+    def translated_commands(self) -> Iterator[VMInstruction]:
+        """Streams commands from the Parser through the optimization passes and CodeWriter methods,
+        one at a time
+
+        Yields:
+            VMInstruction: each instruction, once its code has been written
+        """
+        for instr in self.pass_manager.run(self.instructions()):
+            self.code_writer.set_source(self.input_file, instr.source_line, instr.text())
+            self.code_writer.write_instruction(instr)
+            yield instr
+        self.code_writer.flush()
+
+    def translate_commands(self) -> None:
+        """Translate every command, without ending the program"""
+        for _ in self.translated_commands():
+            pass
+
+    def translate(self):
+        """Translate every command, then end the program, and obtain final file
+        """
+        self.translate_commands()
         self.gen_terminating_loop()
+        self.code_writer.write_runtime()
         self.code_writer.close()
+        if self.costs and self.code_writer.owns_file:
+            annotate_file(self.code_writer.output_file, self.code_writer.source_entries)
+        if self.source_map:
+            self.code_writer.write_source_map(self.code_writer.filename + ".vmmap")
 
 class Command(Enum):
     """Command enum for identifying VM commands
@@ -83,47 +128,54 @@ class Parser:
     }
 
     def __init__(self, input_file: str) -> None:
-        """Opens the input file and gets ready to parse it
+        """Opens the input file and gets ready to parse it. Commands are read lazily, one at a time,
+        as the parser advances.
 
         Args:
-            input_file (str): assembly file path
+            input_file (str): VM file path
         """
-        self.line: int = 0
-        self.commands: list = []
-
-        with open(input_file, "r") as asm:
-            for cmd in asm:
-                cmd_no_comment, _, _ = cmd.partition("//")
-                cmd_no_ws = cmd_no_comment.split()
-                if len( cmd_no_ws ) > 0:
-                    self.commands.append(cmd_no_ws)
-
-        self.num_commands: int = len(self.commands)
-
-        try:
-            self.current_cmd: str = self.commands[self.line]
-        except IndexError:
+        self.stream: Iterator[tuple] = Parser.read(Parser.read_lines(input_file)) # (source line, command) pairs
+        self.line: int = -1 # index of the current command
+        self.advance()
+        if not self.has_more_commands():
             print("Input file: " + input_file)
             raise IndexError("Command list has length 0")
 
+    @staticmethod
+    def read_lines(input_file: str) -> Iterator[str]:
+        """Yield the lines of a file one at a time from a read-only memory map"""
+        with open(input_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0: # empty files can't be mapped
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    yield line.decode()
+
+    @staticmethod
+    def read(lines: Iterable[str]) -> Iterator[tuple]:
+        """Yield (1-based source line, command split into words) for every line holding a command"""
+        for line_no, cmd in enumerate(lines, start=1):
+            cmd_no_comment, _, _ = cmd.partition("//")
+            cmd_no_ws = cmd_no_comment.split()
+            if len( cmd_no_ws ) > 0:
+                yield line_no, cmd_no_ws
 
     def __str__(self) -> str:
-        return str( self.commands )
+        return f"Parser at line {self.source_line}: {self.current_cmd}"
 
     def has_more_commands(self) -> bool:
         """Boolean for whether there are more commands in the input
 
             Returns:
-                bool: comparison between current line and length of commands
+                bool: whether a current command was read
         """
-        return self.line < self.num_commands
+        return self.current_cmd is not None
 
     def advance(self) -> None:
         """Reads the next comand from the input and makes it the current command 
         """
         self.line += 1
-        if self.has_more_commands():
-            self.current_cmd = self.commands[self.line]
+        self.source_line, self.current_cmd = next(self.stream, (None, None))
 
     def command_type(self) -> Command:
         """Returns the type of the current command
@@ -163,26 +215,123 @@ class CodeWriter:
             },
     }
     
-    def __init__(self, output_file: str | None = None) -> None:
+    COMPARES = ("eq", "gt", "lt")
+
+    def __init__(self, output_file: str | None = None, source_map: bool = False, shared_compare: bool = False,
+                 stream: io.TextIOBase | None = None) -> None:
         if output_file:
             self.filename, _, self.ext = output_file.rpartition('.')
         else:
             self.filename, self.ext = "output-translator", "asm"
         self.output_file = self.filename + "." + self.ext
-        self.f = open(self.output_file, "w", encoding='ascii')
+        self.owns_file = stream is None # streams handed in are left open for the caller
+        self.f = stream if stream is not None else open(self.output_file, "w", encoding='ascii')
+        # Compares call one shared routine per kind instead of inlining a compare block; the routines
+        # used are written after the program by `write_runtime`
+        self.shared_compare = shared_compare
+        self.runtime: dict = {} # compare kind -> number of call sites
+        self.vm_name = "Foo" # VM file name without extension, prefixing static symbols
+        self.label_prefix = "" # keeps the labels of one file's translation apart from the other files'
         self.n = 0 # Iteration of a given assembly block label
+        self.asm_line = 0 # Number of lines written so far
+        # [first asm line, vm file, vm line, vm command] per translated command, only kept for source maps
+        self.source_entries: list | None = [] if source_map else None
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback) -> None:
-        self.f.close()
+        self.close()
+
+    def set_file_name(self, vm_file: str) -> None:
+        """Informs the writer that translation of a new VM file has started"""
+        self.vm_name = os.path.basename(vm_file).rpartition('.')[0] or "Foo"
+        self.label_prefix = self.vm_name + "."
+        self.n = 0
+
+    @property
+    def label_id(self) -> str:
+        """Unique suffix for the labels of the next generated block"""
+        return f"{self.label_prefix}{self.n}"
+
+    def write_instruction(self, instr: VMInstruction) -> None:
+        """Translate one IR instruction"""
+        match instr.op:
+            case "push":
+                self.write_push_pop(Command.C_PUSH, segment=instr.segment, idx=instr.index)
+            case "pop":
+                self.write_push_pop(Command.C_POP, segment=instr.segment, idx=instr.index)
+            case "move":
+                self.write_move(instr.segment, instr.index, *instr.dest)
+            case other:
+                self.write_arithmetic(other)
+
+    def flush(self) -> None:
+        """Write out whatever part of the stack the writer keeps in registers; this one keeps it all in memory"""
+        pass
+
+    def write(self, text: str) -> None:
+        """Write translated asm to the output file, keeping count of output lines for the source map
+        """
+        self.f.write(text)
+        self.asm_line += text.count("\n")
+
+    def set_source(self, vm_file: str | None, vm_line: int | None, command: str) -> None:
+        """Mark the VM command that the following asm lines are translated from
+        """
+        if self.source_entries is not None:
+            self.source_entries.append([self.asm_line + 1, vm_file, vm_line, command])
+
+    def write_source_map(self, map_file: str) -> None:
+        """Write the asm line -> VM command map as compact JSON
+
+        Args:
+            map_file (str): output path
+        """
+        with open(map_file, "w") as f:
+            json.dump({"asm": self.output_file, "entries": self.source_entries}, f, separators=(',', ':'))
 
     def concat_asm_commands(cmd_list: list[str]) -> str:
         return '\n'.join(cmd_list) + '\n'
 
+    def write_terminating_loop(self) -> None:
+        cmd = "(END_LOOP)\n@END_LOOP\n0;JMP"
+        self.flush()
+        self.set_source(None, None, "<terminating loop>")
+        self.write("// Concluding infinite loop\n")
+        self.write(cmd)
+
+    def write_compare_call(self, cmd: str) -> None:
+        """Call the shared routine for a compare, passing the return address in D"""
+        return_label = f"CMP_RETURN<{self.label_id}>"
+        self.n += 1
+        self.runtime[cmd] = self.runtime.get(cmd, 0) + 1
+        self.write(CodeWriter.concat_asm_commands([f"@{return_label}", "D=A", f"@CMP_{cmd.upper()}", "0;JMP", f"({return_label})"]))
+
+    def write_compare_routine(self, cmd: str) -> None:
+        """Body of the shared routine for a compare: the inlined compare block, then a jump back through R15"""
+        self.write(CodeWriter.concat_asm_commands(["@R15", "M=D"]))
+        self.shared_compare = False
+        self.write_arithmetic(cmd)
+        self.shared_compare = True
+        self.write(CodeWriter.concat_asm_commands(["@R15", "A=M", "0;JMP"]))
+
+    def write_runtime(self) -> None:
+        """Write the shared routines called by the program, after its terminating loop"""
+        if not self.runtime:
+            return
+        self.write("\n")
+        self.set_source(None, None, "<runtime>")
+        self.write("// Runtime: shared compare routines\n")
+        for cmd in self.runtime:
+            self.write(f"(CMP_{cmd.upper()})\n")
+            self.write_compare_routine(cmd)
+
     def write_arithmetic(self, cmd: str) -> None:
-        self.f.write("//" + str(cmd) + "\n") # write command as comment for debugging
+        self.write("//" + str(cmd) + "\n") # write command as comment for debugging
+        if self.shared_compare and cmd in CodeWriter.COMPARES:
+            self.write_compare_call(cmd)
+            return
         match cmd:
             case "add":
                 # Pop from stack => write_push_pop(Command.C_POP, segment [SOMETHING THAT TRANSLATES TO stackBase], )
@@ -201,7 +350,7 @@ class CodeWriter:
                 @PUSH_OP
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THIS", "A=M", "D=M", "@THAT", "A=M", "M=D+M"])
-                self.f.write(commands_pre) # write translated command
+                self.write(commands_pre) # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
                 """
                 @THIS
@@ -227,7 +376,7 @@ class CodeWriter:
                 @PUSH_OP
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THIS", "A=M", "D=M", "@THAT", "A=M", "M=M-D"])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
 
                 # commands_post = CodeWriter.concat_asm_commands(["@THIS", "A=M", "M=0", "@THAT", "A=M", "M=0"])
@@ -240,7 +389,7 @@ class CodeWriter:
                 M=-M
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THAT", "A=M", "M=-M"])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
             case "eq":
                 self.write_push_pop(Command.C_POP, "pointer", 0) # Pop into THIS
@@ -253,32 +402,32 @@ class CodeWriter:
                 A=M
                 D=D-M 
 
-                @PUSH_TRUE<{self.n}>
+                @PUSH_TRUE<{self.label_id}>
                 D;JEQ
                 
-                @PUSH_FALSE<{self.n}>
+                @PUSH_FALSE<{self.label_id}>
                 D;JNE
 
-                (PUSH_TRUE<{self.n}>) // global counter for each type of label
+                (PUSH_TRUE<{self.label_id}>) // global counter for each type of label
                     @THAT
                     M=1
-                    @CONTINUE_EXE<{self.n}>
+                    @CONTINUE_EXE<{self.label_id}>
                     0;JMP
-                (PUSH_FALSE<{self.n}>)
+                (PUSH_FALSE<{self.label_id}>)
                     @THAT
                     M=0
-                    @CONTINUE_EXE<{self.n}>
+                    @CONTINUE_EXE<{self.label_id}>
                     0;JMP
-                (CONTINUE_EXE<{self.n}>)
+                (CONTINUE_EXE<{self.label_id}>)
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THIS", "A=M", "D=M", "@THAT", "A=M", "D=D-M",
-                                                                f"@PUSH_TRUE<{self.n}>", "D;JEQ",
-                                                                f"@PUSH_FALSE<{self.n}>", "D;JNE",
-                                                                f"(PUSH_TRUE<{self.n}>)", "@THAT", "M=1", f"@CONTINUE_EXE<{self.n}>", "0;JMP",
-                                                                f"(PUSH_FALSE<{self.n}>)", "@THAT", "M=0", f"@CONTINUE_EXE<{self.n}>", "0;JMP",
-                                                                f"(CONTINUE_EXE<{self.n}>)"
+                                                                f"@PUSH_TRUE<{self.label_id}>", "D;JEQ",
+                                                                f"@PUSH_FALSE<{self.label_id}>", "D;JNE",
+                                                                f"(PUSH_TRUE<{self.label_id}>)", "@THAT", "M=1", f"@CONTINUE_EXE<{self.label_id}>", "0;JMP",
+                                                                f"(PUSH_FALSE<{self.label_id}>)", "@THAT", "M=0", f"@CONTINUE_EXE<{self.label_id}>", "0;JMP",
+                                                                f"(CONTINUE_EXE<{self.label_id}>)"
                                                            ])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
                 self.n += 1
             case "gt":
@@ -292,32 +441,32 @@ class CodeWriter:
                 A=M
                 D=D-M 
 
-                @PUSH_TRUE<{self.n}>
+                @PUSH_TRUE<{self.label_id}>
                 D;JGT
                 
-                @PUSH_FALSE<{self.n}>
+                @PUSH_FALSE<{self.label_id}>
                 D;JLE
 
-                (PUSH_TRUE<{self.n}>)
+                (PUSH_TRUE<{self.label_id}>)
                     @THAT
                     M=1
-                    @CONTINUE_EXE<{self.n}>
+                    @CONTINUE_EXE<{self.label_id}>
                     0;JMP
-                (PUSH_FALSE<{self.n}>)
+                (PUSH_FALSE<{self.label_id}>)
                     @THAT
                     M=0
-                    @CONTINUE_EXE<{self.n}>
+                    @CONTINUE_EXE<{self.label_id}>
                     0;JMP
-                (CONTINUE_EXE<{self.n}>)
+                (CONTINUE_EXE<{self.label_id}>)
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THIS", "A=M", "D=M", "@THAT", "A=M", "D=D-M",
-                                                           f"@PUSH_TRUE<{self.n}>", "D;JGT",
-                                                           f"@PUSH_FALSE<{self.n}>", "D;JLE",
-                                                           f"(PUSH_TRUE<{self.n}>)", "@THAT", "M=1", f"@CONTINUE_EXE<{self.n}>", "0;JMP",
-                                                           f"(PUSH_FALSE<{self.n}>)", "@THAT", "M=0", f"@CONTINUE_EXE<{self.n}>", "0;JMP",
-                                                           f"(CONTINUE_EXE<{self.n}>)"
+                                                           f"@PUSH_TRUE<{self.label_id}>", "D;JGT",
+                                                           f"@PUSH_FALSE<{self.label_id}>", "D;JLE",
+                                                           f"(PUSH_TRUE<{self.label_id}>)", "@THAT", "M=1", f"@CONTINUE_EXE<{self.label_id}>", "0;JMP",
+                                                           f"(PUSH_FALSE<{self.label_id}>)", "@THAT", "M=0", f"@CONTINUE_EXE<{self.label_id}>", "0;JMP",
+                                                           f"(CONTINUE_EXE<{self.label_id}>)"
                                                            ])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
                 self.n += 1
             case "lt":
@@ -330,32 +479,32 @@ class CodeWriter:
                 A=M
                 D=D-A 
 
-                @PUSH_TRUE<{self.n}>
+                @PUSH_TRUE<{self.label_id}>
                 D;JLT
                 
-                @PUSH_FALSE<{self.n}>
+                @PUSH_FALSE<{self.label_id}>
                 D;JGE
 
-                (PUSH_TRUE<{self.n}>)
+                (PUSH_TRUE<{self.label_id}>)
                     @THAT
                     M=1
-                    @CONTINUE_EXE<{self.n}>
+                    @CONTINUE_EXE<{self.label_id}>
                     0;JMP
-                (PUSH_FALSE<{self.n}>)
+                (PUSH_FALSE<{self.label_id}>)
                     @THAT
                     M=0
-                    @CONTINUE_EXE<{self.n}>
+                    @CONTINUE_EXE<{self.label_id}>
                     0;JMP
-                (CONTINUE_EXE<{self.n}>)
+                (CONTINUE_EXE<{self.label_id}>)
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THIS", "A=M", "D=M", "@THAT", "A=M", "D=D-M",
-                                                           f"@PUSH_TRUE<{self.n}>", "D;JLT",
-                                                           f"@PUSH_FALSE<{self.n}>", "D;JGE",
-                                                           f"(PUSH_TRUE<{self.n}>)", "@THAT", "M=1", f"@CONTINUE_EXE<{self.n}>", "0;JMP",
-                                                           f"(PUSH_FALSE<{self.n}>)", "@THAT", "M=0", f"@CONTINUE_EXE<{self.n}>", "0;JMP",
-                                                           f"(CONTINUE_EXE<{self.n}>)"
+                                                           f"@PUSH_TRUE<{self.label_id}>", "D;JLT",
+                                                           f"@PUSH_FALSE<{self.label_id}>", "D;JGE",
+                                                           f"(PUSH_TRUE<{self.label_id}>)", "@THAT", "M=1", f"@CONTINUE_EXE<{self.label_id}>", "0;JMP",
+                                                           f"(PUSH_FALSE<{self.label_id}>)", "@THAT", "M=0", f"@CONTINUE_EXE<{self.label_id}>", "0;JMP",
+                                                           f"(CONTINUE_EXE<{self.label_id}>)"
                                                            ])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
                 self.n += 1
             case "and":
@@ -372,7 +521,7 @@ class CodeWriter:
                 M=D
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THIS", "A=M", "D=M", "@THAT", "A=M", "D=D&M", "@THAT", "M=D"])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
             case "or":
                 self.write_push_pop(Command.C_POP, "pointer", 0) # Pop into THIS
@@ -388,7 +537,7 @@ class CodeWriter:
                 M=D
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THIS", "A=M", "D=M", "@THAT", "A=M", "D=D|M", "@THAT", "M=D"])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
             case "not":
                 self.write_push_pop(Command.C_POP, "pointer", 1) # Pop into THAT
@@ -398,20 +547,23 @@ class CodeWriter:
                 M=!M
                 """
                 commands_pre = CodeWriter.concat_asm_commands(["@THAT", "A=M", "M=!M"])
-                self.f.write(commands_pre + "\n") # write translated command
+                self.write(commands_pre + "\n") # write translated command
                 self.write_push_pop(Command.C_PUSH, "pointer", 1)
             case other:
                 raise ValueError("Invalid VM command passed to arithmetic writer")
     
-    def write_push_pop(self, cmd: Command, segment: str, idx: int) -> None:
-        # Push: stack[SP++] = x -> @SP; A=M; M=D; @SP; M=M+1
-        # Pop: x = stack[SP--] -> @SP; A=M; D=M; @SP; M=M-1
-        segment_is_constant = False
+    def segment_operands(self, segment: str, idx: int) -> tuple:
+        """A commands for the base and the offset of a segment access
+
+        Returns:
+            tuple[str | None, str]: base (None for constants) and index A commands
+        """
         idx_asm = f"@{idx}"
+        segment_asm = None
         match segment:
             case "static":
                 segment_asm = "@" + CodeWriter.VIRTUAL_REGS[segment]
-                idx_asm = f"@Foo.{idx}"
+                idx_asm = f"@{self.vm_name}.{idx}"
             case "pointer":
                 segment_asm = "@" + CodeWriter.VIRTUAL_REGS[segment][idx]
                 idx_asm = "@0"
@@ -419,6 +571,33 @@ class CodeWriter:
                 pass
             case _:
                 segment_asm = "@" + CodeWriter.VIRTUAL_REGS[segment]
+        return segment_asm, idx_asm
+
+    def write_move(self, src_segment: str, src_idx: int, dest_segment: str, dest_idx: int) -> None:
+        """Copy a value from one segment to another without going through the stack, computing the
+        same addresses that `push src` followed by `pop dest` would
+        """
+        src_asm, src_idx_asm = self.segment_operands(src_segment, src_idx)
+        dest_asm, dest_idx_asm = self.segment_operands(dest_segment, dest_idx)
+        if dest_segment == "temp": # fixed address, no need to park it in R13
+            store = [f"@{int(dest_asm[1:]) + dest_idx}", "M=D"]
+            cmds = []
+        else:
+            cmds = [dest_asm, "D=M", f"{dest_idx_asm} // @idx", "D=D+A", "@R13", "M=D"]
+            store = ["@R13", "A=M", "M=D"]
+        if src_segment == "constant":
+            cmds += [src_idx_asm, "D=A"]
+        elif src_segment == "temp":
+            cmds += [src_asm, "D=A", f"{src_idx_asm} // @idx", "A=D+A", "D=M"]
+        else:
+            cmds += [src_asm, "D=M", f"{src_idx_asm} // @idx", "A=D+A", "D=M"]
+        self.write(f"// move {src_segment} {src_idx} -> {dest_segment} {dest_idx}\n")
+        self.write(CodeWriter.concat_asm_commands(cmds + store))
+
+    def write_push_pop(self, cmd: Command, segment: str, idx: int) -> None:
+        # Push: stack[SP++] = x -> @SP; A=M; M=D; @SP; M=M+1
+        # Pop: x = stack[SP--] -> @SP; A=M; D=M; @SP; M=M-1
+        segment_asm, idx_asm = self.segment_operands(segment, idx)
         if cmd == Command.C_PUSH:
             """
                 // If segment == temp
@@ -501,21 +680,408 @@ class CodeWriter:
             # cmds = [ segment_asm, "D=M", f"{idx_asm} // @idx", "D=D+A", "@SP", "M=M-1", "A=M+1", "M=D", "@SP", "D=M", "A=M+1", "A=M", "M=D" ]
             commands = CodeWriter.concat_asm_commands(cmds)
 
-        self.f.write(f"// {str(cmd)} { str(segment) } { str(idx) }\n") # write command as comment for debugging
-        self.f.write(commands) # write translated command
+        self.write(f"// {str(cmd)} { str(segment) } { str(idx) }\n") # write command as comment for debugging
+        self.write(commands) # write translated command
 
     def close(self) -> None:
-        self.f.close()
+        if self.owns_file:
+            self.f.close()
+
+class TopInDCodeWriter(CodeWriter):
+    """Code writer that keeps the top of the stack cached in D.
+
+    While `cached` is set, the stack is RAM[256..SP-1] plus the value in D; otherwise it's all in
+    memory. Each command lowers to a minimal template given that state, so `add` on a cached top is
+    just `@SP AM=M-1 D=D+M`. Pops leave the popped slots as they are instead of clearing them, and
+    the only scratch registers used are R13 and R14, plus R15 for the return address of the shared
+    compare routines under `shared_compare`. Segments follow the VM spec: `pointer` is THIS/THAT
+    themselves, statics are `<File>.i` symbols and true is -1.
+
+    The cache is written back by `flush`, which has to happen wherever control leaves straight-line
+    code; for the commands of this translator that's only the end of the program.
+    """
+
+    SPILL = ["@SP", "AM=M+1", "A=A-1", "M=D"] # push D to memory
+    LOAD = ["@SP", "AM=M-1", "D=M"] # pop memory into D
+    BINARY = {"add": "D=D+M", "sub": "D=M-D", "and": "D=D&M", "or": "D=D|M"} # x in M, y in D
+    UNARY = {"neg": "D=-D", "not": "D=!D"}
+    COMPARE = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+    BASES = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+    MAX_CHAINED_INDEX = 11 # past this, walking A up from the base costs more than going through R13/R14
 
-def main(input_file: str, output_file: str | None = None):
-    translator = VMTranslator(input_file, output_file=output_file)
+    def __init__(self, output_file: str | None = None, source_map: bool = False, shared_compare: bool = False,
+                 stream: io.TextIOBase | None = None) -> None:
+        super().__init__(output_file=output_file, source_map=source_map, shared_compare=shared_compare, stream=stream)
+        self.cached = False
+
+    def load_top(self) -> list:
+        if self.cached:
+            return []
+        self.cached = True
+        return list(TopInDCodeWriter.LOAD) # callers extend the template
+
+    def spill_top(self) -> list:
+        if not self.cached:
+            return []
+        self.cached = False
+        return list(TopInDCodeWriter.SPILL)
+
+    def fixed_address(self, segment: str, idx: int) -> str | None:
+        """A command for segments whose addresses are known at translation time, else None"""
+        match segment:
+            case "temp":
+                return f"@{5 + idx}"
+            case "pointer":
+                return "@" + CodeWriter.VIRTUAL_REGS[segment][idx]
+            case "static":
+                return f"@{self.vm_name}.{idx}"
+        return None
+
+    def read(self, segment: str, idx: int) -> list:
+        """Template loading a segment entry into D"""
+        if segment == "constant":
+            return ["D=0"] if idx == 0 else ["D=1"] if idx == 1 else [f"@{idx}", "D=A"]
+        fixed = self.fixed_address(segment, idx)
+        if fixed is not None:
+            return [fixed, "D=M"]
+        base = "@" + TopInDCodeWriter.BASES[segment]
+        if idx <= 1:
+            return [base, "A=M" if idx == 0 else "A=M+1", "D=M"]
+        return [f"@{idx}", "D=A", base, "A=D+M", "D=M"]
+
+    def store(self, segment: str, idx: int) -> list:
+        """Template storing D into a segment entry"""
+        if segment == "constant":
+            raise ValueError("Cannot pop to the constant segment")
+        fixed = self.fixed_address(segment, idx)
+        if fixed is not None:
+            return [fixed, "M=D"]
+        base = "@" + TopInDCodeWriter.BASES[segment]
+        if idx <= TopInDCodeWriter.MAX_CHAINED_INDEX:
+            return [base, "A=M" if idx == 0 else "A=M+1"] + ["A=A+1"] * (idx - 1) + ["M=D"]
+        return ["@R13", "M=D", base, "D=M", f"@{idx}", "D=D+A", "@R14", "M=D", "@R13", "D=M", "@R14", "A=M", "M=D"]
+
+    def write_push_pop(self, cmd: Command, segment: str, idx: int) -> None:
+        if cmd == Command.C_PUSH:
+            cmds = self.spill_top() + self.read(segment, idx)
+            self.cached = True
+        else:
+            cmds = self.load_top() + self.store(segment, idx)
+            self.cached = False
+        self.write(f"// {cmd.name[2:].lower()} {segment} {idx}\n")
+        self.write(CodeWriter.concat_asm_commands(cmds))
+
+    def write_move(self, src_segment: str, src_idx: int, dest_segment: str, dest_idx: int) -> None:
+        self.write_push_pop(Command.C_PUSH, src_segment, src_idx)
+        self.write_push_pop(Command.C_POP, dest_segment, dest_idx)
+
+    def write_arithmetic(self, cmd: str) -> None:
+        cmds = self.load_top()
+        if cmd in TopInDCodeWriter.BINARY:
+            cmds += ["@SP", "AM=M-1", TopInDCodeWriter.BINARY[cmd]]
+        elif cmd in TopInDCodeWriter.UNARY:
+            cmds += [TopInDCodeWriter.UNARY[cmd]]
+        elif cmd in TopInDCodeWriter.COMPARE and self.shared_compare:
+            # y goes to R13 and the return address in D; the routine pops x and returns the result in D
+            self.write("//" + cmd + "\n")
+            self.write(CodeWriter.concat_asm_commands(cmds + ["@R13", "M=D"]))
+            self.write_compare_call(cmd)
+            return
+        elif cmd in TopInDCodeWriter.COMPARE:
+            true_label, end_label = f"CMP_TRUE.{self.label_id}", f"CMP_END.{self.label_id}"
+            cmds += ["@SP", "AM=M-1", "D=M-D", "@" + true_label, "D;" + TopInDCodeWriter.COMPARE[cmd],
+                     "D=0", "@" + end_label, "0;JMP", f"({true_label})", "D=-1", f"({end_label})"]
+            self.n += 1
+        else:
+            raise ValueError("Invalid VM command passed to arithmetic writer")
+        self.write("//" + cmd + "\n")
+        self.write(CodeWriter.concat_asm_commands(cmds))
+
+    def write_compare_routine(self, cmd: str) -> None:
+        true_label = f"CMP_{cmd.upper()}_TRUE"
+        self.write(CodeWriter.concat_asm_commands(["@R15", "M=D", "@SP", "AM=M-1", "D=M", "@R13", "D=D-M",
+                                                   "@" + true_label, "D;" + TopInDCodeWriter.COMPARE[cmd],
+                                                   "D=0", "@R15", "A=M", "0;JMP",
+                                                   f"({true_label})", "D=-1", "@R15", "A=M", "0;JMP"]))
+
+    def flush(self) -> None:
+        spill = self.spill_top()
+        if spill:
+            self.set_source(None, None, "<spill>") # not part of the cost of the command that came last
+            self.write(CodeWriter.concat_asm_commands(spill))
+
+def count_instructions(asm: str) -> int:
+    """Number of Hack instructions in asm text, leaving out labels and comments"""
+    lines = (line.partition("//")[0].strip() for line in asm.splitlines())
+    return sum(1 for line in lines if line and not line.startswith("("))
+
+def count_compare_calls(asm: str) -> int:
+    """Number of shared compare call sites in asm text, one per return label"""
+    return sum(1 for line in asm.splitlines() if line.startswith("(CMP_RETURN<"))
+
+COUNTED_COMMANDS = [
+    "push constant 7", "push local 0", "push local 3", "push argument 1", "push this 2", "push that 5",
+    "push temp 3", "push pointer 0", "push static 2",
+    "pop local 0", "pop local 3", "pop argument 1", "pop this 2", "pop that 5", "pop temp 3", "pop pointer 1", "pop static 2",
+    "add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not",
+]
+
+def instruction_counts() -> list:
+    """Hack instructions each VM command lowers to, with the baseline code writer and with the top of
+    stack in D. Top-in-D counts are for the steady state where the top is already cached on entry.
+
+    Returns:
+        list[tuple[str, int, int]]: (VM command, baseline count, top-in-D count)
+    """
+    rows = []
+    for text in COUNTED_COMMANDS:
+        counts = []
+        for writer_class in (CodeWriter, TopInDCodeWriter):
+            stream = io.StringIO()
+            writer = writer_class(stream=stream)
+            if writer_class is TopInDCodeWriter:
+                writer.cached = True
+            writer.write_instruction(VMInstruction.from_words(text.split()))
+            counts.append(count_instructions(stream.getvalue()))
+        rows.append((text, *counts))
+    return rows
+
+def print_instruction_counts() -> None:
+    rows = instruction_counts()
+    print(f"{'command':<18} {'baseline':>8} {'top-in-D':>8} {'saved':>6}")
+    for text, baseline, cached in rows:
+        print(f"{text:<18} {baseline:>8} {cached:>8} {baseline - cached:>6}")
+    baseline, cached = sum(row[1] for row in rows), sum(row[2] for row in rows)
+    print(f"{'total':<18} {baseline:>8} {cached:>8} {baseline - cached:>6} ({100 * (baseline - cached) / baseline:.0f}% fewer)")
+
+def translate_chunk(vm_file: str, optimize: int, top_in_d: bool, shared_compare: bool, source_map: bool) -> tuple:
+    """Worker: translate one file of a program, without the terminating loop and runtime routines
+
+    Returns:
+        tuple[str, list | None, dict, str]: asm text, source map entries (asm lines counted from the start
+            of the chunk), compare call sites per kind, optimization report
+    """
+    stream = io.StringIO()
+    translator = VMTranslator(vm_file, source_map=source_map, optimize=optimize, top_in_d=top_in_d,
+                              shared_compare=shared_compare, stream=stream)
+    translator.translate_commands()
+    return stream.getvalue(), translator.code_writer.source_entries, translator.code_writer.runtime, translator.pass_manager.report()
+
+def vm_files_in(input_dir: str) -> list:
+    """The .vm files of a program directory, in the order they're laid out in ROM"""
+    return sorted(glob.glob(os.path.join(input_dir, "*.vm")))
+
+def default_output(input_dir: str) -> str:
+    """`<dir>/<dir>.asm`, where a directory's program is written by default"""
+    return os.path.join(input_dir, os.path.basename(os.path.normpath(input_dir)) + ".asm")
+
+def translate_directory(input_dir: str, output_file: str | None = None, source_map: bool = False, optimize: int = 0,
+                        top_in_d: bool = False, shared_compare: bool = False, jobs: int | None = None, costs: bool = False) -> tuple:
+    """Translate every .vm file of a directory into one program. Files are translated in parallel, each with
+    its own `<File>.i` statics and label prefix, and their code is concatenated in file name order, followed by
+    a single terminating loop and the runtime routines any of them call.
+
+    Args:
+        input_dir (str): directory of .vm files
+        output_file (str | None, optional): output path. Defaults to None, `<dir>/<dir>.asm`.
+        jobs (int | None, optional): worker processes. Defaults to None, one per core.
+        costs (bool, optional): annotate commands with their cost and write `<name>.costs.json`. Defaults to False.
+
+    Raises:
+        ValueError: if the directory has no .vm files
+
+    Returns:
+        tuple[list[str], int]: optimization report per file, compare call sites
+    """
+    vm_files = vm_files_in(input_dir)
+    if not vm_files:
+        raise ValueError(f"No .vm files in {input_dir}")
+    n = len(vm_files)
+    args = (vm_files, [optimize] * n, [top_in_d] * n, [shared_compare] * n, [source_map or costs] * n)
+    if n == 1 or jobs == 1:
+        chunks = list(map(translate_chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunks = list(pool.map(translate_chunk, *args))
+
+    writer_class = TopInDCodeWriter if top_in_d else CodeWriter
+    writer = writer_class(output_file=output_file or default_output(input_dir), source_map=source_map or costs, shared_compare=shared_compare)
+    writer.label_prefix = "$runtime." # routine labels can't clash with any file's
+    for asm, entries, runtime, _ in chunks:
+        if entries is not None:
+            writer.source_entries.extend([asm_line + writer.asm_line, *rest] for (asm_line, *rest) in entries)
+        writer.write(asm)
+        for cmd, calls in runtime.items():
+            writer.runtime[cmd] = writer.runtime.get(cmd, 0) + calls
+    writer.write_terminating_loop()
+    writer.write_runtime()
+    writer.close()
+    if costs:
+        annotate_file(writer.output_file, writer.source_entries)
+    if source_map:
+        writer.write_source_map(writer.filename + ".vmmap")
+    return [report for (_, _, _, report) in chunks], sum(writer.runtime.values())
+
+def translate_path(input_file: str, output_file: str | None = None, source_map: bool = False, optimize: int = 0,
+                   top_in_d: bool = False, shared_compare: bool = False, jobs: int | None = None, costs: bool = False) -> tuple:
+    """Translate a .vm file or a directory of them
+
+    Returns:
+        tuple[list[str], int]: optimization report per file, compare call sites
+    """
+    if os.path.isdir(input_file):
+        return translate_directory(input_file, output_file, source_map, optimize, top_in_d, shared_compare, jobs, costs)
+    translator = VMTranslator(input_file, output_file=output_file, source_map=source_map, optimize=optimize, top_in_d=top_in_d,
+                              shared_compare=shared_compare, costs=costs)
     translator.translate()
+    return [translator.pass_manager.report()], sum(translator.code_writer.runtime.values())
+
+def compare_rom_sizes(input_file: str, asm_file: str, optimize: int = 0, top_in_d: bool = False, shared_compare: bool = False,
+                      jobs: int | None = None) -> tuple:
+    """ROM size of a VM file or directory translated with inlined compares and with shared compare routines.
+    `asm_file` is the program as already built with `shared_compare`; only the other variant is translated.
+
+    Returns:
+        tuple[int, int, int]: inlined ROM words, shared ROM words, compare call sites
+    """
+    with open(asm_file, "r") as f:
+        built = f.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        other_file = os.path.join(tmp, "other.asm")
+        translate_path(input_file, other_file, optimize=optimize, top_in_d=top_in_d, shared_compare=not shared_compare, jobs=jobs)
+        with open(other_file, "r") as f:
+            other = f.read()
+    inlined, shared = (other, built) if shared_compare else (built, other)
+    return count_instructions(inlined), count_instructions(shared), count_compare_calls(shared)
+
+def verify(input_file: str, optimize: int, max_cycles: int = 1_000_000, top_in_d: bool = False, shared_compare: bool = False) -> tuple:
+    """Translate a VM file with and without optimization, run both on the Hack CPU emulator
+    from the test scripts' initial state, and compare the final RAM.
+
+    A build that touches illegal memory is reported as a fault instead, and nothing is compared: the RAM of
+    a faulted machine is undefined. The faulting build is re-run one instruction at a time to find its PC.
+
+    The optimized program may legitimately differ in dead stack slots above SP, in the RAM[THIS]/RAM[THAT]
+    cells the arithmetic commands use as scratch and in the R13-R15 scratch registers, so those are not compared.
+    The top-in-D writer follows the VM spec where the baseline writer doesn't (`pointer`, `static`, `and`, `or`
+    and the comparisons), so only programs avoiding those compare equal with it.
+
+    Args:
+        input_file (str): VM file path
+        optimize (int): optimization level to check against level 0
+        max_cycles (int, optional): instruction budget per run. Defaults to 1_000_000.
+        top_in_d (bool, optional): check the top-in-D code writer rather than the baseline one. Defaults to False.
+        shared_compare (bool, optional): check with shared compare routines. Defaults to False.
+
+    Returns:
+        tuple[list, list]: (address, unoptimized value, optimized value) of every mismatch, and
+            (build, fault message) of every build that faulted
+    """
+    from assembler import Assembler
+    from hack_machine import HackMachine
+    machines = []
+    faults = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run, (level, cached, shared) in enumerate(((0, False, False), (optimize, top_in_d, shared_compare))):
+            asm_file = os.path.join(tmp, f"run{run}.asm")
+            VMTranslator(input_file, output_file=asm_file, optimize=level, top_in_d=cached, shared_compare=shared).translate()
+            with open(asm_file, "r") as f:
+                assembler = Assembler.from_text(f.read(), name=asm_file)
+            assembler.first_pass()
+            assembler.second_pass()
+            end = assembler.symbol_line_table["END_LOOP"]
+            for run_chunk in (HackMachine.run_blocks, HackMachine.run): # single-stepping only to locate a fault
+                machine = HackMachine(assembler.binaries)
+                for addr, value in enumerate([256, 300, 400, 3000, 3010]): # SP, LCL, ARG, THIS, THAT
+                    machine.ram[addr] = value
+                try:
+                    while machine.pc not in (end, end + 1) and machine.cycles < max_cycles:
+                        run_chunk(machine, min(10_000, max_cycles - machine.cycles))
+                    break
+                except IndexError as error:
+                    fault = str(error)
+            else:
+                faults.append(("unoptimized" if run == 0 else "optimized", fault))
+            machines.append(machine)
+    if faults:
+        return [], faults
+    baseline, optimized = machines
+    ignored = {13, 14, 15, baseline.ram[3], baseline.ram[4], optimized.ram[3], optimized.ram[4]}
+    ignored.update(range(min(baseline.ram[0], optimized.ram[0]), 2048)) # the stack above SP
+    return [(addr, x, y) for (addr, (x, y)) in enumerate(zip(baseline.ram, optimized.ram)) if x != y and addr not in ignored], []
+
+def translate_cached(input_file: str, output_file: str | None, source_map: bool, cache_dir: str, optimize: int,
+                     top_in_d: bool, shared_compare: bool, jobs: int | None, costs: bool) -> None:
+    """`translate_path` through the build cache, keyed on the VM sources, the options and the translator's own code"""
+    from build_cache import BuildCache
+    import cost_model
+    import vm_ir
+    cache = BuildCache(cache_dir)
+    is_dir = os.path.isdir(input_file)
+    output_base = output_path(input_file, output_file).rpartition('.')[0]
+    options = {"source_map": source_map, "files": [input_file, output_file] if source_map or costs else None, # maps record both paths
+               "optimize": optimize, "top_in_d": top_in_d, "shared_compare": shared_compare, "costs": costs}
+    data = b""
+    for vm_file in (vm_files_in(input_file) if is_dir else [input_file]): # file names matter too: they name statics
+        with open(vm_file, "rb") as f:
+            data += os.path.basename(vm_file).encode() + b"\0" + f.read() + b"\0"
+    version = BuildCache.source_version(os.path.abspath(__file__), os.path.abspath(vm_ir.__file__), os.path.abspath(cost_model.__file__))
+    key = BuildCache.key("vmtranslator", version, options, data)
+    if not cache.fetch(key, output_base):
+        translate_path(input_file, output_file, source_map, optimize, top_in_d, shared_compare, jobs, costs)
+        cache.store(key, output_base, [".asm"] + [".vmmap"] * source_map + [".costs.json"] * costs)
+    print(cache.report())
+
+def output_path(input_file: str, output_file: str | None) -> str:
+    """The .asm file a translation of `input_file` is written to"""
+    if output_file:
+        return output_file
+    return default_output(input_file) if os.path.isdir(input_file) else "output-translator.asm"
+
+def main(input_file: str, output_file: str | None = None, source_map: bool = False, cache_dir: str | None = None, optimize: int = 0,
+         top_in_d: bool = False, shared_compare: bool = False, jobs: int | None = None, costs: bool = False, rom_report: bool = False):
+    if cache_dir is None:
+        reports, _ = translate_path(input_file, output_file, source_map, optimize, top_in_d, shared_compare, jobs, costs)
+        if optimize:
+            print("\n".join(reports))
+    else:
+        translate_cached(input_file, output_file, source_map, cache_dir, optimize, top_in_d, shared_compare, jobs, costs)
+    if costs:
+        with open(output_path(input_file, output_file).rpartition('.')[0] + ".costs.json", "r") as f:
+            print(summary_report(json.load(f)))
+    if rom_report:
+        inlined, shared, calls = compare_rom_sizes(input_file, output_path(input_file, output_file), optimize, top_in_d, shared_compare, jobs)
+        print(f"ROM: {inlined} words with inlined compares, {shared} with shared compare routines ({calls} call sites)")
 
 if __name__ == "__main__":
-    if len(sys.argv) not in (2, 3):
-        print("Usage: python3 VMTranslator.py <input_file> <output_file>")
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("-")]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+    cache_dirs = [flag.partition("=")[2] or ".hackcache" for flag in flags if flag.partition("=")[0] == "--cache"]
+    jobs = [int(flag.partition("=")[2]) for flag in flags if flag.startswith("--jobs=")]
+    levels = [int(flag[2:]) for flag in flags if flag in ("-O0", "-O1", "-O2")]
+    flags = [flag for flag in flags if not flag.startswith(("--cache", "--jobs=")) and flag not in ("-O0", "-O1", "-O2")]
+    if flags == ["--counts"] and not args:
+        print_instruction_counts()
+        sys.exit(0)
+    if (len(args) not in (1, 2) or any(flag not in ("--map", "--verify", "--top-in-d", "--shared-compare", "--rom-report", "--costs") for flag in flags)
+            or ("--verify" in flags and os.path.isdir(args[0]))):
+        print("Usage: python3 VMTranslator.py [-O0 | -O1 | -O2] [--top-in-d] [--shared-compare] [--rom-report] [--verify] [--map] [--costs] [--cache[=DIR]] <input_file> <output_file>")
+        print("       python3 VMTranslator.py [-O0 | -O1 | -O2] [--top-in-d] [--shared-compare] [--rom-report] [--map] [--costs] [--cache[=DIR]] [--jobs=N] <input_dir> <output_file>")
+        print("       python3 VMTranslator.py --counts")
         sys.exit(1)
-    if len(sys.argv) == 2:
-        main(sys.argv[1])
-    elif len(sys.argv) == 3:
-        main(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    optimize = levels[-1] if levels else 0
+    top_in_d, shared_compare = "--top-in-d" in flags, "--shared-compare" in flags
+    main(*args, source_map="--map" in flags, cache_dir=cache_dirs[0] if cache_dirs else None, optimize=optimize, top_in_d=top_in_d,
+         shared_compare=shared_compare, jobs=jobs[0] if jobs else None, costs="--costs" in flags, rom_report="--rom-report" in flags)
+    if "--verify" in flags:
+        mismatches, faults = verify(args[0], optimize, top_in_d=top_in_d, shared_compare=shared_compare)
+        mode = f"-O{optimize}" + (" --top-in-d" if top_in_d else "") + (" --shared-compare" if shared_compare else "")
+        for build, fault in faults:
+            print(f"{build} build: {fault}")
+        for addr, expected, actual in mismatches[:20]:
+            print(f"RAM[{addr}]: {expected} unoptimized, {actual} with {mode}")
+        verdict = (" and ".join(build for (build, _) in faults) + " build faulted" if faults
+                   else f"{len(mismatches)} mismatches" if mismatches else "OK")
+        print(f"{mode} verified against -O0: {verdict}")
+        if mismatches or faults:
+            sys.exit(1)
@@ -0,0 +1,248 @@
+import io
+import json
+import os
+import sys
+import tempfile
+
+class CostModel:
+    """Static and worst-case dynamic cost of the Hack code that VM commands lower to.
+
+    The static cost of a command is the number of instructions emitted for it. Its dynamic cost is the
+    longest path through them in cycles: both sides of every conditional jump are followed, and a jump
+    into a shared routine (code that ends in computed `A=M` jumps back to the caller) adds the routine's
+    own worst case before continuing after the call. Translated commands only jump forward, so a single
+    backward sweep over a command's instructions finds its longest path.
+    """
+
+    def __init__(self, asm: str) -> None:
+        self.instructions: list = [] # instruction text, labels and comments left out
+        self.labels: dict = {} # label -> index of the instruction it marks
+        self.line_index: list = [0] # asm line (1-based) -> index of the first instruction at or after it
+        for line in asm.splitlines():
+            self.line_index.append(len(self.instructions))
+            text = line.partition("//")[0].strip()
+            if text.startswith("("):
+                self.labels[text[1:-1]] = len(self.instructions)
+            elif text:
+                self.instructions.append(text)
+        self.line_index.append(len(self.instructions))
+        self.routines: dict = {} # entry index -> worst-case cycles, None if the code there never returns
+
+    def jump_target(self, i: int) -> int | None:
+        """Index a jump at i goes to, from the `@target` right before it; None for computed jumps"""
+        prev = self.instructions[i - 1] if i > 0 else ""
+        if not prev.startswith("@"):
+            return None
+        symbol = prev[1:]
+        return int(symbol) if symbol.isdigit() else self.labels.get(symbol)
+
+    def routine_cost(self, entry: int) -> int | None:
+        """Worst-case cycles of the routine at `entry`, or None if it doesn't return (like the terminating loop)"""
+        if entry not in self.routines:
+            self.routines[entry] = None # a routine reaching itself again never returns
+            self.routines[entry] = self.longest_path(entry, len(self.instructions))
+        return self.routines[entry]
+
+    def longest_path(self, start: int, end: int) -> int | None:
+        """Most cycles spent from `start` until control reaches `end` or returns through a computed jump
+
+        Returns:
+            int | None: worst-case cycles, None if some path loops back
+        """
+        dist = [0] * (end - start + 1) # dist[i - start]: worst case from instruction i
+        for i in range(end - 1, start - 1, -1):
+            instr = self.instructions[i]
+            cost = 1 + dist[i + 1 - start]
+            jump = "" if instr.startswith("@") else instr.partition(";")[2]
+            if jump:
+                target = self.jump_target(i)
+                if target is None: # returns to a caller
+                    taken = 1
+                elif i < target <= end:
+                    taken = 1 + dist[target - start]
+                elif start <= target <= i:
+                    return None
+                else:
+                    routine = self.routine_cost(target)
+                    taken = 1 if routine is None else 1 + routine + dist[i + 1 - start]
+                cost = taken if jump == "JMP" else max(taken, cost)
+            dist[i - start] = cost
+        return dist[0]
+
+    def command_costs(self, entries: list) -> list:
+        """Cost of every VM command of a translated program
+
+        Args:
+            entries (list): source map entries [first asm line, vm file, vm line, command], in asm order
+
+        Raises:
+            ValueError: if a command's code can loop
+
+        Returns:
+            list[tuple[int, str, int, str, int, int]]: (entry number, vm file, vm line, command, instructions,
+                worst-case cycles) per VM command, leaving out the terminating loop and runtime routines
+        """
+        last_line = len(self.line_index) - 1
+        starts = [self.line_index[min(asm_line, last_line)] for (asm_line, *_) in entries] + [len(self.instructions)]
+        costs = []
+        for k, (_, vm_file, vm_line, command) in enumerate(entries):
+            if vm_file is None:
+                continue
+            start, end = starts[k], starts[k + 1]
+            cycles = self.longest_path(start, end)
+            if cycles is None:
+                raise ValueError(f"Code for `{command}` at {vm_file}:{vm_line} loops")
+            costs.append((k, vm_file, vm_line, command, end - start, cycles))
+        return costs
+
+    @staticmethod
+    def kind(command: str) -> str:
+        """Cost summary bucket of a command: the operator, and the segment for push/pop"""
+        words = command.split()
+        return " ".join(words[:2]) if words[0] in ("push", "pop") else words[0]
+
+    @staticmethod
+    def summarize(costs: list) -> dict:
+        """Totals of a program's command costs, overall and per kind of command"""
+        by_kind: dict = {}
+        for *_, command, instructions, cycles in costs:
+            entry = by_kind.setdefault(CostModel.kind(command), {"count": 0, "instructions": 0, "cycles": 0})
+            entry["count"] += 1
+            entry["instructions"] += instructions
+            entry["cycles"] += cycles
+        return {
+            "commands": len(costs),
+            "instructions": sum(cost[4] for cost in costs),
+            "worst_case_cycles": sum(cost[5] for cost in costs),
+            "by_kind": dict(sorted(by_kind.items(), key=lambda item: -item[1]["cycles"])),
+        }
+
+def annotate_file(asm_file: str, entries: list) -> dict:
+    """Precede every VM command's code in a translated file with a comment giving its cost, and write the
+    program's cost summary to `<name>.costs.json` next to it. `entries` are shifted in place to the
+    annotated line numbers, so a source map written afterwards still lines up.
+
+    Args:
+        asm_file (str): translated program
+        entries (list): its source map entries
+
+    Returns:
+        dict: cost summary, also with the cost of every command
+    """
+    with open(asm_file, "r") as f:
+        lines = f.read().splitlines(keepends=True)
+    costs = CostModel("".join(lines)).command_costs(entries)
+    notes = {k: f"// cost: {instructions} instructions, {cycles} cycles worst case\n" for (k, *_, instructions, cycles) in costs}
+    out = []
+    line = 1 # next line of the original file to copy
+    shift = 0 # notes inserted so far
+    for k, entry in enumerate(entries):
+        out.extend(lines[line - 1:entry[0] - 1])
+        line = max(line, entry[0])
+        entry[0] += shift
+        if k in notes:
+            out.append(notes[k])
+            shift += 1
+    out.extend(lines[line - 1:])
+    with open(asm_file, "w", encoding='ascii') as f:
+        f.writelines(out)
+    summary = CostModel.summarize(costs)
+    summary["per_command"] = [{"file": vm_file, "line": vm_line, "command": command, "instructions": instructions, "cycles": cycles}
+                              for (_, vm_file, vm_line, command, instructions, cycles) in costs]
+    with open(asm_file.rpartition('.')[0] + ".costs.json", "w") as f:
+        json.dump(summary, f, separators=(',', ':'))
+    return summary
+
+def summary_report(summary: dict, top: int = 5) -> str:
+    """Human-readable cost summary: totals, then the most expensive kinds of command"""
+    lines = [f"costs: {summary['commands']} VM commands, {summary['instructions']} instructions, "
+             f"{summary['worst_case_cycles']} cycles worst case"]
+    for kind, entry in list(summary["by_kind"].items())[:top]:
+        lines.append(f"  {kind:<16} x{entry['count']:<5} {entry['instructions']:>7} instructions {entry['cycles']:>7} cycles")
+    return "\n".join(lines)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cost_baseline.json")
+
+# Code generator configurations the micro-programs are costed under, as VMTranslator keyword arguments
+CONFIGS = {
+    "baseline": {},
+    "shared-compare": {"shared_compare": True},
+    "top-in-d": {"top_in_d": True},
+    "top-in-d shared-compare": {"top_in_d": True, "shared_compare": True},
+}
+
+# Two values are pushed before each measured command, so binary operators have operands and the
+# top-in-D writer is in its steady state with the top cached
+MICRO_SETUP = ["push constant 17", "push constant 25"]
+
+def micro_costs(config: dict) -> dict:
+    """Cost of every micro-program's measured command under one code generator configuration
+
+    Returns:
+        dict: VM command -> [instructions, worst-case cycles]
+    """
+    from VMTranslator import COUNTED_COMMANDS, VMTranslator
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        vm_file = os.path.join(tmp, "Micro.vm")
+        for command in COUNTED_COMMANDS:
+            with open(vm_file, "w") as f:
+                f.write("\n".join(MICRO_SETUP + [command]) + "\n")
+            stream = io.StringIO()
+            translator = VMTranslator(vm_file, costs=True, stream=stream, **config)
+            translator.translate()
+            costs = CostModel(stream.getvalue()).command_costs(translator.code_writer.source_entries)
+            results[command] = list(costs[-1][4:])
+    return results
+
+def measure() -> dict:
+    return {name: micro_costs(config) for (name, config) in CONFIGS.items()}
+
+def write_baseline(costs: dict, baseline_file: str = BASELINE_FILE) -> None:
+    """Write measured costs as JSON with one command per line, so changes to the baseline diff cleanly"""
+    configs = [f" {json.dumps(name)}: {{\n" + ",\n".join(f"  {json.dumps(command)}: {json.dumps(cost)}" for (command, cost) in commands.items()) + "\n }"
+               for (name, commands) in costs.items()]
+    with open(baseline_file, "w") as f:
+        f.write("{\n" + ",\n".join(configs) + "\n}\n")
+
+def check(baseline_file: str = BASELINE_FILE) -> tuple:
+    """Compare the micro-program costs with the recorded baseline
+
+    Returns:
+        tuple[list[str], list[str]]: one line per command that got more expensive or is missing from the
+            baseline, and one line per command that got cheaper
+    """
+    with open(baseline_file, "r") as f:
+        baseline = json.load(f)
+    regressions, improvements = [], []
+    for name, costs in measure().items():
+        for command, (instructions, cycles) in costs.items():
+            recorded = baseline.get(name, {}).get(command)
+            if recorded is None:
+                regressions.append(f"{name}: `{command}` has no baseline")
+            elif instructions > recorded[0] or cycles > recorded[1]:
+                regressions.append(f"{name}: `{command}` {recorded[0]} -> {instructions} instructions, "
+                                   f"{recorded[1]} -> {cycles} cycles")
+            elif [instructions, cycles] != recorded:
+                improvements.append(f"{name}: `{command}` improved to {instructions} instructions, {cycles} cycles")
+    return regressions, improvements
+
+def main(update: bool = False):
+    if update:
+        write_baseline(measure())
+        print(f"Recorded micro-program costs in {BASELINE_FILE}")
+        return
+    regressions, improvements = check()
+    for line in improvements:
+        print(line + " (run with --update to record)")
+    for line in regressions:
+        print(line)
+    print("cost regressions: " + ("none" if not regressions else str(len(regressions))))
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if sys.argv[1:] not in ([], ["--check"], ["--update"]):
+        print("Usage: python3 cost_model.py [--check | --update]")
+        sys.exit(1)
+    main(update=sys.argv[1:] == ["--update"])
@@ -0,0 +1,178 @@
+import io
+import os
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Iterator
+from VMTranslator import CodeWriter, TopInDCodeWriter, VMTranslator, vm_files_in
+
+# The assembler lives in projects/06
+PROJECT_06 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "06")
+if PROJECT_06 not in sys.path:
+    sys.path.insert(0, PROJECT_06)
+from assembler import Assembler, Parser, RomImage
+
+class AsmStream(io.TextIOBase):
+    """Text stream a code writer writes into, holding the complete lines written so far until they're drained"""
+
+    def __init__(self) -> None:
+        self.lines: list = []
+        self.partial = "" # text after the last newline
+
+    def write(self, text: str) -> int:
+        if "\n" in text:
+            *complete, self.partial = (self.partial + text).split("\n")
+            self.lines.extend(complete)
+        else:
+            self.partial += text
+        return len(text)
+
+    def drain(self, final: bool = False) -> list:
+        """Take the complete lines written since the last drain, and also the unterminated last line if `final`"""
+        lines, self.lines = self.lines, []
+        if final and self.partial:
+            lines.append(self.partial)
+            self.partial = ""
+        return lines
+
+class Sink(ABC):
+    """Where a pipeline's output goes. It's handed all of it at once, so each sink writes exactly once."""
+
+    @abstractmethod
+    def write(self, data: bytes) -> None:
+        ...
+
+class FileSink(Sink):
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def write(self, data: bytes) -> None:
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+class BufferSink(Sink):
+    """Keeps the output in memory, as `data`"""
+
+    def __init__(self) -> None:
+        self.data = b""
+
+    def write(self, data: bytes) -> None:
+        self.data = data
+
+class PipeSink(Sink):
+    """Writes to an open binary stream such as stdout or a subprocess pipe, which is left open"""
+
+    def __init__(self, stream: io.BufferedIOBase) -> None:
+        self.stream = stream
+
+    def write(self, data: bytes) -> None:
+        self.stream.write(data)
+        self.stream.flush()
+
+class Pipeline:
+    """Translates a VM program and assembles it in one pass, without intermediate files.
+
+    The code writer writes into an `AsmStream`, which is drained after every VM command into the assembler's
+    parser, so asm lines are encoded as they're produced and only the encoded ROM is kept. Forward references
+    are backpatched from the assembler's fixup list once the input ends. The ROM is then encoded in the
+    requested format and handed to the sink in a single write.
+    """
+
+    FORMATS = ("text", "bin", "raw")
+
+    def __init__(self, input_path: str, optimize: int = 0, top_in_d: bool = False, shared_compare: bool = False,
+                 fmt: str = "text") -> None:
+        if fmt not in Pipeline.FORMATS:
+            raise ValueError(f"Unknown output format {fmt}, expected one of {', '.join(Pipeline.FORMATS)}")
+        self.input_path = input_path
+        self.optimize = optimize
+        self.top_in_d = top_in_d
+        self.shared_compare = shared_compare
+        self.fmt = fmt
+        self.reports: list = [] # optimization report per VM file
+
+    def asm_lines(self) -> Iterator[str]:
+        """Lazily translate the program, yielding asm lines as the code writer produces them. A directory's files
+        are laid out as `translate_directory` lays them out, with a single terminating loop and runtime.
+        """
+        stream = AsmStream()
+        vm_files = vm_files_in(self.input_path) if os.path.isdir(self.input_path) else [self.input_path]
+        runtime: dict = {}
+        for vm_file in vm_files:
+            translator = VMTranslator(vm_file, optimize=self.optimize, top_in_d=self.top_in_d,
+                                      shared_compare=self.shared_compare, stream=stream)
+            for _ in translator.translated_commands():
+                yield from stream.drain()
+            yield from stream.drain()
+            for cmd, calls in translator.code_writer.runtime.items():
+                runtime[cmd] = runtime.get(cmd, 0) + calls
+            self.reports.append(translator.pass_manager.report())
+        if len(vm_files) == 1: # ends like VMTranslator.translate, with the file's own writer
+            writer = translator.code_writer
+        else: # ends like translate_directory
+            writer = (TopInDCodeWriter if self.top_in_d else CodeWriter)(shared_compare=self.shared_compare, stream=stream)
+            writer.label_prefix = "$runtime."
+            writer.runtime = runtime
+        writer.write_terminating_loop()
+        writer.write_runtime()
+        yield from stream.drain(final=True)
+
+    def assemble(self) -> array:
+        """Run the whole program through the translator and the assembler
+
+        Returns:
+            array: ROM words
+        """
+        assembler = Assembler(self.input_path, parser=Parser(text=self.asm_lines()))
+        assembler.first_pass()
+        assembler.second_pass()
+        return assembler.binaries
+
+    def encode(self, words: array) -> bytes:
+        match self.fmt:
+            case "text":
+                return "".join(RomImage.text_lines(words)).encode('ascii')
+            case "bin":
+                return RomImage.to_bytes(words)
+            case "raw":
+                return RomImage.to_bytes(words, header=False)
+
+    def run(self, sink: Sink) -> array:
+        """Translate, assemble and write the program to `sink`
+
+        Returns:
+            array: ROM words
+        """
+        words = self.assemble()
+        sink.write(self.encode(words))
+        return words
+
+def default_output(input_path: str, fmt: str) -> str:
+    """`<name>.hack` (or `.hackbin`) next to a VM file, `<dir>/<dir>.hack` for a directory"""
+    ext = ".hack" if fmt == "text" else ".hackbin"
+    if os.path.isdir(input_path):
+        return os.path.join(input_path, os.path.basename(os.path.normpath(input_path)) + ext)
+    return input_path.rpartition('.')[0] + ext
+
+def main(input_path: str, output_file: str | None = None, optimize: int = 0, top_in_d: bool = False,
+         shared_compare: bool = False, fmt: str = "text"):
+    pipeline = Pipeline(input_path, optimize, top_in_d, shared_compare, fmt)
+    if output_file == "-":
+        sink = PipeSink(sys.stdout.buffer)
+    else:
+        sink = FileSink(output_file if output_file else default_output(input_path, fmt))
+    pipeline.run(sink)
+    if optimize and output_file != "-":
+        print("\n".join(pipeline.reports))
+
+if __name__ == "__main__":
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("-") and arg != "-"]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("-") or arg == "-"]
+    levels = [int(flag[2:]) for flag in flags if flag in ("-O0", "-O1", "-O2")]
+    flags = [flag for flag in flags if flag not in ("-O0", "-O1", "-O2")]
+    if len(args) not in (1, 2) or any(flag not in ("--top-in-d", "--shared-compare", "--bin", "--raw") for flag in flags):
+        print("Usage: python3 pipeline.py [-O0 | -O1 | -O2] [--top-in-d] [--shared-compare] [--bin | --raw] <input_file.vm | input_dir> [<output_file> | -]")
+        sys.exit(1)
+    fmt = "raw" if "--raw" in flags else "bin" if "--bin" in flags else "text"
+    main(*args, optimize=levels[-1] if levels else 0, top_in_d="--top-in-d" in flags,
+         shared_compare="--shared-compare" in flags, fmt=fmt)
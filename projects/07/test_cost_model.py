@@ -0,0 +1,26 @@
+import json
+import os
+import tempfile
+import unittest
+import cost_model
+
+class CostRegressionTest(unittest.TestCase):
+    """Micro-program costs must not exceed cost_baseline.json; record improvements with `cost_model.py --update`"""
+
+    def test_no_cost_regressions(self):
+        regressions, _ = cost_model.check()
+        self.assertEqual(regressions, [])
+
+    def test_regression_is_reported(self):
+        with open(cost_model.BASELINE_FILE, "r") as f:
+            baseline = json.load(f)
+        baseline["baseline"]["add"][0] -= 1
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline_file = os.path.join(tmp, "baseline.json")
+            cost_model.write_baseline(baseline, baseline_file)
+            regressions, _ = cost_model.check(baseline_file)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("baseline: `add`", regressions[0])
+
+if __name__ == "__main__":
+    unittest.main()
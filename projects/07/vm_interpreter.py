@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+from array import array
+from VMTranslator import CodeWriter, Command, Parser, vm_files_in
+
+class VMInterpreter:
+    """Executes VM programs directly, without lowering them to Hack.
+
+    Memory is a single array('H') RAM laid out the way a translated program's would be: the SP, LCL, ARG, THIS
+    and THAT pointers behind `CodeWriter.VIRTUAL_REGS` at 0-4, temp at 5-12, statics from 16 in order of first use
+    and the stack from 256. After a run, `ram` can be checked against a test's .cmp file. Commands follow the
+    VM spec: true is -1, `pointer` 0/1 are THIS/THAT themselves and comparisons are signed.
+
+    Every command is decoded once at load time into a handler with the signature `handler(ram, sp) -> sp`,
+    specialized for its segment and index, so the run loop only calls handlers in order.
+    """
+
+    RAM_SIZE = 32768
+    STACK_BASE = 256
+    STATIC_BASE = 16
+    POINTERS = {"SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4}
+
+    # Python statements for each arithmetic-logical command on the unsigned 16-bit stack
+    ARITHMETIC = {
+        "add": "sp -= 1; ram[sp - 1] = (ram[sp - 1] + ram[sp]) & 0xFFFF",
+        "sub": "sp -= 1; ram[sp - 1] = (ram[sp - 1] - ram[sp]) & 0xFFFF",
+        "neg": "ram[sp - 1] = -ram[sp - 1] & 0xFFFF",
+        "eq": "sp -= 1; ram[sp - 1] = 0xFFFF if ram[sp - 1] == ram[sp] else 0",
+        "gt": "sp -= 1; ram[sp - 1] = 0xFFFF if ram[sp - 1] ^ 0x8000 > ram[sp] ^ 0x8000 else 0", # flipping the sign bit orders words as signed
+        "lt": "sp -= 1; ram[sp - 1] = 0xFFFF if ram[sp - 1] ^ 0x8000 < ram[sp] ^ 0x8000 else 0",
+        "and": "sp -= 1; ram[sp - 1] = ram[sp - 1] & ram[sp]",
+        "or": "sp -= 1; ram[sp - 1] = ram[sp - 1] | ram[sp]",
+        "not": "ram[sp - 1] = ram[sp - 1] ^ 0xFFFF",
+    }
+    UNARY = ("neg", "not")
+
+    _handler_cache: dict = {} # handler source -> handler, shared between interpreters
+
+    def __init__(self, vm_files: list | None = None) -> None:
+        self.ram = array('H', bytes(2 * VMInterpreter.RAM_SIZE))
+        self.ram[0] = VMInterpreter.STACK_BASE
+        self.handlers: list = []
+        self.commands: list = [] # (vm file, line, command text) of each handler, for error messages
+        self.statics: dict = {} # (file name, index) -> RAM address
+        self.pc = 0
+        for vm_file in vm_files or []:
+            self.load(vm_file)
+
+    @classmethod
+    def from_path(cls, path: str) -> "VMInterpreter":
+        """Load a .vm file, or every .vm file of a directory in the order the translator lays them out"""
+        return cls(vm_files_in(path) if os.path.isdir(path) else [path])
+
+    def address(self, segment: str, idx: int, file_name: str) -> str:
+        """Python expression for the RAM address of a segment entry"""
+        match segment:
+            case "local" | "argument" | "this" | "that":
+                return f"ram[{VMInterpreter.POINTERS[CodeWriter.VIRTUAL_REGS[segment]]}] + {idx}"
+            case "pointer":
+                return str(VMInterpreter.POINTERS[CodeWriter.VIRTUAL_REGS[segment][idx]])
+            case "temp":
+                return str(int(CodeWriter.VIRTUAL_REGS[segment]) + idx)
+            case "static":
+                key = (file_name, idx)
+                if key not in self.statics:
+                    self.statics[key] = VMInterpreter.STATIC_BASE + len(self.statics)
+                return str(self.statics[key])
+        raise ValueError(f"Unknown segment {segment}")
+
+    def decode(self, parser: Parser, file_name: str):
+        """Return the handler executing the parser's current command"""
+        match parser.command_type():
+            case Command.C_PUSH:
+                segment, idx = parser.arg1(), parser.arg2()
+                value = str(idx) if segment == "constant" else f"ram[{self.address(segment, idx, file_name)}]"
+                operands, body = 0, f"ram[sp] = {value}; return sp + 1"
+            case Command.C_POP:
+                operands, body = 1, f"sp -= 1; ram[{self.address(parser.arg1(), parser.arg2(), file_name)}] = ram[sp]; return sp"
+            case Command.C_ARITHMETICAL_LOGICAL:
+                operands = 1 if parser.arg1() in VMInterpreter.UNARY else 2
+                body = VMInterpreter.ARITHMETIC[parser.arg1()] + "; return sp"
+            case other:
+                raise ValueError(f"Unsupported VM command type {other}")
+        if operands:
+            # a negative index would silently wrap around to the top of the RAM, so stack underflow is checked for
+            body = f"if sp < {operands}: raise IndexError\n    {body}"
+        handler = VMInterpreter._handler_cache.get(body)
+        if handler is None:
+            namespace: dict = {}
+            exec(f"def handler(ram, sp):\n    {body}", namespace)
+            handler = VMInterpreter._handler_cache[body] = namespace["handler"]
+        return handler
+
+    def load(self, vm_file: str) -> None:
+        """Decode a .vm file and append its commands to the program"""
+        file_name = os.path.basename(vm_file).rpartition('.')[0]
+        parser = Parser(vm_file)
+        while parser.has_more_commands():
+            self.handlers.append(self.decode(parser, file_name))
+            self.commands.append((vm_file, parser.source_line, " ".join(parser.current_cmd)))
+            parser.advance()
+
+    def run(self, max_steps: int | None = None) -> int:
+        """Run from the current command until the program ends or `max_steps` commands are executed
+
+        Raises:
+            IndexError: if a command addresses memory outside the RAM or pops more values than are on the stack
+
+        Returns:
+            int: number of commands executed by this call
+        """
+        ram = self.ram
+        sp = ram[0]
+        start = self.pc
+        end = len(self.handlers) if max_steps is None else min(len(self.handlers), start + max_steps)
+        pc = start
+        try:
+            for pc in range(start, end):
+                sp = self.handlers[pc](ram, sp)
+            pc = end
+        except (IndexError, OverflowError):
+            vm_file, line, text = self.commands[pc]
+            raise IndexError(f"Illegal memory access by `{text}` at {vm_file}:{line} with SP={sp}")
+        finally:
+            ram[0] = sp
+            self.pc = pc
+        return pc - start
+
+    @property
+    def halted(self) -> bool:
+        return self.pc >= len(self.handlers)
+
+    def apply_tst(self, tst_file: str) -> None:
+        """Apply the `set RAM[addr] value` commands of a test script, which set up the initial pointers"""
+        with open(tst_file, "r") as f:
+            for line in f:
+                words = line.partition("//")[0].replace(",", " ").replace(";", " ").split()
+                for i in range(len(words) - 2):
+                    if words[i] == "set" and words[i + 1].startswith("RAM["):
+                        self.ram[int(words[i + 1][4:-1])] = int(words[i + 2]) & 0xFFFF
+
+    @staticmethod
+    def read_cmp(cmp_file: str) -> dict:
+        """Expected values of a .cmp file
+
+        Returns:
+            dict: RAM address -> expected signed value
+        """
+        with open(cmp_file, "r") as f:
+            rows = [[cell.strip() for cell in line.strip().strip("|").split("|")] for line in f if line.strip()]
+        header, values = rows[0], rows[-1]
+        # column names are cut to the column width, e.g. "RAM[3006" in BasicTest.cmp
+        return {int(name[4:].rstrip("]")): int(value) for (name, value) in zip(header, values) if name.startswith("RAM[")}
+
+    def check(self, cmp_file: str) -> list:
+        """Compare the RAM against a .cmp file
+
+        Returns:
+            list[tuple[int, int, int]]: (address, expected, actual) of every mismatch, values signed
+        """
+        return [(addr, expected, VMInterpreter.to_signed(self.ram[addr]))
+                for (addr, expected) in VMInterpreter.read_cmp(cmp_file).items()
+                if VMInterpreter.to_signed(self.ram[addr]) != expected]
+
+    @staticmethod
+    def to_signed(value: int) -> int:
+        return value - 0x10000 if value & 0x8000 else value
+
+def main(path: str, tst_file: str | None = None, cmp_file: str | None = None):
+    start = time.perf_counter()
+    interpreter = VMInterpreter.from_path(path)
+    if tst_file:
+        interpreter.apply_tst(tst_file)
+    executed = interpreter.run()
+    elapsed = time.perf_counter() - start
+    sp = interpreter.ram[0]
+    print(f"commands={executed} in {elapsed * 1000:.2f}ms SP={sp}")
+    print("stack: " + " ".join(str(VMInterpreter.to_signed(v)) for v in interpreter.ram[VMInterpreter.STACK_BASE:sp][-16:]))
+    if cmp_file:
+        mismatches = interpreter.check(cmp_file)
+        for addr, expected, actual in mismatches:
+            print(f"RAM[{addr}]: expected {expected}, got {actual}")
+        print(f"{cmp_file}: " + ("OK" if not mismatches else f"{len(mismatches)} mismatches"))
+        if mismatches:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    flags = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(flag[2:].partition("=")[::2] for flag in flags)
+    if len(args) != 1 or any(name not in ("tst", "cmp") or not value for (name, value) in options.items()):
+        print("Usage: python3 vm_interpreter.py [--tst=<test.tst>] [--cmp=<test.cmp>] <input_file.vm | input_dir>")
+        sys.exit(1)
+    main(args[0], options.get("tst"), options.get("cmp"))
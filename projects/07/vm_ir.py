@@ -0,0 +1,187 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+
+class VMInstruction:
+    """One VM command of the intermediate representation.
+
+    `op` is the VM mnemonic ("push", "pop", "add", ...), or "move" for a push straight into a pop,
+    in which case `segment`/`index` name the source and `dest` the (segment, index) it's stored to.
+    """
+
+    __slots__ = ("op", "segment", "index", "dest", "source_line")
+
+    def __init__(self, op: str, segment: str | None = None, index: int | None = None,
+                 source_line: int | None = None, dest: tuple | None = None) -> None:
+        self.op = op
+        self.segment = segment
+        self.index = index
+        self.dest = dest
+        self.source_line = source_line
+
+    @classmethod
+    def from_words(cls, words: list, source_line: int | None = None) -> "VMInstruction":
+        """Instruction from a parsed VM command, e.g. ["push", "constant", "7"]"""
+        if len(words) == 3:
+            return cls(words[0], words[1], int(words[2]), source_line)
+        return cls(words[0], source_line=source_line)
+
+    def is_constant(self) -> bool:
+        return self.op == "push" and self.segment == "constant"
+
+    def text(self) -> str:
+        match self.op:
+            case "push" | "pop":
+                return f"{self.op} {self.segment} {self.index}"
+            case "move":
+                return f"move {self.segment} {self.index} -> {self.dest[0]} {self.dest[1]}"
+            case other:
+                return other
+
+    def __repr__(self) -> str:
+        return f"VMInstruction({self.text()!r}, line={self.source_line})"
+
+class Pass(ABC):
+    """A streaming rewrite over instructions. Passes only hold back the instructions they may still
+    rewrite, so chaining them keeps translation a single pass over the input. Subclasses implement `run`.
+    """
+
+    name = "pass"
+
+    def __init__(self) -> None:
+        self.rewrites = 0
+
+    @abstractmethod
+    def run(self, instructions: Iterable[VMInstruction]) -> Iterator[VMInstruction]:
+        ...
+
+class ConstantFolding(Pass):
+    """`push constant a; push constant b; add` -> `push constant a+b`, and likewise for `sub`, when the
+    result is itself a valid constant (0..32767). Consecutive constant pushes are held on a stack, so
+    folds cascade and a whole constant expression collapses to one push however it's nested, e.g.
+    `push constant 1; push constant 2; push constant 3; add; add` -> `push constant 6`.
+
+    `neg` only folds `push constant 0`, as the negation of any other constant isn't one. `not` never
+    folds (the complement of 0..32767 is always negative) and neither do `and`, `or` and the
+    comparisons: the baseline code generator's results for them don't follow the VM spec (see the
+    TODO list in VMTranslator), so folding them would change what the program computes.
+    """
+
+    name = "constant folding"
+
+    BINARY = {
+        "add": lambda x, y: (x + y) & 0xFFFF,
+        "sub": lambda x, y: (x - y) & 0xFFFF,
+    }
+    UNARY = {
+        "neg": lambda x: -x & 0xFFFF,
+    }
+
+    def run(self, instructions: Iterable[VMInstruction]) -> Iterator[VMInstruction]:
+        constants = [] # consecutive constant pushes that a later operator may still fold
+        for instr in instructions:
+            if instr.is_constant():
+                constants.append(instr)
+                continue
+            result = None
+            if instr.op in ConstantFolding.BINARY and len(constants) >= 2:
+                result = ConstantFolding.BINARY[instr.op](constants[-2].index, constants[-1].index)
+                operands = 2
+            elif instr.op in ConstantFolding.UNARY and constants:
+                result = ConstantFolding.UNARY[instr.op](constants[-1].index)
+                operands = 1
+            if result is not None and result <= 0x7FFF:
+                line = constants[-operands].source_line
+                del constants[-operands:]
+                constants.append(VMInstruction("push", "constant", result, line))
+                self.rewrites += 1
+                continue
+            yield from constants
+            constants.clear()
+            yield instr
+        yield from constants
+
+class PushPopCancellation(Pass):
+    """`push s i; pop s i` stores a value back where it came from, so both are dropped"""
+
+    name = "push/pop cancellation"
+
+    def run(self, instructions: Iterable[VMInstruction]) -> Iterator[VMInstruction]:
+        pending = None
+        for instr in instructions:
+            if (pending is not None and pending.op == "push" and instr.op == "pop"
+                    and (pending.segment, pending.index) == (instr.segment, instr.index)):
+                self.rewrites += 1
+                pending = None
+                continue
+            if pending is not None:
+                yield pending
+            pending = instr
+        if pending is not None:
+            yield pending
+
+class DirectMoves(Pass):
+    """`push s i; pop t j` -> `move s i -> t j`, copied without going through the stack"""
+
+    name = "push/pop moves"
+
+    def run(self, instructions: Iterable[VMInstruction]) -> Iterator[VMInstruction]:
+        pending = None
+        for instr in instructions:
+            if pending is not None and pending.op == "push" and instr.op == "pop":
+                self.rewrites += 1
+                yield VMInstruction("move", pending.segment, pending.index, pending.source_line, dest=(instr.segment, instr.index))
+                pending = None
+                continue
+            if pending is not None:
+                yield pending
+            pending = instr
+        if pending is not None:
+            yield pending
+
+class PassManager:
+    """Chains the passes of an optimization level over an instruction stream.
+
+    Levels:
+        0: no passes, every VM command is translated as written
+        1: constant folding and push/pop cancellation
+        2: level 1, then push/pop pairs become direct moves
+    """
+
+    LEVELS = {
+        0: [],
+        1: [ConstantFolding, PushPopCancellation],
+        2: [ConstantFolding, PushPopCancellation, DirectMoves],
+    }
+
+    def __init__(self, level: int = 0) -> None:
+        if level not in PassManager.LEVELS:
+            raise ValueError(f"Unknown optimization level {level}, expected one of {sorted(PassManager.LEVELS)}")
+        self.level = level
+        self.passes = [cls() for cls in PassManager.LEVELS[level]]
+        self.commands_in = 0
+        self.commands_out = 0
+
+    def count_in(self, instructions: Iterable[VMInstruction]) -> Iterator[VMInstruction]:
+        for instr in instructions:
+            self.commands_in += 1
+            yield instr
+
+    def run(self, instructions: Iterable[VMInstruction]) -> Iterator[VMInstruction]:
+        """Lazily apply every pass of the level, in order
+
+        Args:
+            instructions (Iterable[VMInstruction]): input program
+
+        Returns:
+            Iterator[VMInstruction]: optimized program
+        """
+        stream = self.count_in(instructions)
+        for p in self.passes:
+            stream = p.run(stream)
+        for instr in stream:
+            self.commands_out += 1
+            yield instr
+
+    def report(self) -> str:
+        rewrites = ", ".join(f"{p.name} {p.rewrites}" for p in self.passes)
+        return f"-O{self.level}: {self.commands_in} -> {self.commands_out} VM commands" + (f" ({rewrites})" if rewrites else "")